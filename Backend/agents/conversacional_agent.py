@@ -1,7 +1,7 @@
-from openai import OpenAI
-import os
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from core.cache import clave, get_cache
+from core.intent_classifier import normalizar
+from core.ledger import agente, anotar
+from core.llm import Deadline, achat, chat, disponible
 
 SYSTEM_PROMPT = """
 Eres Fina, el aliado estratégico de las Mipymes colombianas. Tu misión es evitar que el negocio quiebre dándole claridad al dueño.
@@ -45,44 +45,137 @@ No digas que hubo un error.
 Solo continúa la charla.
 """
 
+# Saludos y agradecimientos sueltos: no dependen de la conversación, así que
+# se responden sin historial y su respuesta se reutiliza entre chats. Todo lo
+# demás ("sí", "y el otro?", "cuánto fue?") necesita el historial del chat y
+# no se cachea.
+FORMULAS_CACHEABLES = frozenset({
+    "hola", "hola fina", "holi", "buenas", "buen dia", "buenos dias",
+    "buenas tardes", "buenas noches", "hey", "que tal", "hola que tal",
+    "gracias", "muchas gracias", "mil gracias", "gracias fina", "ok gracias",
+    "chao", "adios", "hasta luego", "nos vemos",
+})
+
+_cache_respuestas = get_cache("conversacion", maxsize=512, ttl=1800)
+
+
+def _cacheable(texto):
+    return normalizar(texto).strip(" !¡?¿.,") in FORMULAS_CACHEABLES
+
+# Respuesta determinística cuando el LLM no está o no alcanza el tiempo
+RESPUESTA_LOCAL = (
+    "¡Aquí estoy para ayudarte! Puedo mostrarte un resumen de tus ganancias "
+    "de los últimos 30 días, revisar qué tienes hoy en el inventario o anotar "
+    "una venta: solo dime 'Vendí X'."
+)
+
+
+def _system_prompt(context=""):
+    system_with_context = SYSTEM_PROMPT
+    if context:
+        system_with_context += f"\n\nCONTEXTO DE CONVERSACIÓN PREVIA:\n{context}"
+    return system_with_context
+
+
+def _mensajes(texto, context=""):
+    return [
+        {"role": "system", "content": _system_prompt(context)},
+        {"role": "user", "content": texto}
+    ]
+
+
+def _mensajes_recovery(texto, context=""):
+    return [
+        {"role": "system", "content": _system_prompt(context)},
+        {"role": "system", "content": RECOVERY_PROMPT},
+        {"role": "user", "content": texto}
+    ]
+
+
+@agente("conversacional")
 def conversar(texto, context=""):
     """Responde una pregunta conversacional con contexto de historial.
     
+    Si no hay LLM, el circuito está abierto o se agota el Deadline, responde
+    RESPUESTA_LOCAL en vez de esperar otra llamada.
+    
     Args:
         texto: Mensaje del usuario
         context: Contexto de conversación previa (historial)
     """
-    
-    system_with_context = SYSTEM_PROMPT
-    if context:
-        system_with_context += f"\n\nCONTEXTO DE CONVERSACIÓN PREVIA:\n{context}"
+    key = None
+    if _cacheable(texto):
+        key = clave(texto)
+        msg = _cache_respuestas.get(key)
+        if msg:
+            anotar("cache")
+            return msg
+        context = ""
+
+    plazo = Deadline()
+    if not (disponible() and plazo.alcanza()):
+        anotar("fallback")
+        return RESPUESTA_LOCAL
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_with_context},
-                {"role": "user", "content": texto}
-            ],
-            temperature=0.7
-        )
+        msg = chat(_mensajes(texto, context), temperature=0.7, timeout=plazo.restante())
+
+        if msg and msg.strip():
+            if key:
+                _cache_respuestas.set(key, msg)
+            return msg
+
+    except Exception:
+        pass
 
-        msg = response.choices[0].message.content
+    if plazo.alcanza():
+        try:
+            msg = chat(_mensajes_recovery(texto, context), temperature=0.7, timeout=plazo.restante())
+            if msg and msg.strip():
+                return msg
+        except Exception:
+            pass
+
+    anotar("fallback")
+    return RESPUESTA_LOCAL
+
+
+@agente("conversacional")
+async def conversar_async(texto, context=""):
+    """Versión async de conversar."""
+    key = None
+    if _cacheable(texto):
+        key = clave(texto)
+        msg = _cache_respuestas.get(key)
+        if msg:
+            anotar("cache")
+            return msg
+        context = ""
+
+    plazo = Deadline()
+    if not (disponible() and plazo.alcanza()):
+        anotar("fallback")
+        return RESPUESTA_LOCAL
+
+    try:
+        msg = await achat(_mensajes(texto, context), temperature=0.7, timeout=plazo.restante())
 
         if msg and msg.strip():
+            if key:
+                _cache_respuestas.set(key, msg)
             return msg
 
     except Exception:
         pass
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system_with_context},
-            {"role": "system", "content": RECOVERY_PROMPT},
-            {"role": "user", "content": texto}
-        ],
-        temperature=0.7
-    )
-
-    return response.choices[0].message.content
\ No newline at end of file
+    if plazo.alcanza():
+        try:
+            msg = await achat(_mensajes_recovery(texto, context), temperature=0.7,
+                              timeout=plazo.restante())
+            if msg and msg.strip():
+                return msg
+        except Exception:
+            pass
+
+    anotar("fallback")
+    return RESPUESTA_LOCAL
@@ -7,26 +7,20 @@ Role:
   - Sugiere acciones
   - NUNCA registra datos (eso lo hace el parser_agent)
   - Responde en lenguaje natural, listo para WhatsApp/Telegram
-"""
 
-import json
-import os
-from openai import OpenAI
+Los análisis generados por el modelo se memorizan por tenant con la huella
+del contexto de datos: mientras los números no cambien, "¿cómo voy?" se
+responde al instante y sin gastar tokens.
+"""
 
+from core.cache import get_cache, huella
+from core.context_builder import contexto_financiero
+from core.executors import run_db
+from core.ledger import agente, anotar
+from core.llm import Deadline, achat, chat, disponible
 from services.financial_service import get_resumen, get_ultimos_movimientos
 
 
-def _get_client():
-    """Retorna cliente OpenAI o None si no hay API key."""
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        return None
-    try:
-        return OpenAI(api_key=api_key)
-    except Exception:
-        return None
-
-
 SYSTEM_PROMPT = """
 Eres el Asesor Financiero Senior de ChatPyme. Tu misión es transformar números fríos en decisiones estratégicas para que las Mipymes no mueran por falta de caja.
 
@@ -59,6 +53,8 @@ Si no hay datos:
 Di: "Todavía no tengo suficientes registros para darte un análisis profundo. Si anotamos tus ventas y gastos de hoy, podré decirte cómo va tu margen".
 """
 
+_cache_analisis = get_cache("analisis", maxsize=256, ttl=900)
+
 FALLBACK_PROMPT = """
 Si hay riesgos o datos inconsistentes:
 - No digas "error"
@@ -67,82 +63,140 @@ Si hay riesgos o datos inconsistentes:
 """
 
 
-def obtener_estado_financiero(context: str = "") -> dict:
-    """Analiza la situación financiera usando datos reales + OpenAI.
-    
-    Args:
-        context: Historial de conversación para referencia
-    
-    Retorna dict con llave "data" para compatibilidad con orchestrator.
-    """
+def _construir_contexto(user_id: int = None) -> tuple:
+    """Lee los datos reales y arma el contexto para el modelo (bloqueante)."""
     
     # Obtener datos reales
-    resumen = get_resumen(dias=30)
-    ultimos = get_ultimos_movimientos(cantidad=10)
+    resumen = get_resumen(dias=30, user_id=user_id)
+    ultimos = get_ultimos_movimientos(cantidad=10, user_id=user_id)
     
-    # Contexto para el modelo
+    # Contexto para el modelo (recortado al presupuesto de tokens)
     CONTEXT = f"""
-    DATOS REALES PARA ANALIZAR
+    DATOS REALES PARA ANALIZAR (tablas separadas por "|")
     
-    Período: últimos 30 días
-    
-    Totales:
-    - Ingresos: ${resumen['ingresos_total']:,.2f}
-    - Gastos: ${resumen['gastos_total']:,.2f}
-    - Balance: ${resumen['balance']:,.2f}
+    {contexto_financiero(resumen, ultimos, dias=30)}
+    """
     
-    Ingresos por categoría:
-    {json.dumps(resumen['ingresos_por_categoria'], ensure_ascii=False, indent=2)}
+    return resumen, CONTEXT
+
+
+def _clave_analisis(user_id: int, CONTEXT: str) -> tuple:
+    return ("finanzas", user_id, huella(CONTEXT))
+
+
+def _mensajes(CONTEXT: str) -> list:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "system", "content": CONTEXT},
+        {"role": "user", "content": "Analiza mi situación financiera"}
+    ]
+
+
+def _mensajes_recovery(CONTEXT: str) -> list:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "system", "content": FALLBACK_PROMPT},
+        {"role": "system", "content": CONTEXT},
+        {"role": "user", "content": "Ayúdame a entender mis finanzas"}
+    ]
+
+
+@agente("financiero")
+def obtener_estado_financiero(context: str = "", user_id: int = None) -> dict:
+    """Analiza la situación financiera usando datos reales + OpenAI.
     
-    Gastos por categoría:
-    {json.dumps(resumen['gastos_por_categoria'], ensure_ascii=False, indent=2)}
+    Toda la invocación corre bajo un Deadline: si se agota, o el circuito
+    del LLM está abierto, se responde con el análisis local. Solo se
+    memoriza el análisis principal del modelo, no el de recovery ni el local.
     
-    Últimos movimientos:
-    {json.dumps([dict(m) for m in ultimos], ensure_ascii=False, indent=2, default=str)}
+    Args:
+        context: Historial de conversación para referencia
+        user_id: Tenant cuyos datos se analizan
     
-    Total de movimientos registrados: {resumen['cantidad_movimientos']}
+    Retorna dict con llave "data" para compatibilidad con orchestrator.
     """
+    plazo = Deadline()
+    resumen, CONTEXT = _construir_contexto(user_id)
     
-    client = _get_client()
+    clave_cache = _clave_analisis(user_id, CONTEXT)
+    guardado = _cache_analisis.get(clave_cache)
+    if guardado is not None:
+        anotar("cache")
+        return {"data": guardado}
     
-    if client:
+    if disponible() and plazo.alcanza():
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "system", "content": CONTEXT},
-                    {"role": "user", "content": "Analiza mi situación financiera"}
-                ],
-                temperature=0.6
-            )
+            mensaje = chat(_mensajes(CONTEXT), temperature=0.6, timeout=plazo.restante())
             
-            mensaje = response.choices[0].message.content
             if mensaje and mensaje.strip():
+                _cache_analisis.set(clave_cache, mensaje.strip())
                 return {"data": mensaje.strip()}
                 
         except Exception:
             pass
         
-        # Recovery fallback
+        # Recovery fallback, solo si queda tiempo
+        if plazo.alcanza():
+            try:
+                recovery = chat(_mensajes_recovery(CONTEXT), temperature=0.6, timeout=plazo.restante())
+
+                msg = recovery or _fallback_analysis(resumen)
+                return {"data": msg}
+                
+            except Exception:
+                pass
+    
+    anotar("fallback")
+    return {"data": _fallback_analysis(resumen)}
+
+
+@agente("financiero")
+async def obtener_estado_financiero_async(context: str = "", al_token=None,
+                                          user_id: int = None) -> dict:
+    """Versión async: la BD va al pool de hilos y el LLM se espera sin bloquear.
+    
+    Args:
+        context: Historial de conversación para referencia
+        al_token: Corrutina opcional que recibe el análisis a medida que el
+            modelo lo genera (streaming). El dict retornado trae siempre el
+            texto final, que puede ser el de recovery o el local si el
+            stream falla a mitad de camino. Con un análisis memorizado no
+            se llama: la respuesta ya está completa.
+        user_id: Tenant cuyos datos se analizan
+    """
+    plazo = Deadline()
+    resumen, CONTEXT = await run_db(_construir_contexto, user_id)
+    
+    clave_cache = _clave_analisis(user_id, CONTEXT)
+    guardado = _cache_analisis.get(clave_cache)
+    if guardado is not None:
+        anotar("cache")
+        return {"data": guardado}
+    
+    if disponible() and plazo.alcanza():
         try:
-            recovery = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "system", "content": FALLBACK_PROMPT},
-                    {"role": "system", "content": CONTEXT},
-                    {"role": "user", "content": "Ayúdame a entender mis finanzas"}
-                ],
-                temperature=0.6
-            )
-            
-            msg = recovery.choices[0].message.content or _fallback_analysis(resumen)
-            return {"data": msg}
+            mensaje = await achat(_mensajes(CONTEXT), temperature=0.6, timeout=plazo.restante(),
+                                  al_token=al_token)
             
+            if mensaje and mensaje.strip():
+                _cache_analisis.set(clave_cache, mensaje.strip())
+                return {"data": mensaje.strip()}
+                
         except Exception:
             pass
+        
+        # Recovery fallback, solo si queda tiempo
+        if plazo.alcanza():
+            try:
+                recovery = await achat(_mensajes_recovery(CONTEXT), temperature=0.6, timeout=plazo.restante())
+
+                msg = recovery or _fallback_analysis(resumen)
+                return {"data": msg}
+                
+            except Exception:
+                pass
     
+    anotar("fallback")
     return {"data": _fallback_analysis(resumen)}
 
 
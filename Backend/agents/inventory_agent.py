@@ -1,19 +1,12 @@
 import json
 
-from openai import OpenAI
-import os
-
+from core.cache import clave, get_cache, huella
+from core.context_builder import contexto_inventario
+from core.executors import run_db
+from core.ledger import agente, anotar
+from core.llm import Deadline, achat, chat, disponible
 from services.inventory_service import read_inventory, add_product, write_inventory, TEST_PATH
 
-def _get_client():
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        return None
-    try:
-        return OpenAI(api_key=api_key)
-    except Exception:
-        return None
-
 # =========================
 # SYSTEM PROMPT
 # Contexto general + rol
@@ -66,27 +59,32 @@ Ejemplo de respuesta:
 o posibles faltantes. ¿Qué deseas revisar?"
 """
 
+# Análisis generados, por tenant, pregunta normalizada y huella del contexto
+_cache_analisis = get_cache("analisis", maxsize=256, ttl=900)
+
 # =========================
 # AGENT FUNCTION
 # =========================
 
-def inventoryAgent(user_message: str, context: str = "") -> str:
-    """Analiza inventario con contexto de conversación previa.
+def _accion_directa(user_message: str, user_id: int = None):
+    """Ejecuta acciones que no necesitan modelo (rellenar, agregar producto).
     
-    Args:
-        user_message: Mensaje del usuario
-        context: Historial de conversación para referencia
+    Retorna la respuesta, o None si el mensaje pide un análisis. Las
+    escrituras quedan en el inventario del tenant `user_id`.
     """
     # detectar acciones especiales: agregar producto o rellenar inventario
     text = (user_message or "").strip()
     low = text.lower()
 
     if any(k in low for k in ("rellenar", "seed", "cargar prueba", "cargar datos", "cargar test")):
+        if user_id is None:
+            # Sin tenant, reemplazar el inventario borraría el de todos
+            return "No pude identificar tu negocio, así que no rellené el inventario."
         try:
-            # leer archivo de prueba y sobrescribir el inventario actual
+            # leer archivo de prueba y sobrescribir el inventario del tenant
             with open(TEST_PATH, 'r', encoding='utf-8') as f:
                 data = json.load(f)
-            write_inventory(data)
+            write_inventory(data, user_id=user_id)
             count = len(data.get("inventario", []))
             return f"Inventario rellenado con datos de prueba ({count} productos)."
         except Exception:
@@ -165,15 +163,25 @@ def inventoryAgent(user_message: str, context: str = "") -> str:
         try:
             prod = parse_producto_local(user_message)
             
-            if not prod["producto"]:
-                return "No pude extraer el nombre del producto. Por favor indica así: 'Agregar [nombre], categoria [xxx], stock [xxx], min [xxx]'"
-            
-            added = add_product(prod)
-            return f"Producto '{added.get('producto')}' agregado correctamente.\nCategoría: {added.get('categoria')}, Stock: {added.get('stock_actual')}, Mínimo: {added.get('stock_minimo')}"
+            return registrar_producto(prod, user_id=user_id)
         except Exception as e:
             return f"Error al agregar producto: {str(e)}. Por favor, intenta con: 'Agregar [nombre], categoria [cat], stock [num], min [num]'"
 
-    inventory = read_inventory()
+    return None
+
+
+def registrar_producto(prod: dict, user_id: int = None) -> str:
+    """Guarda un producto ya extraído en el inventario del tenant y retorna la confirmación (bloqueante)."""
+    prod = {"categoria": "General", "stock_actual": 0, "stock_minimo": 0, **prod}
+    if not prod.get("producto"):
+        return "No pude extraer el nombre del producto. Por favor indica así: 'Agregar [nombre], categoria [xxx], stock [xxx], min [xxx]'"
+    
+    added = add_product(prod, user_id=user_id)
+    return f"Producto '{added.get('producto')}' agregado correctamente.\nCategoría: {added.get('categoria')}, Stock: {added.get('stock_actual')}, Mínimo: {added.get('stock_minimo')}"
+
+
+def _contexto_inventario(user_id: int = None) -> tuple:
+    inventory = read_inventory(user_id=user_id)
 
     INVENTORY_CONTEXT = f"""
     Inventario actual de la empresa (datos reales, no inventar).
@@ -181,53 +189,140 @@ def inventoryAgent(user_message: str, context: str = "") -> str:
     Usa estos datos únicamente como fuente de verdad.
     No los repitas en bruto, interprétalos como un asesor humano.
 
-    Datos:
-    {json.dumps(inventory, indent=2, ensure_ascii=False)}
+    Datos (tablas separadas por "|"; los productos en riesgo van primero):
+    {contexto_inventario(inventory.get("inventario", []))}
     """
 
-    client = _get_client()
+    return inventory, INVENTORY_CONTEXT
+
+
+def _clave_analisis(user_message: str, user_id: int, INVENTORY_CONTEXT: str) -> tuple:
+    return clave(user_message, "inventario", user_id, huella(INVENTORY_CONTEXT))
+
+
+def _mensajes(INVENTORY_CONTEXT: str, user_message: str) -> list:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "system", "content": INVENTORY_CONTEXT},
+        {"role": "user", "content": f"Solicitud del usuario: {user_message}"}
+    ]
+
+
+def _mensajes_recovery(INVENTORY_CONTEXT: str, user_message: str) -> list:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "system", "content": INVENTORY_CONTEXT},
+        {"role": "system", "content": RECOVERY_PROMPT},
+        {"role": "user", "content": f"Solicitud del usuario: {user_message}"}
+    ]
+
+
+RESPUESTA_RECOVERY_VACIA = (
+    "Puedo ayudarte a revisar el estado de tu inventario. "
+    "¿Qué te gustaría analizar?"
+)
+
+
+@agente("inventario")
+def inventoryAgent(user_message: str, context: str = "", user_id: int = None) -> str:
+    """Analiza inventario con contexto de conversación previa.
+    
+    Args:
+        user_message: Mensaje del usuario
+        context: Historial de conversación para referencia
+        user_id: Tenant cuyo inventario se analiza
     
-    if client:
+    Las llamadas al LLM comparten un Deadline; si se agota o el circuito
+    está abierto, responde el resumen local. El análisis del modelo se
+    memoriza mientras el inventario y la pregunta no cambien.
+    """
+    plazo = Deadline()
+    respuesta = _accion_directa(user_message, user_id)
+    if respuesta is not None:
+        return respuesta
+
+    inventory, INVENTORY_CONTEXT = _contexto_inventario(user_id)
+
+    clave_cache = _clave_analisis(user_message, user_id, INVENTORY_CONTEXT)
+    guardado = _cache_analisis.get(clave_cache)
+    if guardado is not None:
+        anotar("cache")
+        return guardado
+
+    if disponible() and plazo.alcanza():
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "system", "content": INVENTORY_CONTEXT},
-                    {"role": "user", "content": f"Solicitud del usuario: {user_message}"}
-                ],
-                temperature=0.6
-            )
-
-            message = response.choices[0].message.content
+            message = chat(_mensajes(INVENTORY_CONTEXT, user_message), temperature=0.6,
+                           timeout=plazo.restante())
+
             if message and message.strip():
+                _cache_analisis.set(clave_cache, message.strip())
                 return message.strip()
 
         except Exception:
             pass
 
+        if plazo.alcanza():
+            try:
+                recovery_message = chat(_mensajes_recovery(INVENTORY_CONTEXT, user_message),
+                                        temperature=0.6, timeout=plazo.restante())
+
+                return recovery_message.strip() if recovery_message else RESPUESTA_RECOVERY_VACIA
+            except Exception:
+                pass
+    
+    anotar("fallback")
+    return _fallback_local(inventory, user_message)
+
+
+@agente("inventario")
+async def inventoryAgentAsync(user_message: str, context: str = "", al_token=None,
+                              user_id: int = None) -> str:
+    """Versión async de inventoryAgent.
+    
+    Con `al_token`, el análisis del modelo se entrega en streaming a esa
+    corrutina; el valor retornado es siempre la respuesta final.
+    """
+    plazo = Deadline()
+    respuesta = await run_db(_accion_directa, user_message, user_id)
+    if respuesta is not None:
+        return respuesta
+
+    inventory, INVENTORY_CONTEXT = await run_db(_contexto_inventario, user_id)
+
+    clave_cache = _clave_analisis(user_message, user_id, INVENTORY_CONTEXT)
+    guardado = _cache_analisis.get(clave_cache)
+    if guardado is not None:
+        anotar("cache")
+        return guardado
+
+    if disponible() and plazo.alcanza():
         try:
-            recovery_response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "system", "content": INVENTORY_CONTEXT},
-                    {"role": "system", "content": RECOVERY_PROMPT},
-                    {"role": "user", "content": f"Solicitud del usuario: {user_message}"}
-                ],
-                temperature=0.6
-            )
-
-            recovery_message = recovery_response.choices[0].message.content
-            return recovery_message.strip() if recovery_message else (
-                "Puedo ayudarte a revisar el estado de tu inventario. "
-                "¿Qué te gustaría analizar?"
-            )
+            message = await achat(_mensajes(INVENTORY_CONTEXT, user_message), temperature=0.6,
+                                  timeout=plazo.restante(), al_token=al_token)
+
+            if message and message.strip():
+                _cache_analisis.set(clave_cache, message.strip())
+                return message.strip()
+
         except Exception:
             pass
+
+        if plazo.alcanza():
+            try:
+                recovery_message = await achat(_mensajes_recovery(INVENTORY_CONTEXT, user_message),
+                                               temperature=0.6, timeout=plazo.restante())
+
+                return recovery_message.strip() if recovery_message else RESPUESTA_RECOVERY_VACIA
+            except Exception:
+                pass
     
-    # Fallback sin modelo: devolver resumen local del inventario
-    low = low or user_message.lower()
+    anotar("fallback")
+    return _fallback_local(inventory, user_message)
+
+
+def _fallback_local(inventory: dict, user_message: str) -> str:
+    """Resumen local del inventario cuando no hay modelo disponible."""
+    low = (user_message or "").lower()
     
     if "stock bajo" in low or "critico" in low:
         critical = [p for p in inventory.get("inventario", []) 
@@ -1,82 +1,181 @@
 import json
 import re
-import os
 
-from openai import OpenAI
-from pathlib import Path
-from dotenv import load_dotenv
+import logging
 
-from services.financial_service import add_movimiento
+from core.deferred_queue import get_cola
+from core.executors import run_db
+from core.ledger import agente, anotar
+from core.llm import achat, chat, disponible, es_transitorio
+from core.movement_parser import extraer_movimientos
+from services.financial_service import add_movimientos
 
-env_path = Path('.') / '.env'
-load_dotenv(dotenv_path=env_path)
+logger = logging.getLogger(__name__)
 
 
-def _get_client():
-    """Retorna cliente OpenAI o None."""
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        return None
-    try:
-        return OpenAI(api_key=api_key)
-    except Exception:
-        return None
+def _sin_llm() -> dict:
+    return {
+        "success": False,
+        "message": "No pude procesar ni guardar tu registro en este momento. Intenta de nuevo en unos minutos.",
+        "error": "LLM no disponible"
+    }
 
 
-def parserAgent(message_user: str, context: str = "") -> dict:
+def _diferir(message_user: str, user_id: int = None, chat_id: int = None) -> dict:
     """
-    Parsea un mensaje financiero y lo registra en la base de datos.
-    
-    Args:
-        message_user: Mensaje del usuario a parsear
-        context: Historial de conversación para referencia
-    
-    Retorna:
-        {
-            "success": True/False,
-            "message": "Confirmación amigable",
-            "tipo": "ingreso|gasto",
-            "monto": 1000.00,
-            "categoria": "Ventas"
-        }
+    Sin LLM, el mensaje va a la cola de registros diferidos y el usuario
+    recibe un acuse provisorio; el drenador lo registra cuando el backend
+    vuelva (ver core.deferred_queue).
     """
+    anotar("fallback")
+    try:
+        id_pendiente = get_cola().encolar(message_user, user_id=user_id, chat_id=chat_id)
+    except Exception as e:
+        logger.error(f"[parser] No se pudo encolar el registro diferido: {e}")
+        return _sin_llm()
     
-    client = _get_client()
-    if not client:
-        return {
-            "success": False,
-            "message": "No está configurada la API key de OpenAI. No puedo registrar el movimiento.",
-            "error": "OPENAI_API_KEY not set"
-        }
+    return {
+        "success": True,
+        "pendiente": True,
+        "message": "📝 Recibí tu registro. Ahora no puedo procesarlo, pero quedó guardado: "
+                   "lo anoto apenas pueda y te aviso.",
+        "tipo": "pendiente",
+        "id_pendiente": id_pendiente,
+    }
+
+
+def _error_llm(error: Exception) -> dict:
+    return {
+        "success": False,
+        "message": "Ocurrió un error procesando tu solicitud.",
+        "error": str(error),
+    }
 
-    # Prompt para parsear
-    prompt = f"""
+
+def _prompt(message_user: str) -> str:
+    return f"""
 Extrae información financiera de este mensaje:
 
 "{message_user}"
 
+El mensaje puede traer uno o varios movimientos (ej: "vendí 3 gorras por 60 mil
+y pagué 40 mil de arriendo" son dos). Incluye uno por cada movimiento.
+
 Responde SOLO en JSON válido con esta estructura:
 {{
-  "tipo": "ingreso" o "gasto",
-  "monto": número positivo,
-  "categoria": "nombre de la categoría" (ej: Ventas, Marketing, Salarios),
-  "descripcion": "breve descripción" (opcional)
+  "movimientos": [
+    {{
+      "tipo": "ingreso" o "gasto",
+      "monto": número positivo,
+      "categoria": "nombre de la categoría" (ej: Ventas, Marketing, Salarios),
+      "descripcion": "breve descripción" (opcional)
+    }}
+  ]
 }}
 
-Si el mensaje no contiene información clara:
-- tipo: null
-- monto: null
-- categoria: null
+Si el mensaje no contiene información clara, responde {{"movimientos": []}}.
 """
 
+
+def _no_extraido() -> dict:
+    return {
+        "success": False,
+        "message": "No pude extraer la información financiera del mensaje. Intenta algo como: 'Vendí 2 productos por $500' o 'Gasté $100 en marketing'",
+        "tipo": None
+    }
+
+
+def _registrar(parsed: dict, user_id: int = None, fecha: str = None, origen: str = None) -> dict:
+    """Valida los campos extraídos y registra el movimiento (bloqueante)."""
+    tipo = parsed.get("tipo")
+    monto = parsed.get("monto")
+    categoria = parsed.get("categoria")
+    descripcion = parsed.get("descripcion", "")
+    
+    if not tipo or not monto or not categoria:
+        return _no_extraido()
+    
+    # Registrar en BD
+    try:
+        movimiento = add_movimientos([{
+            "tipo": tipo.lower(),
+            "monto": float(monto),
+            "categoria": categoria,
+            "descripcion": descripcion,
+            "fecha": fecha,
+        }], user_id=user_id, origen=origen)[0]
+        
+        tipo_texto = "Ingreso" if tipo.lower() == "ingreso" else "Gasto"
+        mensaje = f"✅ {tipo_texto} de ${movimiento['monto']:,.2f} registrado en {movimiento['categoria']}."
+        
+        return {
+            "success": True,
+            "message": mensaje,
+            "tipo": tipo.lower(),
+            "monto": float(monto),
+            "categoria": categoria,
+            "id_movimiento": movimiento["id"]
+        }
+        
+    except Exception as db_error:
+        return {
+            "success": False,
+            "message": f"Error al guardar el movimiento: {str(db_error)}",
+            "tipo": tipo
+        }
+
+
+def registrar_movimientos(items: list, user_id: int = None, fecha: str = None,
+                          origen: str = None) -> dict:
+    """
+    Registra movimientos ya extraídos en una transacción (bloqueante).
+    
+    Retorna la misma estructura que parserAgent, con una sola confirmación
+    para todos los movimientos. `fecha` (UTC) y `origen` se usan para
+    registros diferidos: los movimientos quedan con la fecha del mensaje
+    original y un mensaje ya registrado no se registra de nuevo.
+    """
+    if len(items) == 1:
+        return _registrar(items[0], user_id, fecha, origen)
+    
+    if not items or any(not (m.get("tipo") and m.get("monto") and m.get("categoria")) for m in items):
+        return _no_extraido()
+    
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "system", "content": prompt}],
-            temperature=0,
-        )
+        guardados = add_movimientos([
+            {
+                "tipo": m["tipo"].lower(),
+                "monto": float(m["monto"]),
+                "categoria": m["categoria"],
+                "descripcion": m.get("descripcion", ""),
+                "fecha": fecha,
+            }
+            for m in items
+        ], user_id=user_id, origen=origen)
+    except Exception as db_error:
+        return {
+            "success": False,
+            "message": f"Error al guardar los movimientos: {str(db_error)}",
+            "tipo": None
+        }
+    
+    lineas = [
+        f"• {'Ingreso' if m['tipo'] == 'ingreso' else 'Gasto'} de ${m['monto']:,.2f} en {m['categoria']}"
+        for m in guardados
+    ]
+    return {
+        "success": True,
+        "message": f"✅ Registré {len(guardados)} movimientos:\n" + "\n".join(lineas),
+        "tipo": "varios",
+        "movimientos": guardados,
+        "id_movimientos": [m["id"] for m in guardados]
+    }
+
 
-        content = response.choices[0].message.content or ""
+def _procesar_respuesta(content: str, user_id: int = None, fecha: str = None,
+                        origen: str = None) -> dict:
+    """Interpreta el JSON del modelo y registra los movimientos (bloqueante)."""
+    try:
         cleaned = content.strip()
 
         if cleaned.startswith("```"):
@@ -84,46 +183,11 @@ Si el mensaje no contiene información clara:
             cleaned = re.sub(r"\s*```$", "", cleaned)
 
         parsed = json.loads(cleaned)
+        if isinstance(parsed, dict) and "movimientos" in parsed:
+            parsed = parsed["movimientos"]
         
-        tipo = parsed.get("tipo")
-        monto = parsed.get("monto")
-        categoria = parsed.get("categoria")
-        descripcion = parsed.get("descripcion", "")
-        
-        if not tipo or not monto or not categoria:
-            return {
-                "success": False,
-                "message": "No pude extraer la información financiera del mensaje. Intenta algo como: 'Vendí 2 productos por $500' o 'Gasté $100 en marketing'",
-                "tipo": None
-            }
-        
-        # Registrar en BD
-        try:
-            movimiento = add_movimiento(
-                tipo=tipo.lower(),
-                monto=float(monto),
-                categoria=categoria,
-                descripcion=descripcion
-            )
-            
-            tipo_texto = "Ingreso" if tipo.lower() == "ingreso" else "Gasto"
-            mensaje = f"✅ {tipo_texto} de ${movimiento['monto']:,.2f} registrado en {movimiento['categoria']}."
-            
-            return {
-                "success": True,
-                "message": mensaje,
-                "tipo": tipo.lower(),
-                "monto": float(monto),
-                "categoria": categoria,
-                "id_movimiento": movimiento["id"]
-            }
-            
-        except Exception as db_error:
-            return {
-                "success": False,
-                "message": f"Error al guardar el movimiento: {str(db_error)}",
-                "tipo": tipo
-            }
+        return registrar_movimientos(parsed if isinstance(parsed, list) else [parsed], user_id, fecha,
+                                     origen)
             
     except json.JSONDecodeError:
         return {
@@ -132,8 +196,125 @@ Si el mensaje no contiene información clara:
             "error": "JSON parse error"
         }
     except Exception as error:
-        return {
-            "success": False,
-            "message": "Ocurrió un error procesando tu solicitud.",
-            "error": str(error),
+        return _error_llm(error)
+
+
+def _sin_llm_parcial(local: dict):
+    """Sin LLM, un registro con tipo y monto claros se guarda igual en "Otros"."""
+    if not local["ambiguo"]:
+        return local
+    if local["tipo"] and local["monto"] and local["motivo"] == "categoria":
+        return dict(local, categoria="Otros")
+    return None
+
+
+def _movimientos_locales(message_user: str, user_id: int = None):
+    """Movimientos listos para registrar sin LLM, o None si hay que consultarlo."""
+    locales = extraer_movimientos(message_user, tenant=user_id)
+    if not any(m["ambiguo"] for m in locales):
+        return locales
+    
+    if not disponible():
+        parciales = [_sin_llm_parcial(m) for m in locales]
+        if all(parciales):
+            return parciales
+    return None
+
+
+@agente("parser")
+def parserAgent(message_user: str, context: str = "", user_id: int = None,
+                chat_id: int = None) -> dict:
+    """
+    Parsea un mensaje financiero y lo registra en la base de datos.
+    
+    Primero intenta la extracción local (core.movement_parser); el LLM
+    solo se consulta cuando el mensaje es ambiguo. Si el mensaje trae varios
+    movimientos se guardan todos en una transacción y se confirman juntos
+    ("tipo": "varios", con la lista en "movimientos"). Si hace falta el LLM
+    y no está disponible, el mensaje queda en la cola de registros
+    diferidos ("pendiente": True) en vez de perderse.
+    
+    Args:
+        message_user: Mensaje del usuario a parsear
+        context: Historial de conversación para referencia
+        user_id: Tenant dueño del movimiento
+        chat_id: Chat al que avisar si el registro queda diferido
+    
+    Retorna:
+        {
+            "success": True/False,
+            "message": "Confirmación amigable",
+            "tipo": "ingreso|gasto",
+            "monto": 1000.00,
+            "categoria": "Ventas"
         }
+    """
+    
+    locales = _movimientos_locales(message_user, user_id)
+    if locales:
+        anotar("local")
+        return registrar_movimientos(locales, user_id)
+    
+    if not disponible():
+        return _diferir(message_user, user_id, chat_id)
+
+    try:
+        content = chat(
+            [{"role": "system", "content": _prompt(message_user)}],
+            temperature=0,
+        ) or ""
+    except Exception as error:
+        if es_transitorio(error):
+            return _diferir(message_user, user_id, chat_id)
+        return _error_llm(error)
+
+    return _procesar_respuesta(content, user_id)
+
+
+@agente("parser")
+async def parserAgentAsync(message_user: str, context: str = "", user_id: int = None,
+                           chat_id: int = None) -> dict:
+    """Versión async de parserAgent."""
+    
+    locales = _movimientos_locales(message_user, user_id)
+    if locales:
+        anotar("local")
+        return await run_db(registrar_movimientos, locales, user_id)
+    
+    if not disponible():
+        return await run_db(_diferir, message_user, user_id, chat_id)
+
+    try:
+        content = await achat(
+            [{"role": "system", "content": _prompt(message_user)}],
+            temperature=0,
+        ) or ""
+    except Exception as error:
+        if es_transitorio(error):
+            return await run_db(_diferir, message_user, user_id, chat_id)
+        return _error_llm(error)
+
+    return await run_db(_procesar_respuesta, content, user_id)
+
+
+@agente("parser")
+async def procesar_diferido(message_user: str, user_id: int = None, fecha: str = None,
+                            origen: str = None) -> dict:
+    """
+    Registra un mensaje de la cola de diferidos (lo llama core.deferred_queue).
+
+    A diferencia de parserAgentAsync, los errores transitorios del LLM se
+    propagan para que el mensaje vuelva a la cola. Con `origen`, un mensaje
+    que ya quedó registrado (el proceso murió antes de cerrarlo en la cola)
+    no se registra otra vez.
+    """
+    locales = _movimientos_locales(message_user, user_id)
+    if locales:
+        anotar("local")
+        return await run_db(registrar_movimientos, locales, user_id, fecha, origen)
+
+    content = await achat(
+        [{"role": "system", "content": _prompt(message_user)}],
+        temperature=0,
+    ) or ""
+    return await run_db(_procesar_respuesta, content, user_id, fecha, origen)
\ No newline at end of file
@@ -10,9 +10,14 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from core.executors import run_db, shutdown_executors
+from core.history_store import cerrar_persistencia
+from core.llm import cerrar_async
 from database.database import init_db, seed_db_from_test
 from routes.inventory_routes import router as inventory_router
 from routes.financial_routes import router as financial_router
+from routes.events_routes import router as events_router
+from routes.admin_routes import router as admin_router
 
 logger = logging.getLogger(__name__)
 
@@ -42,10 +47,22 @@ async def lifespan(app: FastAPI):
         # seed_db_from_test(user_id=get_or_create_user("TU_TELEGRAM_ID_AQUI"))
         logger.info("🌱 Modo desarrollo activo (seed por usuario, no global)")
 
+    if TELEGRAM_MODE == "webhook":
+        # El bot corre en este proceso y recibe los updates por /telegram/webhook
+        from bot.webhook import iniciar_webhook
+        await iniciar_webhook()
+        logger.info("🤖 Bot de Telegram en modo webhook")
+
     yield  # La app está corriendo
 
     # SHUTDOWN
     logger.info("🛑 ChatPyme cerrando...")
+    if TELEGRAM_MODE == "webhook":
+        from bot.webhook import detener_webhook
+        await detener_webhook()
+    await cerrar_async()
+    cerrar_persistencia()
+    shutdown_executors()
 
 
 # ─────────────────────────────────────────────
@@ -53,6 +70,8 @@ async def lifespan(app: FastAPI):
 # ─────────────────────────────────────────────
 
 ENV = os.getenv("ENV", "production")
+# "polling" (proceso aparte: python bot/Fina.py) o "webhook" (dentro de esta API)
+TELEGRAM_MODE = os.getenv("TELEGRAM_MODE", "polling")
 
 app = FastAPI(
     title="ChatPyme API",
@@ -87,6 +106,8 @@ app.add_middleware(
 
 app.include_router(inventory_router)
 app.include_router(financial_router)
+app.include_router(events_router)
+app.include_router(admin_router)
 
 
 # ─────────────────────────────────────────────
@@ -98,6 +119,8 @@ _optional_routers = [
     "routes.users_routes",
     "routes.registro_routes",
     "routes.alerts_routes",
+    # Requiere python-telegram-bot
+    "routes.telegram_routes",
 ]
 
 for module_name in _optional_routers:
@@ -127,13 +150,11 @@ def health():
 
 
 @app.get("/health", tags=["health"])
-def health_check():
+async def health_check():
     """Endpoint para Railway/GCP health checks."""
     try:
-        from database.database import get_db
-        conn = get_db()
-        conn.execute("SELECT 1")
-        conn.close()
+        from database.engine import get_engine
+        await run_db(lambda: get_engine().ping())
         db_status = "ok"
     except Exception as e:
         logger.error(f"DB health check failed: {e}")
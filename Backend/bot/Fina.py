@@ -0,0 +1,170 @@
+import sys
+from pathlib import Path
+from telegram import Update
+from telegram.ext import Application, CommandHandler, MessageHandler, ContextTypes, filters
+import logging
+import os
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from agents.parser_agent import procesar_diferido
+from core.deferred_queue import Drenador, set_notificador
+from core.debounce import Agrupador, set_agrupador
+from core.dispatcher import get_despachador
+from core.executors import run_db
+from core.history_store import cerrar_persistencia
+from core.llm import cerrar_async
+from core.orchestrator import procesar_mensaje_async
+from core.streaming import EdicionProgresiva
+from database.database import get_or_create_user
+
+TOKEN = os.getenv("TELEGRAM_TOKEN")
+# Servidor del Bot API (por defecto el de Telegram; uno local para pruebas)
+API_URL = os.getenv("TELEGRAM_API_URL", "")
+
+logger = logging.getLogger(__name__)
+
+
+async def start(update: Update, context: ContextTypes):
+    await update.message.reply_text(
+        "Hola, soy tu asesor financiero. ¿En qué puedo ayudarte hoy?"
+    )
+
+
+def _format_currency(value):
+    try:
+        n = int(value)
+        return f"${n:,}"
+    except:
+        return f"${value}"
+
+
+def _texto_respuesta(accion):
+    tipo = accion.get("type")
+
+    if tipo == "registro":
+        # El parserAgent ya registró y retorna un mensaje amigable
+        return accion.get("message") or "✅ Movimiento registrado"
+
+    if tipo == "resumen":
+        # El financial_agent retorna análisis completo en "data"
+        return accion.get("data") or accion.get("message") or "No tengo datos para analizar"
+
+    if tipo == "inventario":
+        return accion.get("message") or "No pude procesar tu solicitud"
+
+    if tipo == "conversacion":
+        return accion.get("message") or "No entiendo tu pregunta"
+
+    # Fallback si no matchea nada
+    return "No pude procesar tu solicitud. Intenta de nuevo."
+
+
+async def handle_message(update: Update, context: ContextTypes):
+    """
+    Pasa el mensaje al agrupador (junta ráfagas si TELEGRAM_DEBOUNCE_MS > 0)
+    y de ahí al despachador, que lo atiende en orden dentro del chat.
+    """
+    await _agrupador.agregar(update.effective_chat.id, update.message.text or "", update)
+
+
+async def _encolar(chat_id, texto, updates):
+    # Se responde al último fragmento del grupo
+    update = updates[-1]
+    if not get_despachador().enviar(chat_id, lambda: _atender(update, texto)):
+        await update.message.reply_text(
+            "Estoy atendiendo muchos mensajes ahora mismo. Dame unos segundos y vuelve a enviarlo 🙏"
+        )
+
+
+_agrupador = Agrupador(_encolar)
+
+
+async def _atender(update: Update, texto: str):
+    # Mensaje provisorio que se va editando con los tokens de los análisis
+    editor = EdicionProgresiva(
+        enviar=update.message.reply_text,
+        editar=lambda mensaje, contenido: mensaje.edit_text(contenido),
+    )
+    await editor.iniciar()
+
+    try:
+        # Tenant dueño de los datos: el usuario de Telegram que escribe (en
+        # canales no hay usuario, se usa el chat)
+        remitente = update.effective_user or update.effective_chat
+        user_id = await run_db(get_or_create_user, remitente.id)
+        accion = await procesar_mensaje_async(texto, al_token=editor.agregar,
+                                              chat_id=update.effective_chat.id, user_id=user_id)
+        msg = _texto_respuesta(accion or {})
+    except Exception:
+        logger.exception("[bot] Error procesando mensaje")
+        msg = "No pude procesar tu solicitud. Intenta de nuevo."
+
+    await editor.terminar(msg)
+
+
+async def iniciar_servicios(app: Application):
+    """Arranca el despachador y el drenado de diferidos (polling y webhook)."""
+    get_despachador().iniciar()
+    set_agrupador(_agrupador)
+    await _iniciar_diferidos(app)
+
+
+async def detener_servicios(app: Application):
+    await _agrupador.vaciar()
+    await get_despachador().detener()
+    await _detener_diferidos(app)
+    await cerrar_async()
+
+
+async def _iniciar_diferidos(app: Application):
+    """Drena los registros que quedaron en cola mientras el LLM no estaba y avisa por el chat."""
+    async def notificar(chat_id, texto):
+        await app.bot.send_message(chat_id=chat_id, text=texto)
+
+    set_notificador(notificar)
+    drenador = Drenador(procesar_diferido)
+    drenador.iniciar()
+    app.bot_data["drenador"] = drenador
+
+
+async def _detener_diferidos(app: Application):
+    drenador = app.bot_data.get("drenador")
+    if drenador:
+        await drenador.detener()
+    set_notificador(None)
+    # Lo que quede en el buffer del historial se escribe antes de salir
+    cerrar_persistencia()
+
+
+def crear_aplicacion(webhook: bool = False) -> Application:
+    """
+    Arma la Application con sus handlers.
+
+    Args:
+        webhook: Sin Updater: los updates no se piden a Telegram, llegan por
+            POST a la API (ver bot.webhook). Quien la usa arranca y detiene
+            los servicios a mano.
+    """
+    builder = Application.builder().token(TOKEN)
+    if API_URL:
+        builder = builder.base_url(f"{API_URL}/bot").base_file_url(f"{API_URL}/file/bot")
+    if webhook:
+        builder = builder.updater(None)
+    else:
+        builder = builder.post_init(iniciar_servicios).post_shutdown(detener_servicios)
+
+    app = builder.build()
+    app.add_handler(CommandHandler("start", start))
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    return app
+
+
+def main():
+    crear_aplicacion().run_polling()
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,126 @@
+"""
+Modo webhook del bot (TELEGRAM_MODE=webhook).
+
+En vez de un proceso aparte haciendo long polling, Telegram envía cada
+update por POST a /telegram/webhook de la API (routes.telegram_routes). El
+bot corre dentro del proceso de FastAPI: comparte el despachador, los pools
+de hilos y las conexiones a la BD, y se puede escalar detrás de un balanceador.
+
+Telegram reintenta un update si no recibe un 200 a tiempo. Los update_id ya
+aceptados se guardan en el motor de datos (tabla telegram_updates en SQLite,
+por UPDATES_TTL segundos), así una entrega repetida no vuelve a disparar
+llamadas al LLM ni registra dos veces un movimiento aunque llegue a otra
+réplica o después de un reinicio. Una caché en memoria ("telegram_updates")
+evita ir a la base con los reintentos que caen en el mismo proceso. Cada
+update se procesa a lo sumo una vez: si el procesamiento falla, Telegram no
+lo reenvía.
+
+TELEGRAM_WEBHOOK_SECRET es obligatorio: sin él el webhook no arranca, y la
+ruta rechaza todo update que no traiga ese valor como secret token. Con
+TELEGRAM_WEBHOOK_URL se registra el webhook al arrancar. Para probar sin
+Telegram: scripts/replay_updates.py.
+"""
+
+import logging
+import os
+from typing import Dict, Optional
+
+from telegram import Update
+
+from bot.Fina import crear_aplicacion, detener_servicios, iniciar_servicios
+from core.cache import get_cache
+from core.executors import run_db
+from database.engine import get_engine
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL", "")
+WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET", "")
+# Telegram deja de reintentar un update mucho antes de un día
+UPDATES_TTL = 86400
+
+_vistos = get_cache("telegram_updates", maxsize=50000, ttl=UPDATES_TTL)
+
+
+class BotWebhook:
+    """Application de python-telegram-bot sin Updater, alimentada por la API."""
+
+    def __init__(self):
+        self.app = crear_aplicacion(webhook=True)
+        self.recibidos = 0
+        self.duplicados = 0
+
+    async def iniciar(self) -> None:
+        await self.app.initialize()
+        await iniciar_servicios(self.app)
+        await self.app.start()
+        if WEBHOOK_URL:
+            await self.app.bot.set_webhook(
+                WEBHOOK_URL,
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES,
+            )
+            logger.info(f"[webhook] Webhook registrado en {WEBHOOK_URL}")
+
+    async def detener(self) -> None:
+        await self.app.stop()
+        await detener_servicios(self.app)
+        await self.app.shutdown()
+
+    async def procesar(self, data: Dict) -> bool:
+        """
+        Entrega un update al bot. Retorna False si ya se había recibido.
+
+        El handler solo encola el mensaje en el despachador, así que esto
+        vuelve enseguida y Telegram recibe su 200 sin esperar al LLM. Un
+        update marcado no se vuelve a procesar aunque después falle:
+        process_update no propaga los errores del handler (python-telegram-bot
+        los registra en el log) y lo que falle en el despachador ya ocurre
+        después de responder.
+        """
+        update_id = data["update_id"]
+        if _vistos.get(update_id) is not None:
+            self.duplicados += 1
+            return False
+
+        # Se marca antes de procesar: un reintento concurrente ya lo ve, en
+        # este proceso (la caché) o en otro (la base)
+        _vistos.set(update_id, True)
+        try:
+            nuevo = await run_db(get_engine().marcar_update, update_id, UPDATES_TTL)
+        except Exception:
+            _vistos.delete(update_id)
+            raise
+        if not nuevo:
+            self.duplicados += 1
+            return False
+
+        await self.app.process_update(Update.de_json(data, self.app.bot))
+        self.recibidos += 1
+        return True
+
+
+_webhook: Optional[BotWebhook] = None
+
+
+def get_webhook() -> Optional[BotWebhook]:
+    """El bot en modo webhook, o None si este proceso no lo inició."""
+    return _webhook
+
+
+async def iniciar_webhook() -> BotWebhook:
+    global _webhook
+    if not WEBHOOK_SECRET:
+        # Sin secreto cualquiera podría enviar updates falsos a la ruta
+        raise RuntimeError("TELEGRAM_WEBHOOK_SECRET es obligatorio en modo webhook")
+    if _webhook is None:
+        _webhook = BotWebhook()
+        await _webhook.iniciar()
+    return _webhook
+
+
+async def detener_webhook() -> None:
+    global _webhook
+    if _webhook is not None:
+        await _webhook.detener()
+        _webhook = None
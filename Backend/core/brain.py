@@ -1,13 +1,17 @@
-from openai import OpenAI
-from dotenv import load_dotenv
-from pathlib import Path
+import json
 import os
 
-env_path = Path(__file__).parent.parent / '.env'
-load_dotenv(dotenv_path=env_path)
+from core.cache import clave, get_cache
+from core.intent_classifier import get_classifier
+from core.ledger import agente, anotar
+from core.llm import achat, chat
+
+# Confianza mínima del clasificador local para no consultar al LLM
+INTENT_UMBRAL = float(os.getenv("INTENT_UMBRAL", "0.75"))
+
+# La intención solo depende del texto: no lleva versión de datos en la clave
+_cache_intenciones = get_cache("intenciones", maxsize=4096, ttl=3600)
 
-# Ahora sí, creamos el cliente
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 SYSTEM_PROMPT = """
 Eres el cerebro de un asistente inteligente para emprendedores.
 
@@ -47,13 +51,11 @@ IMPORTANTE:
 - El "intent" es CASO SENSIBLE
 """
 
-def decidir_intencion(texto):
-    """Decide la intención del usuario con detección local primero."""
+def _detectar_local(texto):
+    """Reglas por palabras clave; retorna el intent o None si no hay match."""
     
     texto_lower = texto.lower()
     
-    # 1. - DETECCION LOCAL
-
     # INVENTARIO
     if any(palabra in texto_lower for palabra in 
            ["agregar", "añadir", "crear producto", "insertar", "stock", 
@@ -73,19 +75,91 @@ def decidir_intencion(texto):
             "pagué", "pagué", "cobré", "cobre"]):
         return "registro"
     
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": texto}
-        ],
-        temperature=0
-    )
-
-    content = response.choices[0].message.content
-
-    import json
+    return None
+
+
+def _clasificar_local(texto):
+    """Reglas primero (precisas) y luego el clasificador entrenado si está seguro."""
+    intent = _detectar_local(texto)
+    if intent:
+        return intent
+    
+    clasificador = get_classifier()
+    if clasificador:
+        intent, confianza = clasificador.predict(texto)
+        if confianza >= INTENT_UMBRAL:
+            return intent
+    
+    return None
+
+
+def _mensajes(texto):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": texto}
+    ]
+
+
+def _interpretar(content):
     try:
         return json.loads(content)["intent"]
     except:
-        return "conversacion"
\ No newline at end of file
+        return "conversacion"
+
+
+@agente("brain")
+def intencion_local(texto):
+    """Intención sin consultar al LLM (caché, reglas, clasificador), o None."""
+    
+    key = clave(texto)
+    intent = _cache_intenciones.get(key)
+    if intent:
+        anotar("cache")
+        return intent
+    
+    intent = _clasificar_local(texto)
+    if intent:
+        anotar("local")
+        _cache_intenciones.set(key, intent)
+    return intent
+
+
+@agente("brain")
+def decidir_intencion(texto):
+    """Decide la intención del usuario con caché y detección local primero."""
+    
+    # 1. - CACHE Y DETECCION LOCAL
+    intent = intencion_local(texto)
+    if intent:
+        return intent
+    
+    # 2. - LLM
+    try:
+        content = chat(_mensajes(texto), temperature=0, timeout=10)
+    except Exception:
+        # No se cachea: es un fallback, no una clasificación
+        anotar("fallback")
+        return "conversacion"
+
+    intent = _interpretar(content)
+    _cache_intenciones.set(clave(texto), intent)
+    return intent
+
+
+@agente("brain")
+async def decidir_intencion_async(texto):
+    """Versión async de decidir_intencion (no bloquea el event loop)."""
+    
+    intent = intencion_local(texto)
+    if intent:
+        return intent
+    
+    try:
+        content = await achat(_mensajes(texto), temperature=0, timeout=10)
+    except Exception:
+        anotar("fallback")
+        return "conversacion"
+
+    intent = _interpretar(content)
+    _cache_intenciones.set(clave(texto), intent)
+    return intent
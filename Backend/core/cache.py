@@ -0,0 +1,151 @@
+"""
+Caché en memoria para respuestas que se repiten.
+
+Muchos mensajes de Telegram llegan casi idénticos ("hola", "cómo voy",
+"gracias"). Antes de pagar una llamada al LLM se busca aquí con una clave
+construida sobre el texto normalizado (minúsculas, sin tildes y con espacios
+colapsados), así "Hola  " y "hola" comparten entrada.
+
+Las entradas que dependen de los datos del negocio (los análisis generados)
+llevan en la clave la huella del contexto exacto que se manda al modelo: si
+los números cambian, la clave cambia y la entrada vieja deja de encontrarse
+sin invalidarla a mano; si no cambiaron, la respuesta tampoco tiene por qué
+cambiar.
+
+Cada caché es un LRU acotado con TTL y lleva sus contadores de aciertos,
+fallos y desalojos (expuestos en /api/admin/cache).
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Tuple
+
+from core.intent_classifier import normalizar
+
+_NO_ENCONTRADO = object()
+
+
+class TTLCache:
+    """LRU acotado con expiración por entrada, seguro entre hilos."""
+
+    def __init__(self, nombre: str, maxsize: int = 1024, ttl: float = 600):
+        self.nombre = nombre
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirados = 0
+        self.desalojados = 0
+
+    def get(self, clave: Hashable, default: Any = None) -> Any:
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._data.get(clave, _NO_ENCONTRADO)
+            if entrada is _NO_ENCONTRADO:
+                self.misses += 1
+                return default
+
+            expira, valor = entrada
+            if expira <= ahora:
+                del self._data[clave]
+                self.expirados += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(clave)
+            self.hits += 1
+            return valor
+
+    def set(self, clave: Hashable, valor: Any, ttl: float = None) -> None:
+        expira = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[clave] = (expira, valor)
+            self._data.move_to_end(clave)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.desalojados += 1
+
+    def delete(self, clave: Hashable) -> None:
+        with self._lock:
+            self._data.pop(clave, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "entradas": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / consultas, 4) if consultas else 0.0,
+                "expirados": self.expirados,
+                "desalojados": self.desalojados,
+            }
+
+
+def clave(texto: str, *partes: Hashable) -> Tuple:
+    """
+    Clave de caché sobre el texto normalizado.
+
+    Args:
+        texto: Mensaje del usuario.
+        *partes: Componentes extra (tenant, versión de datos, versión del
+            modelo...) que deben invalidar la entrada cuando cambian.
+    """
+    return (normalizar(texto),) + partes
+
+
+def huella(texto: str) -> str:
+    """Hash estable de un payload (p. ej. el contexto de datos de un prompt)."""
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+# Cachés del proceso
+_caches: Dict[str, TTLCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(nombre: str, maxsize: int = None, ttl: float = None) -> TTLCache:
+    """
+    Retorna (creándola si hace falta) la caché con ese nombre.
+
+    El tamaño y el TTL se pueden ajustar por entorno con
+    CACHE_<NOMBRE>_MAXSIZE y CACHE_<NOMBRE>_TTL.
+    """
+    with _caches_lock:
+        if nombre not in _caches:
+            prefijo = f"CACHE_{nombre.upper()}"
+            _caches[nombre] = TTLCache(
+                nombre,
+                maxsize=int(os.getenv(f"{prefijo}_MAXSIZE", maxsize or 1024)),
+                ttl=float(os.getenv(f"{prefijo}_TTL", ttl or 600)),
+            )
+        return _caches[nombre]
+
+
+def stats() -> Dict[str, Dict]:
+    """Métricas de todas las cachés del proceso."""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {c.nombre: c.stats() for c in caches}
+
+
+def clear_all() -> None:
+    """Vacía todas las cachés (útil para testing)."""
+    with _caches_lock:
+        caches = list(_caches.values())
+    for c in caches:
+        c.clear()
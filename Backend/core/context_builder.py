@@ -0,0 +1,213 @@
+"""
+Constructor de contexto con presupuesto de tokens.
+
+Los agentes mandaban el inventario y los movimientos completos como JSON con
+indentación: el prompt crecía lineal con el catálogo y terminaba pasándose
+del límite del modelo. Aquí el contexto se arma por secciones en orden de
+prioridad (agregados precalculados, productos en riesgo, detalle) y cada
+tabla se recorta a lo que quepa en el presupuesto.
+
+El tamaño se estima sin tokenizer: las palabras cuentan ~1 token por cada 4
+letras, los números ~1 por cada 3 dígitos y cada signo de puntuación 1. Es
+deliberadamente pesimista para texto en español.
+"""
+
+import math
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Sequence
+
+# Presupuesto por defecto del contexto de datos (sin contar el system prompt)
+PRESUPUESTO_TOKENS = int(os.getenv("CONTEXT_TOKENS", "1500"))
+TOP_RIESGO = 10
+
+_PIEZA = re.compile(r"[^\W\d_]+|\d+|[^\w\s]|_")
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimación rápida de tokens sin tokenizer."""
+    total = 0
+    for pieza in _PIEZA.findall(texto or ""):
+        if pieza.isdigit():
+            total += math.ceil(len(pieza) / 3)
+        elif pieza.isalpha():
+            total += math.ceil(len(pieza) / 4)
+        else:
+            total += 1
+    return total
+
+
+def _celda(valor) -> str:
+    if valor is None:
+        return ""
+    if isinstance(valor, float):
+        return f"{valor:.0f}" if valor == int(valor) else f"{valor:.2f}"
+    return str(valor).replace("|", "/").replace("\n", " ")
+
+
+class ContextBuilder:
+    """Arma el contexto por secciones sin pasarse del presupuesto."""
+
+    def __init__(self, presupuesto: int = None):
+        self.presupuesto = presupuesto or PRESUPUESTO_TOKENS
+        self.usados = 0
+        self._partes: List[str] = []
+
+    @property
+    def restante(self) -> int:
+        return self.presupuesto - self.usados
+
+    def _agregar(self, texto: str, tokens: int) -> None:
+        self._partes.append(texto)
+        self.usados += tokens
+
+    def seccion(self, texto: str) -> bool:
+        """Agrega un bloque completo si cabe. Retorna False si no cupo."""
+        tokens = estimar_tokens(texto) + 1
+        if tokens > self.restante:
+            return False
+        self._agregar(texto, tokens)
+        return True
+
+    def tabla(self, titulo: str, columnas: Sequence[str], filas: Iterable[Sequence],
+              total: Optional[int] = None) -> int:
+        """
+        Agrega una tabla compacta (columnas separadas por "|", encabezado una
+        vez) con tantas filas como quepan.
+
+        Args:
+            total: Cantidad total de filas, si `filas` es un iterador sin len.
+
+        Returns:
+            Filas incluidas.
+        """
+        encabezado = f"{titulo}\n" + "|".join(columnas)
+        # Se reserva espacio para la nota de filas omitidas
+        reserva = 12
+        costo = estimar_tokens(encabezado) + 1
+        if costo + reserva > self.restante:
+            return 0
+
+        lineas = [encabezado]
+        incluidas = 0
+        for fila in filas:
+            linea = "|".join(_celda(v) for v in fila)
+            tokens = estimar_tokens(linea) + 1
+            if costo + tokens + reserva > self.restante:
+                break
+            lineas.append(linea)
+            costo += tokens
+            incluidas += 1
+
+        if total is None and hasattr(filas, "__len__"):
+            total = len(filas)
+        if total is not None and total > incluidas:
+            nota = f"(... {total - incluidas} filas más omitidas)"
+            lineas.append(nota)
+            costo += estimar_tokens(nota) + 1
+
+        self._agregar("\n".join(lineas), costo)
+        return incluidas
+
+    def construir(self) -> str:
+        return "\n\n".join(self._partes)
+
+
+# ── Inventario ───────────────────────────────────────────────────────────────
+
+def _riesgo(p: Dict) -> tuple:
+    """Orden de riesgo: más bajo respecto al mínimo primero, luego más días quieto."""
+    actual = p.get("stock_actual") or 0
+    minimo = p.get("stock_minimo") or 0
+    cobertura = actual / minimo if minimo else (0 if actual <= 0 else math.inf)
+    return (cobertura, -(p.get("ultimo_movimiento_dias") or 0))
+
+
+def contexto_inventario(productos: List[Dict], presupuesto: int = None) -> str:
+    """
+    Contexto de inventario: agregados, productos en riesgo y el detalle que quepa.
+    """
+    builder = ContextBuilder(presupuesto)
+
+    if not productos:
+        builder.seccion("Inventario vacío: no hay productos registrados.")
+        return builder.construir()
+
+    bajos = [p for p in productos if (p.get("stock_actual") or 0) <= (p.get("stock_minimo") or 0)]
+    quietos = [p for p in productos if (p.get("ultimo_movimiento_dias") or 0) >= 30]
+    valor = sum((p.get("stock_actual") or 0) * (p.get("precio") or 0) for p in productos)
+
+    por_categoria: Dict[str, int] = {}
+    for p in productos:
+        cat = p.get("categoria") or "General"
+        por_categoria[cat] = por_categoria.get(cat, 0) + 1
+    categorias = sorted(por_categoria.items(), key=lambda kv: kv[1], reverse=True)
+
+    builder.seccion(
+        "RESUMEN\n"
+        f"productos={len(productos)} unidades={sum(p.get('stock_actual') or 0 for p in productos)} "
+        f"valor_total=${valor:,.0f} stock_bajo={len(bajos)} sin_movimiento_30d={len(quietos)} "
+        f"categorias={len(categorias)}"
+    )
+
+    columnas = ("producto", "stock", "min", "precio", "dias_sin_mov")
+    riesgo = sorted(productos, key=_riesgo)
+
+    builder.tabla(
+        f"EN RIESGO (top {TOP_RIESGO}, stock bajo o sin movimiento)",
+        columnas,
+        [_fila_producto(p) for p in riesgo[:TOP_RIESGO]],
+    )
+    builder.tabla("CATEGORIAS", ("categoria", "productos"), categorias)
+    builder.tabla(
+        "RESTO DEL CATALOGO",
+        columnas,
+        (_fila_producto(p) for p in riesgo[TOP_RIESGO:]),
+        total=max(len(riesgo) - TOP_RIESGO, 0),
+    )
+    return builder.construir()
+
+
+def _fila_producto(p: Dict) -> tuple:
+    return (
+        p.get("producto"),
+        p.get("stock_actual"),
+        p.get("stock_minimo"),
+        p.get("precio"),
+        p.get("ultimo_movimiento_dias"),
+    )
+
+
+# ── Finanzas ─────────────────────────────────────────────────────────────────
+
+def contexto_financiero(resumen: Dict, ultimos: List[Dict], dias: int = 30,
+                        presupuesto: int = None) -> str:
+    """Contexto financiero: totales, categorías y los últimos movimientos que quepan."""
+    builder = ContextBuilder(presupuesto)
+
+    builder.seccion(
+        f"TOTALES (últimos {dias} días)\n"
+        f"ingresos=${resumen['ingresos_total']:,.0f} gastos=${resumen['gastos_total']:,.0f} "
+        f"balance=${resumen['balance']:,.0f} movimientos={resumen['cantidad_movimientos']}"
+    )
+
+    for titulo, por_categoria, total in (
+        ("INGRESOS POR CATEGORIA", resumen["ingresos_por_categoria"], resumen["ingresos_total"]),
+        ("GASTOS POR CATEGORIA", resumen["gastos_por_categoria"], resumen["gastos_total"]),
+    ):
+        filas = [
+            (cat, monto, f"{monto / total:.0%}" if total else "")
+            for cat, monto in sorted(por_categoria.items(), key=lambda kv: kv[1], reverse=True)
+        ]
+        builder.tabla(titulo, ("categoria", "total", "porcentaje"), filas)
+
+    builder.tabla(
+        "ULTIMOS MOVIMIENTOS",
+        ("fecha", "tipo", "monto", "categoria", "descripcion"),
+        [
+            (str(m.get("fecha", ""))[:10], m.get("tipo"), m.get("monto"),
+             m.get("categoria"), (m.get("descripcion") or "")[:60])
+            for m in ultimos
+        ],
+    )
+    return builder.construir()
@@ -1,69 +1,234 @@
 """
 Gestor de historial de conversación para que los agentes recuerden el contexto
+
+El contexto que se pega en los prompts tiene un presupuesto de tokens
+(HISTORIAL_TOKENS). Cuando los mensajes recientes lo superan, los más viejos
+se condensan en un resumen rodante con heurísticas extractivas (sin LLM):
+de cada turno se conservan las frases con montos, cantidades o productos y
+se descarta el resto. Así el tamaño del prompt queda constante por turno
+sin perder los datos que el usuario acaba de mencionar.
+
+Los mensajes son registros con __slots__ y timestamp numérico en un buffer
+circular de capacidad fija (max_messages). Cada registro formatea su línea
+de contexto una sola vez, al agregarse, y el contexto completo se arma
+recién cuando se pide y queda memorizado hasta el próximo cambio: pedir el
+contexto varias veces en un turno (router, agente) no vuelve a formatear
+nada.
+
+Costo: agregar un mensaje es varias veces más lento que con la lista de
+dicts anterior, que no tenía presupuesto. Casi todo ese tiempo es
+estimar_tokens, que recorre el texto con una regex, y el presupuesto lo
+necesita al agregar para decidir qué se condensa; formatear la línea más
+tarde solo movería su costo (poco) a get_context, que se pide en cada
+turno. Sumando agregar y armar el contexto, un turno cuesta más que antes
+(del orden de x2.5 en el benchmark); a cambio el contexto se arma más
+rápido y su tamaño en tokens queda acotado, que es lo que pesa en el LLM.
+La memoria por mensaje es apenas menor (cada registro guarda el texto
+original y su línea). Ver scripts/bench_history.py.
 """
 
+import os
+import re
+import threading
+import time
+from collections import deque
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from core.context_builder import estimar_tokens
+
+# Presupuesto total del contexto (resumen + mensajes recientes)
+HISTORIAL_TOKENS = int(os.getenv("HISTORIAL_TOKENS", "600"))
+# Parte del presupuesto reservada al resumen de turnos viejos
+RESUMEN_TOKENS = int(os.getenv("HISTORIAL_RESUMEN_TOKENS", "150"))
+# Ningún mensaje ocupa más que esto en el contexto (las respuestas largas se recortan)
+MAX_TOKENS_MENSAJE = 150
+# Tokens por hecho del resumen
+MAX_TOKENS_HECHO = 40
+# Mensajes recientes que nunca se condensan
+MIN_RECIENTES = 2
+
+# Overhead aproximado (registro, línea formateada) por mensaje y por hecho del resumen
+_BYTES_MENSAJE = 250
+_BYTES_HECHO = 60
+
+# Tokens aproximados del autor ("Usuario: ") y de la cabecera "[HH:MM] Autor: " más el salto de línea
+_TOKENS_AUTOR = 3
+_TOKENS_CABECERA = 8
+
+SIN_HISTORIAL = "Sin historial previo."
+
+_FRASE = re.compile(r"(?<=[.!?\n])\s+")
+_DATO = re.compile(r"\d|\$|\bmil\b|\bstock\b|\bproduct|\bvend|\bcompr|\bgast|\bpag", re.IGNORECASE)
+
+
+def _recortar(texto: str, max_tokens: int) -> Tuple[str, int]:
+    """
+    Recorta por palabras hasta `max_tokens` (estimados), con "…" si cortó.
+    Retorna el texto y sus tokens, para no volver a estimarlos.
+    """
+    texto = " ".join(texto.split())
+    tokens = estimar_tokens(texto)
+    if tokens <= max_tokens:
+        return texto, tokens
+    palabras = []
+    usados = 1
+    for palabra in texto.split(" "):
+        costo = estimar_tokens(palabra)
+        if usados + costo > max_tokens:
+            break
+        usados += costo
+        palabras.append(palabra)
+    return " ".join(palabras) + "…", usados
+
+
+def _condensar(msg: "Mensaje") -> Optional[Tuple[str, int]]:
+    """
+    Hecho compacto (y sus tokens) de un mensaje que sale de la ventana
+    reciente, o None si no aporta nada (saludos, agradecimientos).
+
+    De las respuestas se quedan la primera frase y las que traen datos
+    (montos, cantidades, productos, stock); del usuario, el mensaje recortado.
+    """
+    texto = " ".join((msg.content or "").split())
+    if not texto:
+        return None
+
+    if msg.role == "user":
+        if not _DATO.search(texto) and len(texto.split()) < 4:
+            return None
+        hecho, tokens = _recortar(texto, MAX_TOKENS_HECHO)
+        return f"Usuario: {hecho}", tokens + _TOKENS_AUTOR
+
+    frases = [f for f in _FRASE.split(texto) if f]
+    elegidas = frases[:1] + [f for f in frases[1:] if _DATO.search(f)]
+    hecho, tokens = _recortar(" ".join(elegidas), MAX_TOKENS_HECHO)
+    return f"{msg.autor}: {hecho}", tokens + _TOKENS_AUTOR
+
+
+class Mensaje:
+    """Un mensaje del historial, con su línea de contexto ya formateada."""
+
+    __slots__ = ("role", "agent", "content", "ts", "metadata", "linea", "tokens")
+
+    def __init__(self, role: str, content: str, agent: str = None, ts: float = None,
+                 metadata: Dict = None):
+        self.role = role
+        self.agent = agent
+        self.content = content
+        self.ts = time.time() if ts is None else ts
+        self.metadata = metadata or None
+        hora = time.strftime("%H:%M", time.localtime(self.ts))
+        texto, tokens = _recortar(content, MAX_TOKENS_MENSAJE)
+        self.linea = f"[{hora}] {self.autor}: {texto}"
+        self.tokens = tokens + _TOKENS_CABECERA
+
+    @property
+    def autor(self) -> str:
+        return "Usuario" if self.role == "user" else (self.agent or "Agente")
+
+    def to_dict(self) -> Dict:
+        msg = {
+            "role": self.role,
+            "content": self.content,
+            "timestamp": datetime.fromtimestamp(self.ts).isoformat(),
+            "metadata": self.metadata or {},
+        }
+        if self.agent is not None:
+            msg["agent"] = self.agent
+        return msg
 
 
 class ConversationHistory:
-    """Mantiene el historial de conversación en memoria (sin persistencia)."""
+    """
+    Historial de conversación de una sesión, en memoria.
+
+    Las lecturas y escrituras se serializan con un lock propio: el mismo
+    historial puede tocarse desde el event loop y desde los pools de hilos.
+    Las sesiones por chat se administran en core.sessions; si la sesión
+    tiene `persistencia` (core.history_store), cada mensaje se anota ahí
+    para escribirse en segundo plano.
+    """
     
-    def __init__(self, user_id: str = "default", max_messages: int = 20):
+    def __init__(self, user_id: str = "default", max_messages: int = 20,
+                 presupuesto: int = None):
         self.user_id = user_id
-        self.messages: List[Dict] = []
         self.max_messages = max_messages
+        # Buffer circular: agregar y condensar el más viejo son O(1)
+        self.messages: Deque[Mensaje] = deque(maxlen=max_messages)
+        self.presupuesto = presupuesto or HISTORIAL_TOKENS
+        # Hechos condensados de los turnos viejos (más viejo primero)
+        self.resumen: List[str] = []
+        self._tokens_hechos: List[int] = []
+        self.resumidos = 0
+        self._tokens = 0
+        # Contexto completo ya armado (None = hay que rearmarlo)
+        self._contexto: Optional[str] = None
+        # Mensajes agregados desde el inicio de la sesión (numera los mensajes)
+        self.total = 0
+        self.persistencia = None
+        self._lock = threading.RLock()
     
     def add_user_message(self, mensaje: str, metadata: Dict = None) -> None:
         """Agrega mensaje del usuario al historial."""
-        self.messages.append({
-            "role": "user",
-            "content": mensaje,
-            "timestamp": datetime.now().isoformat(),
-            "metadata": metadata or {}
-        })
-        self._truncate()
+        self._agregar(Mensaje("user", mensaje, metadata=metadata))
     
     def add_agent_response(self, agent_name: str, response: str, metadata: Dict = None) -> None:
         """Agrega respuesta del agente al historial."""
-        self.messages.append({
-            "role": "assistant",
-            "agent": agent_name,
-            "content": response,
-            "timestamp": datetime.now().isoformat(),
-            "metadata": metadata or {}
-        })
-        self._truncate()
+        self._agregar(Mensaje("assistant", response, agent=agent_name, metadata=metadata))
+    
+    def _agregar(self, msg: Mensaje) -> None:
+        with self._lock:
+            if len(self.messages) == self.max_messages:
+                self._condensar_viejo()
+            self.messages.append(msg)
+            self._tokens += msg.tokens
+            seq = self.total
+            self.total += 1
+            self._truncate()
+            self._contexto = None
+            if self.persistencia is not None:
+                self.persistencia.anotar(self.user_id, seq, msg, list(self.resumen), self.resumidos)
+    
+    def restaurar(self, mensajes: Iterable[Mensaje], resumen: List[str], resumidos: int) -> None:
+        """Carga el estado guardado de la sesión (ver core.history_store)."""
+        with self._lock:
+            self.messages = deque(mensajes, maxlen=self.max_messages)
+            self.resumen = list(resumen)
+            self._tokens_hechos = [estimar_tokens(h) + 1 for h in self.resumen]
+            self.resumidos = resumidos
+            self.total = resumidos + len(self.messages)
+            self._tokens = sum(m.tokens for m in self.messages)
+            self._contexto = None
     
     def get_context(self, last_n: Optional[int] = None) -> str:
         """
-        Retorna los últimos N mensajes formateados como contexto para el LLM.
+        Retorna el resumen de los turnos viejos y los mensajes recientes
+        formateados como contexto para el LLM, dentro del presupuesto de tokens.
         
         Args:
-            last_n: Últimos N mensajes a incluir (default: 10)
+            last_n: Máximo de mensajes recientes a incluir (default: todos
+                los que quedan en la ventana)
         
         Returns:
             String con el historial formateado
         """
-        if not last_n:
-            last_n = min(10, len(self.messages))
-        
-        if not self.messages:
-            return "Sin historial previo."
-        
-        context_messages = self.messages[-last_n:]
-        formatted = []
-        
-        for msg in context_messages:
-            timestamp = msg.get("timestamp", "").split("T")[1][:5]  # HH:MM
+        with self._lock:
+            if not last_n or last_n >= len(self.messages):
+                if self._contexto is None:
+                    self._contexto = self._armar(self.messages)
+                return self._contexto
             
-            if msg["role"] == "user":
-                formatted.append(f"[{timestamp}] Usuario: {msg['content']}")
-            else:
-                agent = msg.get("agent", "Agente")
-                formatted.append(f"[{timestamp}] {agent}: {msg['content']}")
-        
-        return "\n".join(formatted)
+            inicio = len(self.messages) - last_n
+            return self._armar(self.messages[i] for i in range(inicio, len(self.messages)))
+    
+    def _armar(self, mensajes: Iterable[Mensaje]) -> str:
+        formatted = []
+        if self.resumen:
+            formatted.append("Resumen de lo conversado antes:")
+            formatted.extend(f"- {hecho}" for hecho in self.resumen)
+        formatted.extend(msg.linea for msg in mensajes)
+        return "\n".join(formatted) if formatted else SIN_HISTORIAL
     
     def get_system_context(self) -> str:
         """
@@ -75,16 +240,17 @@ class ConversationHistory:
         
         context = "HISTORIAL DE CONVERSACIÓN RECIENTE:\n"
         context += "=" * 50 + "\n"
-        context += self.get_context(last_n=15)
+        context += self.get_context()
         context += "\n" + "=" * 50 + "\n"
         
         return context
     
     def get_last_user_intent(self) -> Optional[str]:
         """Retorna el último mensaje del usuario."""
-        for msg in reversed(self.messages):
-            if msg["role"] == "user":
-                return msg["content"]
+        with self._lock:
+            for msg in reversed(self.messages):
+                if msg.role == "user":
+                    return msg.content
         return None
     
     def get_agent_context(self, agent_name: str, last_n: int = 5) -> str:
@@ -92,56 +258,83 @@ class ConversationHistory:
         Retorna contexto filtrado solo para un agente específico.
         Incluye mensajes del usuario y respuestas del agente.
         """
-        relevant = [m for m in self.messages[-last_n:] 
-                   if m["role"] == "user" or m.get("agent") == agent_name]
+        with self._lock:
+            ultimos = list(self.messages)[-last_n:]
+        relevant = [m for m in ultimos if m.role == "user" or m.agent == agent_name]
         
         if not relevant:
             return "Sin contexto previo para este agente."
         
         formatted = []
         for msg in relevant:
-            if msg["role"] == "user":
-                formatted.append(f"Usuario: {msg['content']}")
+            if msg.role == "user":
+                formatted.append(f"Usuario: {msg.content}")
             else:
-                formatted.append(f"{agent_name}: {msg['content']}")
+                formatted.append(f"{agent_name}: {msg.content}")
         
         return "\n".join(formatted)
     
     def clear(self) -> None:
         """Limpia el historial (para nuevas sesiones)."""
-        self.messages = []
+        with self._lock:
+            self.messages.clear()
+            self.resumen = []
+            self._tokens_hechos = []
+            self._tokens = 0
+            self._contexto = None
+            self.resumidos = 0
+            self.total = 0
+            if self.persistencia is not None:
+                self.persistencia.borrar(self.user_id)
+    
+    def bytes_aprox(self) -> int:
+        """Memoria aproximada que ocupa el historial (para las métricas de sesiones)."""
+        with self._lock:
+            return (
+                sum(_BYTES_MENSAJE + len(m.content) + len(m.linea) for m in self.messages)
+                + sum(_BYTES_HECHO + len(h) for h in self.resumen)
+            )
+    
+    def _condensar_viejo(self) -> None:
+        viejo = self.messages.popleft()
+        self._tokens -= viejo.tokens
+        self.resumidos += 1
+        condensado = _condensar(viejo)
+        if condensado:
+            hecho, tokens = condensado
+            self.resumen.append(hecho)
+            self._tokens_hechos.append(tokens + 1)
     
     def _truncate(self) -> None:
-        """Mantiene el historial dentro del límite de mensajes."""
-        if len(self.messages) > self.max_messages:
-            self.messages = self.messages[-self.max_messages:]
+        """
+        Mantiene el historial dentro del presupuesto de tokens, condensando
+        los mensajes más viejos en el resumen (el límite de mensajes lo da
+        la capacidad del buffer).
+        """
+        ventana = self.presupuesto - RESUMEN_TOKENS
+        while len(self.messages) > MIN_RECIENTES and self._tokens > ventana:
+            self._condensar_viejo()
+        
+        # El resumen también es rodante: se van los hechos más viejos
+        while self.resumen and sum(self._tokens_hechos) > RESUMEN_TOKENS:
+            self.resumen.pop(0)
+            self._tokens_hechos.pop(0)
     
     def get_summary(self) -> Dict:
         """Retorna estadísticas del historial."""
-        user_msgs = [m for m in self.messages if m["role"] == "user"]
-        agent_msgs = [m for m in self.messages if m["role"] == "assistant"]
+        with self._lock:
+            mensajes = list(self.messages)
+        user_msgs = [m for m in mensajes if m.role == "user"]
+        agent_msgs = [m for m in mensajes if m.role == "assistant"]
         
-        agents_used = set(m.get("agent") for m in agent_msgs)
+        agents_used = set(m.agent for m in agent_msgs)
         
         return {
-            "total_messages": len(self.messages),
+            "total_messages": len(mensajes),
             "user_messages": len(user_msgs),
             "agent_responses": len(agent_msgs),
             "agents_used": list(agents_used),
-            "is_empty": len(self.messages) == 0
+            "is_empty": len(mensajes) == 0 and not self.resumen,
+            "summarized_messages": self.resumidos,
+            "context_tokens": estimar_tokens(self.get_context()),
         }
-
-
-# Instancia global (por usuario podría ampliarse a usar session ID)
-_conversation_history = ConversationHistory()
-
-
-def get_history() -> ConversationHistory:
-    """Retorna la instancia global de historial."""
-    return _conversation_history
-
-
-def reset_history() -> None:
-    """Resetea el historial (útil para testing)."""
-    global _conversation_history
-    _conversation_history = ConversationHistory()
@@ -0,0 +1,158 @@
+"""
+Agrupación de ráfagas de mensajes por chat (debounce).
+
+Mucha gente escribe en fragmentos: "vendí", "3 gorras", "a 20 mil". Cada
+fragmento por separado pasa por la clasificación y el agente (varias
+llamadas al LLM) y, peor, ninguno se entiende solo. Con TELEGRAM_DEBOUNCE_MS
+> 0, los mensajes de un chat que llegan a menos de esa distancia entre sí se
+juntan en uno solo ("vendí 3 gorras a 20 mil") y se procesan en una corrida.
+
+El buffer de cada chat está acotado: se cierra de inmediato al juntar
+DEBOUNCE_MAX_MENSAJES fragmentos o DEBOUNCE_MAX_CARACTERES caracteres, y
+nunca espera más de DEBOUNCE_MAX_ESPERA_MS desde el primer fragmento,
+aunque el usuario siga escribiendo.
+
+Desactivado por defecto (TELEGRAM_DEBOUNCE_MS=0).
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEBOUNCE_MS = int(os.getenv("TELEGRAM_DEBOUNCE_MS", "0"))
+DEBOUNCE_MAX_MENSAJES = int(os.getenv("DEBOUNCE_MAX_MENSAJES", "5"))
+DEBOUNCE_MAX_CARACTERES = int(os.getenv("DEBOUNCE_MAX_CARACTERES", "1000"))
+DEBOUNCE_MAX_ESPERA_MS = int(os.getenv("DEBOUNCE_MAX_ESPERA_MS", "3000"))
+
+# Corrutina (chat, texto unido, items de cada fragmento) que procesa el grupo
+AlCerrar = Callable[[Hashable, str, List[Any]], Awaitable[None]]
+
+
+class _Rafaga:
+    __slots__ = ("textos", "items", "caracteres", "inicio", "timer")
+
+    def __init__(self):
+        self.textos: List[str] = []
+        self.items: List[Any] = []
+        self.caracteres = 0
+        self.inicio = time.monotonic()
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class Agrupador:
+    """
+    Junta los mensajes de cada chat que llegan dentro de la ventana.
+
+    Args:
+        al_cerrar: Corrutina que recibe el grupo ya cerrado.
+        ventana_ms: Silencio que cierra el grupo. 0 = sin agrupar.
+        max_mensajes, max_caracteres: Cierran el grupo apenas se alcanzan.
+        max_espera_ms: Tope desde el primer fragmento del grupo.
+    """
+
+    def __init__(self, al_cerrar: AlCerrar, ventana_ms: int = DEBOUNCE_MS,
+                 max_mensajes: int = DEBOUNCE_MAX_MENSAJES,
+                 max_caracteres: int = DEBOUNCE_MAX_CARACTERES,
+                 max_espera_ms: int = DEBOUNCE_MAX_ESPERA_MS):
+        self.al_cerrar = al_cerrar
+        self.ventana = ventana_ms / 1000
+        self.max_mensajes = max_mensajes
+        self.max_caracteres = max_caracteres
+        self.max_espera = max_espera_ms / 1000
+        self._rafagas: Dict[Hashable, _Rafaga] = {}
+        self._tareas = set()
+
+        self.mensajes = 0
+        self.grupos = 0
+        self.cierres_por_limite = 0
+
+    @property
+    def activo(self) -> bool:
+        return self.ventana > 0
+
+    async def agregar(self, chat: Hashable, texto: str, item: Any = None) -> None:
+        """Suma un fragmento al grupo del chat (o lo procesa ya si no se agrupa)."""
+        self.mensajes += 1
+        if not self.activo:
+            self.grupos += 1
+            await self.al_cerrar(chat, texto, [item])
+            return
+
+        rafaga = self._rafagas.get(chat)
+        if rafaga is None:
+            rafaga = self._rafagas[chat] = _Rafaga()
+        elif rafaga.caracteres + len(texto) > self.max_caracteres:
+            # El fragmento no entra: se cierra lo juntado y arranca otro grupo
+            self.cierres_por_limite += 1
+            self._cerrar(chat)
+            rafaga = self._rafagas[chat] = _Rafaga()
+
+        rafaga.textos.append(texto)
+        rafaga.items.append(item)
+        rafaga.caracteres += len(texto)
+
+        if rafaga.timer is not None:
+            rafaga.timer.cancel()
+            rafaga.timer = None
+
+        if len(rafaga.textos) >= self.max_mensajes or rafaga.caracteres >= self.max_caracteres:
+            self.cierres_por_limite += 1
+            self._cerrar(chat)
+            return
+
+        restante = self.max_espera - (time.monotonic() - rafaga.inicio)
+        espera = max(min(self.ventana, restante), 0)
+        rafaga.timer = asyncio.get_running_loop().call_later(espera, self._cerrar, chat)
+
+    def _cerrar(self, chat: Hashable) -> None:
+        rafaga = self._rafagas.pop(chat, None)
+        if rafaga is None:
+            return
+        if rafaga.timer is not None:
+            rafaga.timer.cancel()
+
+        self.grupos += 1
+        texto = " ".join(t.strip() for t in rafaga.textos if t.strip())
+        tarea = asyncio.get_running_loop().create_task(self._entregar(chat, texto, rafaga.items))
+        self._tareas.add(tarea)
+        tarea.add_done_callback(self._tareas.discard)
+
+    async def _entregar(self, chat: Hashable, texto: str, items: List[Any]) -> None:
+        try:
+            await self.al_cerrar(chat, texto, items)
+        except Exception:
+            logger.exception(f"[debounce] Error entregando el grupo del chat {chat}")
+
+    async def vaciar(self) -> None:
+        """Cierra todos los grupos abiertos y espera a que se entreguen (al apagar)."""
+        for chat in list(self._rafagas):
+            self._cerrar(chat)
+        if self._tareas:
+            await asyncio.gather(*self._tareas, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        return {
+            "ventana_ms": int(self.ventana * 1000),
+            "abiertos": len(self._rafagas),
+            "mensajes": self.mensajes,
+            "grupos": self.grupos,
+            "corridas_evitadas": self.mensajes - self.grupos,
+            "cierres_por_limite": self.cierres_por_limite,
+        }
+
+
+_agrupador: Optional[Agrupador] = None
+
+
+def set_agrupador(agrupador: Optional[Agrupador]) -> None:
+    """Registra el agrupador del bot (para las métricas de /api/admin/despachador)."""
+    global _agrupador
+    _agrupador = agrupador
+
+
+def get_agrupador() -> Optional[Agrupador]:
+    return _agrupador
@@ -0,0 +1,286 @@
+"""
+Cola durable de registros diferidos.
+
+Si el LLM no está disponible (sin API key, circuito abierto, timeouts) y un
+mensaje de registro no se pudo resolver localmente, el parser no lo
+rechaza: guarda el texto crudo aquí, responde con un acuse provisorio y
+sigue. Un drenador en segundo plano lo procesa por lotes cuando el backend
+vuelve y avisa al usuario del resultado.
+
+La cola es un archivo SQLite propio (DEFERRED_QUEUE_PATH), independiente
+del motor de datos: sobrevive reinicios aunque los datos estén en memoria.
+Los mensajes se toman con un "lease": si el proceso muere a mitad de un
+lote, pasado LEASE vuelven a estar pendientes. Los movimientos se guardan
+con la fecha del mensaje original, no la del procesamiento.
+
+La cola y los datos viven en bases distintas, así que registrar y cerrar el
+mensaje no puede ser una sola transacción. En cambio cada movimiento lleva
+como origen el id del mensaje ("diferido:<id>"): si el proceso muere entre
+el registro y el cierre, al volver a tomarlo el motor encuentra los
+movimientos ya guardados y no los duplica.
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from core.events import publish
+from core.executors import run_db
+from core.llm import disponible, es_transitorio
+
+logger = logging.getLogger(__name__)
+
+QUEUE_PATH = Path(os.getenv(
+    "DEFERRED_QUEUE_PATH", Path(__file__).parent.parent / "database" / "pendientes.db"
+))
+LOTE = int(os.getenv("DEFERRED_LOTE", "20"))
+INTERVALO = float(os.getenv("DEFERRED_INTERVALO", "15"))
+MAX_INTENTOS = int(os.getenv("DEFERRED_MAX_INTENTOS", "5"))
+# Un mensaje tomado y no resuelto en este tiempo vuelve a la cola
+LEASE = 600
+# Los mensajes resueltos se conservan unos días para auditoría
+RETENCION_DIAS = 7
+
+
+class ColaDiferida:
+    """Mensajes de registro pendientes de procesar, en SQLite."""
+
+    def __init__(self, path=QUEUE_PATH):
+        self.path = str(path)
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS registros_pendientes (
+                    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id     INTEGER,
+                    chat_id     INTEGER,
+                    texto       TEXT NOT NULL,
+                    fecha       TEXT NOT NULL,
+                    estado      TEXT NOT NULL DEFAULT 'pendiente',
+                    intentos    INTEGER NOT NULL DEFAULT 0,
+                    tomado_en   REAL,
+                    resuelto_en REAL,
+                    resultado   TEXT
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_pendientes_estado "
+                "ON registros_pendientes (estado, id)"
+            )
+
+    def encolar(self, texto: str, user_id: int = None, chat_id: int = None) -> int:
+        """Guarda un mensaje crudo y retorna su id. La fecha es la de ahora (UTC)."""
+        fecha = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO registros_pendientes (user_id, chat_id, texto, fecha) VALUES (?, ?, ?, ?)",
+                (user_id, chat_id, texto, fecha),
+            )
+            return cursor.lastrowid
+
+    def tomar(self, limite: int = LOTE) -> List[Dict]:
+        """Marca hasta `limite` pendientes como en proceso y los retorna (más viejos primero)."""
+        ahora = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE registros_pendientes SET estado = 'pendiente' "
+                    "WHERE estado = 'procesando' AND tomado_en < ?",
+                    (ahora - LEASE,),
+                )
+                filas = self._conn.execute(
+                    "SELECT * FROM registros_pendientes WHERE estado = 'pendiente' "
+                    "ORDER BY id LIMIT ?",
+                    (limite,),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE registros_pendientes SET estado = 'procesando', tomado_en = ?, "
+                    "intentos = intentos + 1 WHERE id = ?",
+                    [(ahora, f["id"]) for f in filas],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [dict(f, intentos=f["intentos"] + 1) for f in filas]
+
+    def resolver(self, id_pendiente: int, estado: str, resultado: str = "") -> None:
+        """Cierra un mensaje como 'registrado' o 'fallido'."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE registros_pendientes SET estado = ?, resultado = ?, resuelto_en = ? WHERE id = ?",
+                (estado, resultado, time.time(), id_pendiente),
+            )
+
+    def liberar(self, ids: List[int]) -> None:
+        """Devuelve mensajes tomados a la cola (el backend volvió a fallar)."""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE registros_pendientes SET estado = 'pendiente', tomado_en = NULL WHERE id = ?",
+                [(i,) for i in ids],
+            )
+
+    def limpiar(self, dias: int = RETENCION_DIAS) -> int:
+        """Borra los mensajes resueltos hace más de `dias` días."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM registros_pendientes "
+                "WHERE estado IN ('registrado', 'fallido') AND resuelto_en < ?",
+                (time.time() - dias * 86400,),
+            )
+            return cursor.rowcount
+
+    def stats(self) -> Dict:
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT estado, COUNT(*) AS n, MIN(fecha) AS mas_viejo "
+                "FROM registros_pendientes GROUP BY estado"
+            ).fetchall()
+        return {f["estado"]: {"cantidad": f["n"], "mas_viejo": f["mas_viejo"]} for f in filas}
+
+
+def origen(id_pendiente: int) -> str:
+    """Clave idempotente de los movimientos que genera un mensaje diferido."""
+    return f"diferido:{id_pendiente}"
+
+
+_cola: Optional[ColaDiferida] = None
+_cola_lock = threading.Lock()
+
+
+def get_cola() -> ColaDiferida:
+    global _cola
+    with _cola_lock:
+        if _cola is None:
+            _cola = ColaDiferida()
+        return _cola
+
+
+# ── Drenado ──────────────────────────────────────────────────────────────────
+
+Notificador = Callable[[int, str], Awaitable[None]]
+_notificador: Optional[Notificador] = None
+
+
+def set_notificador(notificador: Optional[Notificador]) -> None:
+    """Registra cómo avisar al usuario (p. ej. el bot: `(chat_id, texto)` → send_message)."""
+    global _notificador
+    _notificador = notificador
+
+
+class Drenador:
+    """
+    Procesa la cola por lotes mientras el LLM esté disponible.
+
+    Args:
+        procesar: Corrutina `(texto, user_id, fecha, origen)` que registra un
+            mensaje y retorna el dict del parser. `origen` identifica al
+            mensaje: registrarlo dos veces no debe duplicar movimientos. Debe lanzar la excepción si el LLM
+            falla de forma transitoria, para devolver el lote a la cola.
+    """
+
+    def __init__(self, procesar: Callable[..., Awaitable[Dict]], cola: ColaDiferida = None,
+                 lote: int = LOTE, intervalo: float = INTERVALO):
+        self.procesar = procesar
+        self.cola = cola or get_cola()
+        self.lote = lote
+        self.intervalo = intervalo
+        self._tarea: Optional[asyncio.Task] = None
+        self.procesados = 0
+
+    async def drenar(self) -> int:
+        """Procesa lotes hasta vaciar la cola o perder el LLM. Retorna cuántos resolvió."""
+        resueltos = 0
+        while disponible():
+            tomados = await run_db(self.cola.tomar, self.lote)
+            if not tomados:
+                break
+
+            for i, item in enumerate(tomados):
+                try:
+                    data = await self.procesar(item["texto"], item["user_id"], item["fecha"],
+                                               origen(item["id"]))
+                except Exception as e:
+                    if es_transitorio(e):
+                        # El backend volvió a caer: el resto espera al próximo ciclo
+                        restantes = tomados[i:]
+                        logger.warning(f"[diferidos] LLM no disponible, {len(restantes)} vuelven a la cola")
+                        await run_db(self._reintentar_o_fallar, restantes)
+                        return resueltos
+                    data = {"success": False, "message": str(e)}
+
+                await self._cerrar(item, data)
+                resueltos += 1
+
+        self.procesados += resueltos
+        return resueltos
+
+    def _reintentar_o_fallar(self, items: List[Dict]) -> None:
+        agotados = [i for i in items if i["intentos"] >= MAX_INTENTOS]
+        self.cola.liberar([i["id"] for i in items if i["intentos"] < MAX_INTENTOS])
+        for item in agotados:
+            self.cola.resolver(item["id"], "fallido", "LLM no disponible")
+
+    async def _cerrar(self, item: Dict, data: Dict) -> None:
+        ok = bool(data.get("success"))
+        await run_db(
+            self.cola.resolver, item["id"], "registrado" if ok else "fallido", data.get("message", "")
+        )
+
+        if ok:
+            aviso = f"Ya procesé tu mensaje pendiente \"{item['texto']}\":\n{data.get('message')}"
+        else:
+            aviso = (
+                f"No pude registrar tu mensaje pendiente \"{item['texto']}\". "
+                "¿Me lo envías de nuevo con el monto y la categoría?"
+            )
+
+        publish("registro_diferido", {
+            "id_pendiente": item["id"],
+            "registrado": ok,
+            "mensaje": data.get("message", ""),
+        }, tenant=item["user_id"])
+
+        if _notificador and item["chat_id"] is not None:
+            try:
+                await _notificador(item["chat_id"], aviso)
+            except Exception as e:
+                logger.warning(f"[diferidos] No se pudo avisar al chat {item['chat_id']}: {e}")
+
+    async def _correr(self) -> None:
+        ciclos = 0
+        while True:
+            try:
+                await self.drenar()
+                ciclos += 1
+                if ciclos % 1000 == 0:
+                    await run_db(self.cola.limpiar)
+            except Exception:
+                logger.exception("[diferidos] Error drenando la cola")
+            await asyncio.sleep(self.intervalo)
+
+    def iniciar(self) -> None:
+        """Arranca el drenado periódico en el event loop actual."""
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.get_running_loop().create_task(self._correr())
+
+    async def detener(self) -> None:
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
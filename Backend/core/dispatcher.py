@@ -0,0 +1,171 @@
+"""
+Despacho concurrente de mensajes con orden por chat.
+
+El bot no procesa los mensajes en el handler: los encola aquí y vuelve.
+Un pool acotado de workers (DISPATCH_WORKERS) los atiende: mensajes de
+chats distintos corren en paralelo, así una llamada lenta al LLM no frena
+a los demás, y los de un mismo chat se atienden de a uno y en orden de
+llegada (cada chat tiene su cola y a lo sumo un worker a la vez).
+
+Contrapresión: si un chat ya tiene DISPATCH_MAX_POR_CHAT mensajes en
+espera, o el total llega a DISPATCH_MAX_PENDIENTES, el mensaje se rechaza
+y el llamador le avisa al usuario en vez de acumular trabajo sin límite.
+
+Métricas (profundidad de colas, tiempo de espera p50/p95/p99, rechazos) en
+/api/admin/despachador.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Hashable, Optional, Tuple
+
+from core.ledger import percentil
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_WORKERS = int(os.getenv("DISPATCH_WORKERS", "8"))
+DISPATCH_MAX_POR_CHAT = int(os.getenv("DISPATCH_MAX_POR_CHAT", "20"))
+DISPATCH_MAX_PENDIENTES = int(os.getenv("DISPATCH_MAX_PENDIENTES", "1000"))
+# Esperas recientes que se usan para los percentiles
+VENTANA_ESPERAS = 1000
+
+Trabajo = Callable[[], Awaitable[None]]
+
+
+class Despachador:
+    """
+    Pool de workers con una cola FIFO por chat.
+
+    Args:
+        workers: Mensajes que se procesan a la vez (de chats distintos).
+        max_por_chat: Mensajes en espera por chat antes de rechazar.
+        max_pendientes: Mensajes en espera en total antes de rechazar.
+    """
+
+    def __init__(self, workers: int = DISPATCH_WORKERS, max_por_chat: int = DISPATCH_MAX_POR_CHAT,
+                 max_pendientes: int = DISPATCH_MAX_PENDIENTES):
+        self.workers = workers
+        self.max_por_chat = max_por_chat
+        self.max_pendientes = max_pendientes
+
+        self._colas: Dict[Hashable, Deque[Tuple[float, Trabajo]]] = {}
+        # Chats con trabajo esperando y sin worker asignado
+        self._listos: Optional[asyncio.Queue] = None
+        self._tareas = []
+        self.pendientes = 0
+        self.en_proceso = 0
+
+        self._esperas: Deque[float] = deque(maxlen=VENTANA_ESPERAS)
+        self.encolados = 0
+        self.procesados = 0
+        self.errores = 0
+        self.rechazados = 0
+        self.max_profundidad = 0
+
+    def enviar(self, chat: Hashable, trabajo: Trabajo) -> bool:
+        """
+        Encola `trabajo` (corrutina sin argumentos) en la cola del chat.
+
+        Retorna False si se rechazó por contrapresión.
+        """
+        if self._listos is None:
+            raise RuntimeError("El despachador no está iniciado")
+
+        cola = self._colas.get(chat)
+        if (self.pendientes >= self.max_pendientes
+                or (cola is not None and len(cola) >= self.max_por_chat)):
+            self.rechazados += 1
+            return False
+
+        if cola is None:
+            # Chat sin cola = sin worker: pasa a la fila de listos
+            cola = self._colas[chat] = deque()
+            self._listos.put_nowait(chat)
+        cola.append((time.monotonic(), trabajo))
+
+        self.pendientes += 1
+        self.encolados += 1
+        self.max_profundidad = max(self.max_profundidad, len(cola))
+        return True
+
+    async def _worker(self) -> None:
+        while True:
+            chat = await self._listos.get()
+            cola = self._colas[chat]
+            encolado, trabajo = cola.popleft()
+            self.pendientes -= 1
+            self.en_proceso += 1
+            self._esperas.append(time.monotonic() - encolado)
+
+            try:
+                await trabajo()
+                self.procesados += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.errores += 1
+                logger.exception(f"[despachador] Error procesando un mensaje del chat {chat}")
+            finally:
+                self.en_proceso -= 1
+                # El chat vuelve al final de la fila: los demás no esperan a que vacíe su cola
+                if cola:
+                    self._listos.put_nowait(chat)
+                else:
+                    del self._colas[chat]
+
+    def iniciar(self) -> None:
+        """Arranca los workers en el event loop actual."""
+        if self._tareas:
+            return
+        self._listos = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        self._tareas = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def detener(self, espera: float = 10.0) -> None:
+        """Espera (hasta `espera` segundos) a que se vacíen las colas y detiene los workers."""
+        limite = time.monotonic() + espera
+        while (self.pendientes or self.en_proceso) and time.monotonic() < limite:
+            await asyncio.sleep(0.05)
+
+        for tarea in self._tareas:
+            tarea.cancel()
+        await asyncio.gather(*self._tareas, return_exceptions=True)
+        self._tareas = []
+        self._listos = None
+        self._colas.clear()
+        self.pendientes = 0
+
+    def stats(self) -> Dict:
+        esperas = sorted(self._esperas)
+        return {
+            "workers": self.workers,
+            "activo": bool(self._tareas),
+            "en_proceso": self.en_proceso,
+            "pendientes": self.pendientes,
+            "chats_en_cola": len(self._colas),
+            "profundidad_max_actual": max((len(c) for c in self._colas.values()), default=0),
+            "profundidad_max_historica": self.max_profundidad,
+            "max_por_chat": self.max_por_chat,
+            "max_pendientes": self.max_pendientes,
+            "encolados": self.encolados,
+            "procesados": self.procesados,
+            "errores": self.errores,
+            "rechazados": self.rechazados,
+            "espera_ms": {
+                p: round(percentil(esperas, q) * 1000, 1)
+                for p, q in (("p50", 50), ("p95", 95), ("p99", 99))
+            },
+        }
+
+
+_despachador: Optional[Despachador] = None
+
+
+def get_despachador() -> Despachador:
+    global _despachador
+    if _despachador is None:
+        _despachador = Despachador()
+    return _despachador
@@ -0,0 +1,136 @@
+"""
+Bus de eventos en proceso para avisar cambios de datos.
+
+Los servicios publican aquí cada escritura (movimientos, productos, inventario)
+y los suscriptores — por ejemplo el endpoint SSE del dashboard — reciben los
+deltas sin tener que consultar la base de datos periódicamente.
+
+Los servicios pueden publicar desde cualquier hilo (el threadpool de FastAPI,
+el bot de Telegram); cada suscriptor vive en un event loop de asyncio y recibe
+los eventos en su propia cola acotada.
+
+El bus es del proceso: solo ve las escrituras hechas en el mismo proceso que
+la API. El bot en modo polling corre aparte y sus registros no llegan aquí;
+en modo webhook (TELEGRAM_MODE=webhook) sí.
+"""
+
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Eventos pendientes por suscriptor antes de empezar a descartar los más viejos
+MAX_PENDIENTES = 100
+
+
+class Suscripcion:
+    """Cola de eventos de un cliente conectado."""
+
+    def __init__(self, tenant: int, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.tenant = tenant
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.descartados = 0
+
+    def acepta(self, evento: Dict) -> bool:
+        """Recibe los eventos de su tenant; un evento sin tenant va a todos."""
+        return evento["tenant"] is None or evento["tenant"] == self.tenant
+
+    def _entregar(self, evento: Dict) -> None:
+        """Encola el evento (se ejecuta dentro del loop del suscriptor)."""
+        if self.queue.full():
+            # Cliente lento: priorizamos los deltas más recientes
+            self.queue.get_nowait()
+            self.descartados += 1
+        self.queue.put_nowait(evento)
+
+    async def get(self) -> Dict:
+        return await self.queue.get()
+
+
+class EventBus:
+    """Pub/sub en memoria, seguro para publicar desde varios hilos."""
+
+    def __init__(self, max_pendientes: int = MAX_PENDIENTES):
+        self.max_pendientes = max_pendientes
+        self._subs: Set[Suscripcion] = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def publish(self, tipo: str, data: Dict, tenant: Optional[int] = None) -> Dict:
+        """
+        Publica un evento a los suscriptores interesados.
+
+        Args:
+            tipo: Nombre del evento (ej: "movimiento_creado").
+            data: Payload serializable a JSON.
+            tenant: user_id dueño del dato; None = evento global.
+
+        Returns:
+            El evento publicado (con id y timestamp).
+        """
+        evento = {
+            "id": next(self._ids),
+            "tipo": tipo,
+            "tenant": tenant,
+            "data": data,
+            "ts": time.time(),
+        }
+
+        with self._lock:
+            subs = list(self._subs)
+
+        for sub in subs:
+            if not sub.acepta(evento):
+                continue
+            try:
+                sub.loop.call_soon_threadsafe(sub._entregar, evento)
+            except RuntimeError:
+                # El loop del suscriptor ya se cerró
+                self.unsubscribe(sub)
+
+        return evento
+
+    def subscribe(self, tenant: int) -> Suscripcion:
+        """
+        Registra un suscriptor de un tenant. Debe llamarse desde un event loop
+        activo. No hay suscripción global: los datos de un tenant no se
+        mandan a otro.
+        """
+        if tenant is None:
+            raise ValueError("La suscripción necesita un tenant")
+        sub = Suscripcion(tenant, asyncio.get_running_loop(), self.max_pendientes)
+        with self._lock:
+            self._subs.add(sub)
+        logger.debug(f"[events] Nuevo suscriptor (tenant={tenant}), total={len(self._subs)}")
+        return sub
+
+    def unsubscribe(self, sub: Suscripcion) -> None:
+        with self._lock:
+            self._subs.discard(sub)
+
+    @property
+    def suscriptores(self) -> int:
+        with self._lock:
+            return len(self._subs)
+
+
+# Instancia global del proceso
+_event_bus = EventBus()
+
+
+def get_event_bus() -> EventBus:
+    """Retorna el bus de eventos del proceso."""
+    return _event_bus
+
+
+def publish(tipo: str, data: Dict, tenant: Optional[int] = None) -> None:
+    """Atajo para publicar sin romper la escritura si algo falla."""
+    try:
+        _event_bus.publish(tipo, data, tenant=tenant)
+    except Exception as e:
+        logger.debug(f"[events] No se pudo publicar {tipo} (no crítico): {e}")
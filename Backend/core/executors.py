@@ -0,0 +1,47 @@
+"""
+Pools de hilos acotados para trabajo bloqueante desde código async.
+
+SQLite y las llamadas síncronas a OpenAI bloquean el hilo que las ejecuta.
+En vez de usar el threadpool compartido de Starlette, cada tipo de trabajo
+tiene su propio pool: un análisis LLM lento nunca deja sin hilos a las
+consultas rápidas de resumen o inventario.
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DB_WORKERS = int(os.getenv("DB_WORKERS", "8"))
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", "4"))
+
+_db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+_llm_executor = ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix="llm")
+
+
+def _en_contexto(func, *args, **kwargs):
+    """Envuelve la llamada para que corra con los ContextVars del llamador (como asyncio.to_thread)."""
+    return functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+async def run_db(func, *args, **kwargs):
+    """Ejecuta una función de acceso a datos en el pool de BD y espera el resultado."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, _en_contexto(func, *args, **kwargs))
+
+
+async def run_llm(func, *args, **kwargs):
+    """Ejecuta una función que hace llamadas LLM bloqueantes en su propio pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_llm_executor, _en_contexto(func, *args, **kwargs))
+
+
+def shutdown_executors() -> None:
+    """Libera los pools al cerrar la aplicación."""
+    _db_executor.shutdown(wait=False, cancel_futures=True)
+    _llm_executor.shutdown(wait=False, cancel_futures=True)
+    logger.info("[executors] Pools de hilos cerrados")
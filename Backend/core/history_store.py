@@ -0,0 +1,299 @@
+"""
+Persistencia del historial de conversación (write-behind).
+
+Los mensajes de cada sesión se guardan en un SQLite propio
+(HISTORY_DB_PATH), pero no en el camino del mensaje: el historial anota
+cada mensaje en un buffer en memoria y un hilo de fondo lo vuelca por
+lotes, cada HISTORY_FLUSH_INTERVALO segundos o apenas junta
+HISTORY_FLUSH_LOTE mensajes. Junto con los mensajes se guarda el resumen
+rodante y cuántos mensajes ya se condensaron en él; las filas condensadas
+se borran en el mismo lote, así cada sesión ocupa en disco lo mismo que
+ocupaba en memoria.
+
+Tras un reinicio, o cuando una sesión fría se descartó de la RAM (ver
+core.sessions), el primer mensaje del chat la rehidrata desde aquí: la
+memoria queda acotada por los usuarios activos, no por todos los usuarios.
+
+Con HISTORY_DB_PATH vacío la persistencia se desactiva.
+"""
+
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from core.conversation_history import Mensaje
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DB_PATH = os.getenv(
+    "HISTORY_DB_PATH", str(Path(__file__).parent.parent / "database" / "historial.db")
+)
+FLUSH_LOTE = int(os.getenv("HISTORY_FLUSH_LOTE", "100"))
+FLUSH_INTERVALO = float(os.getenv("HISTORY_FLUSH_INTERVALO", "1.0"))
+# Sesiones sin mensajes en este tiempo se borran del disco
+RETENCION_DIAS = int(os.getenv("HISTORY_RETENCION_DIAS", "30"))
+# Si el disco falla, lo máximo que se retiene en el buffer antes de descartar
+MAX_PENDIENTES = 10000
+
+
+def _ts(valor) -> float:
+    """Timestamp numérico; acepta el formato ISO de las filas viejas."""
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return datetime.fromisoformat(valor).timestamp()
+
+
+class HistorialSQLite:
+    """Mensajes y resúmenes de las sesiones, con escritura diferida por lotes."""
+
+    def __init__(self, path: str = HISTORY_DB_PATH, lote: int = FLUSH_LOTE,
+                 intervalo: float = FLUSH_INTERVALO):
+        self.path = str(path)
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.lote = lote
+        self.intervalo = intervalo
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS historial_mensajes (
+                    sesion  TEXT NOT NULL,
+                    seq     INTEGER NOT NULL,
+                    role    TEXT NOT NULL,
+                    agent   TEXT,
+                    content TEXT NOT NULL,
+                    ts      REAL NOT NULL,
+                    PRIMARY KEY (sesion, seq)
+                ) WITHOUT ROWID
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS historial_sesiones (
+                    sesion      TEXT PRIMARY KEY,
+                    resumen     TEXT NOT NULL,
+                    resumidos   INTEGER NOT NULL,
+                    actualizado REAL NOT NULL
+                )
+            """)
+
+        # Buffer de escritura: filas de mensajes y último estado del resumen por sesión
+        self._pendientes: List[Tuple] = []
+        self._estados: Dict[str, Tuple[str, int]] = {}
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._cerrado = False
+
+        self.escritos = 0
+        self.lotes = 0
+        self.errores = 0
+        self.descartados = 0
+        self.cargadas = 0
+
+    # ── Escritura ────────────────────────────────────────────────────────────
+
+    def anotar(self, sesion: str, seq: int, msg: Mensaje, resumen: List[str], resumidos: int) -> None:
+        """Encola un mensaje y el estado del resumen de su sesión (no bloquea en disco)."""
+        fila = (sesion, seq, msg.role, msg.agent, msg.content, msg.ts)
+        with self._buffer_lock:
+            self._pendientes.append(fila)
+            self._estados[sesion] = (json.dumps(resumen, ensure_ascii=False), resumidos)
+            lleno = len(self._pendientes) >= self.lote
+
+        self._iniciar()
+        if lleno:
+            self._despertar.set()
+
+    def flush(self) -> int:
+        """Vuelca el buffer en una sola transacción. Retorna cuántos mensajes escribió."""
+        with self._flush_lock:
+            with self._buffer_lock:
+                filas, self._pendientes = self._pendientes, []
+                estados, self._estados = self._estados, {}
+            if not filas and not estados:
+                return 0
+
+            try:
+                self._escribir(filas, estados)
+            except Exception:
+                self.errores += 1
+                logger.exception("[historial] No se pudo volcar el buffer, se reintenta")
+                self._devolver(filas, estados)
+                return 0
+
+        self.escritos += len(filas)
+        self.lotes += 1
+        return len(filas)
+
+    def _escribir(self, filas: List[Tuple], estados: Dict[str, Tuple[str, int]]) -> None:
+        ahora = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO historial_mensajes "
+                    "(sesion, seq, role, agent, content, ts) VALUES (?, ?, ?, ?, ?, ?)",
+                    filas,
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO historial_sesiones (sesion, resumen, resumidos, actualizado) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(s, resumen, resumidos, ahora) for s, (resumen, resumidos) in estados.items()],
+                )
+                # Lo ya condensado en el resumen no se vuelve a cargar
+                self._conn.executemany(
+                    "DELETE FROM historial_mensajes WHERE sesion = ? AND seq < ?",
+                    [(s, resumidos) for s, (_, resumidos) in estados.items()],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _devolver(self, filas: List[Tuple], estados: Dict[str, Tuple[str, int]]) -> None:
+        with self._buffer_lock:
+            self._pendientes = filas + self._pendientes
+            for sesion, estado in estados.items():
+                self._estados.setdefault(sesion, estado)
+            sobrantes = len(self._pendientes) - MAX_PENDIENTES
+            if sobrantes > 0:
+                del self._pendientes[:sobrantes]
+                self.descartados += sobrantes
+                logger.warning(f"[historial] Buffer lleno, se descartaron {sobrantes} mensajes")
+
+    def borrar(self, sesion: str) -> None:
+        """Elimina la sesión del buffer y del disco."""
+        with self._flush_lock:
+            with self._buffer_lock:
+                self._pendientes = [f for f in self._pendientes if f[0] != sesion]
+                self._estados.pop(sesion, None)
+            with self._lock:
+                self._conn.execute("DELETE FROM historial_mensajes WHERE sesion = ?", (sesion,))
+                self._conn.execute("DELETE FROM historial_sesiones WHERE sesion = ?", (sesion,))
+
+    # ── Lectura ──────────────────────────────────────────────────────────────
+
+    def cargar(self, sesion: str, limite: int = 50) -> Optional[Tuple[List[Mensaje], List[str], int]]:
+        """
+        Estado guardado de una sesión: (mensajes no condensados, resumen,
+        mensajes ya resumidos), o None si no hay nada.
+
+        Vuelca antes el buffer, por si la sesión se descartó de la RAM con
+        mensajes todavía sin escribir.
+        """
+        self.flush()
+        with self._lock:
+            estado = self._conn.execute(
+                "SELECT resumen, resumidos FROM historial_sesiones WHERE sesion = ?", (sesion,)
+            ).fetchone()
+            if estado is None:
+                return None
+            filas = self._conn.execute(
+                "SELECT seq, role, agent, content, ts FROM historial_mensajes "
+                "WHERE sesion = ? AND seq >= ? ORDER BY seq DESC LIMIT ?",
+                (sesion, estado[1], limite),
+            ).fetchall()
+
+        mensajes = [
+            Mensaje(role, content, agent=agent, ts=_ts(ts))
+            for _, role, agent, content, ts in reversed(filas)
+        ]
+
+        self.cargadas += 1
+        # Si se cortó por el límite, lo anterior cuenta como resumido
+        resumidos = (filas[-1][0] if filas else estado[1])
+        return mensajes, json.loads(estado[0]), max(resumidos, estado[1])
+
+    # ── Mantenimiento ────────────────────────────────────────────────────────
+
+    def limpiar(self, dias: int = RETENCION_DIAS) -> int:
+        """Borra las sesiones sin actividad hace más de `dias` días."""
+        limite = time.time() - dias * 86400
+        with self._lock:
+            viejas = [s for (s,) in self._conn.execute(
+                "SELECT sesion FROM historial_sesiones WHERE actualizado < ?", (limite,)
+            )]
+            self._conn.executemany(
+                "DELETE FROM historial_mensajes WHERE sesion = ?", [(s,) for s in viejas]
+            )
+            self._conn.executemany(
+                "DELETE FROM historial_sesiones WHERE sesion = ?", [(s,) for s in viejas]
+            )
+        return len(viejas)
+
+    def _iniciar(self) -> None:
+        if self._hilo is not None or self._cerrado:
+            return
+        with self._flush_lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._correr, name="historial-flush", daemon=True)
+                self._hilo.start()
+                atexit.register(self.cerrar)
+
+    def _correr(self) -> None:
+        ultima_limpieza = time.monotonic()
+        while not self._cerrado:
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+            self.flush()
+            if time.monotonic() - ultima_limpieza > 3600:
+                ultima_limpieza = time.monotonic()
+                try:
+                    self.limpiar()
+                except Exception:
+                    logger.exception("[historial] Error limpiando sesiones viejas")
+
+    def cerrar(self) -> None:
+        """Detiene el hilo de fondo y vuelca lo pendiente."""
+        self._cerrado = True
+        self._despertar.set()
+        if self._hilo is not None and self._hilo is not threading.current_thread():
+            self._hilo.join(timeout=5)
+        self.flush()
+
+    def stats(self) -> Dict:
+        with self._buffer_lock:
+            pendientes = len(self._pendientes)
+        return {
+            "pendientes": pendientes,
+            "escritos": self.escritos,
+            "lotes": self.lotes,
+            "errores": self.errores,
+            "descartados": self.descartados,
+            "rehidratadas": self.cargadas,
+        }
+
+
+_persistencia: Optional[HistorialSQLite] = None
+_persistencia_lock = threading.Lock()
+
+
+def get_persistencia() -> Optional[HistorialSQLite]:
+    """Persistencia del historial del proceso, o None si HISTORY_DB_PATH está vacío."""
+    global _persistencia
+    if not HISTORY_DB_PATH:
+        return None
+    with _persistencia_lock:
+        if _persistencia is None:
+            _persistencia = HistorialSQLite()
+        return _persistencia
+
+
+def cerrar_persistencia() -> None:
+    """Vuelca lo pendiente al cerrar la aplicación."""
+    with _persistencia_lock:
+        persistencia = _persistencia
+    if persistencia is not None:
+        persistencia.cerrar()
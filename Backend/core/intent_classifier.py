@@ -0,0 +1,202 @@
+"""
+Clasificador local de intenciones (sin red).
+
+Regresión logística multinomial sobre n-gramas de caracteres y palabras
+hasheados a un vector disperso. Predecir cuesta microsegundos, así que
+decidir_intencion solo llama al LLM cuando la confianza queda bajo el umbral.
+
+La probabilidad se calibra con temperature scaling sobre un conjunto de
+validación, para que "0.9" signifique ~90% de aciertos y el umbral tenga
+sentido. El modelo se entrena con scripts/train_intent.py y se guarda como
+JSON en core/intent_model.json.
+"""
+
+import json
+import logging
+import math
+import random
+import unicodedata
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = Path(__file__).parent / "intent_model.json"
+EXAMPLES_PATH = Path(__file__).parent / "intent_examples.jsonl"
+
+INTENTS = ["registro", "resumen", "inventario", "conversacion"]
+DIM = 2 ** 14
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sin tildes y con espacios colapsados."""
+    texto = unicodedata.normalize("NFD", (texto or "").lower())
+    texto = "".join(c for c in texto if unicodedata.category(c) != "Mn")
+    return " ".join(texto.split())
+
+
+def features(texto: str, dim: int = DIM) -> Dict[int, float]:
+    """Vector disperso L2-normalizado de n-gramas (2-4 chars) y palabras."""
+    norm = normalizar(texto)
+    padded = f" {norm} "
+    conteo: Counter = Counter()
+
+    for n in (2, 3, 4):
+        for i in range(len(padded) - n + 1):
+            conteo[zlib.crc32(f"c{n}:{padded[i:i + n]}".encode()) % dim] += 1
+    for palabra in norm.split():
+        conteo[zlib.crc32(f"w:{palabra}".encode()) % dim] += 2
+
+    norma = math.sqrt(sum(v * v for v in conteo.values())) or 1.0
+    return {k: v / norma for k, v in conteo.items()}
+
+
+def _softmax(scores: List[float], temperatura: float = 1.0) -> List[float]:
+    scaled = [s / temperatura for s in scores]
+    m = max(scaled)
+    exps = [math.exp(s - m) for s in scaled]
+    total = sum(exps)
+    return [e / total for e in exps]
+
+
+class IntentClassifier:
+    """Modelo lineal: un vector de pesos (denso) y un bias por intención."""
+
+    def __init__(self, labels: List[str] = None, dim: int = DIM):
+        self.labels = list(labels or INTENTS)
+        self.dim = dim
+        self.weights = [[0.0] * dim for _ in self.labels]
+        self.bias = [0.0] * len(self.labels)
+        self.temperatura = 1.0
+
+    # ── Predicción ───────────────────────────────────────────────────────────
+
+    def _scores(self, x: Dict[int, float]) -> List[float]:
+        return [
+            b + sum(w[i] * v for i, v in x.items())
+            for w, b in zip(self.weights, self.bias)
+        ]
+
+    def predict_proba(self, texto: str) -> Dict[str, float]:
+        probs = _softmax(self._scores(features(texto, self.dim)), self.temperatura)
+        return dict(zip(self.labels, probs))
+
+    def predict(self, texto: str) -> Tuple[str, float]:
+        """Retorna (intención, confianza calibrada)."""
+        probs = self.predict_proba(texto)
+        label = max(probs, key=probs.get)
+        return label, probs[label]
+
+    # ── Entrenamiento ────────────────────────────────────────────────────────
+
+    def fit(self, ejemplos: List[Tuple[str, str]], epochs: int = 30, lr: float = 0.5,
+            l2: float = 1e-4, seed: int = 13) -> "IntentClassifier":
+        """SGD sobre la log-loss con regularización L2 (perezosa, por feature tocada)."""
+        rnd = random.Random(seed)
+        datos = [(features(t, self.dim), self.labels.index(y)) for t, y in ejemplos]
+
+        for epoch in range(epochs):
+            rnd.shuffle(datos)
+            paso = lr / (1 + epoch * 0.1)
+            for x, y in datos:
+                probs = _softmax(self._scores(x))
+                for k, p in enumerate(probs):
+                    grad = p - (1.0 if k == y else 0.0)
+                    w = self.weights[k]
+                    for i, v in x.items():
+                        w[i] -= paso * (grad * v + l2 * w[i])
+                    self.bias[k] -= paso * grad
+        return self
+
+    def calibrar(self, validacion: List[Tuple[str, str]]) -> float:
+        """Elige la temperatura que minimiza la log-loss en validación."""
+        datos = [(self._scores(features(t, self.dim)), self.labels.index(y)) for t, y in validacion]
+        if not datos:
+            return self.temperatura
+
+        def nll(temp):
+            return -sum(math.log(max(_softmax(s, temp)[y], 1e-12)) for s, y in datos) / len(datos)
+
+        candidatas = [0.25 * i for i in range(1, 41)]
+        self.temperatura = min(candidatas, key=nll)
+        return self.temperatura
+
+    # ── Persistencia ─────────────────────────────────────────────────────────
+
+    def to_dict(self) -> dict:
+        # Solo se guardan los pesos no nulos: el vector hasheado es muy disperso
+        return {
+            "labels": self.labels,
+            "dim": self.dim,
+            "temperatura": self.temperatura,
+            "bias": self.bias,
+            "weights": [
+                {str(i): round(v, 5) for i, v in enumerate(w) if abs(v) > 1e-5}
+                for w in self.weights
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "IntentClassifier":
+        model = cls(data["labels"], data["dim"])
+        model.temperatura = data["temperatura"]
+        model.bias = list(data["bias"])
+        for k, pesos in enumerate(data["weights"]):
+            for i, v in pesos.items():
+                model.weights[k][int(i)] = v
+        return model
+
+    def save(self, path: Path = MODEL_PATH) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), separators=(",", ":")), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path = MODEL_PATH) -> "IntentClassifier":
+        return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+
+
+def cargar_ejemplos(path: Path = EXAMPLES_PATH) -> List[Tuple[str, str]]:
+    """Lee ejemplos etiquetados en JSONL: {"texto": ..., "intent": ...}."""
+    ejemplos = []
+    with open(path, encoding="utf-8") as f:
+        for linea in f:
+            if linea.strip():
+                row = json.loads(linea)
+                ejemplos.append((row["texto"], row["intent"]))
+    return ejemplos
+
+
+def dividir(ejemplos: Iterable[Tuple[str, str]], fraccion: float = 0.2,
+            seed: int = 7) -> Tuple[List, List]:
+    """Separa entrenamiento y validación de forma estratificada por intención."""
+    rnd = random.Random(seed)
+    por_intent: Dict[str, List] = {}
+    for ej in ejemplos:
+        por_intent.setdefault(ej[1], []).append(ej)
+
+    train, valid = [], []
+    for grupo in por_intent.values():
+        rnd.shuffle(grupo)
+        corte = max(1, int(len(grupo) * fraccion))
+        valid += grupo[:corte]
+        train += grupo[corte:]
+    return train, valid
+
+
+_classifier: Optional[IntentClassifier] = None
+_cargado = False
+
+
+def get_classifier() -> Optional[IntentClassifier]:
+    """Modelo entrenado del proceso, o None si aún no se ha entrenado."""
+    global _classifier, _cargado
+    if not _cargado:
+        _cargado = True
+        try:
+            _classifier = IntentClassifier.load()
+        except FileNotFoundError:
+            logger.warning("[intent] No hay modelo entrenado; usa scripts/train_intent.py")
+        except Exception as e:
+            logger.error(f"[intent] No se pudo cargar el modelo: {e}")
+    return _classifier
@@ -0,0 +1,233 @@
+"""
+Registro de llamadas al LLM (ledger).
+
+Cada llamada que pasa por el gateway (core.llm) deja un registro con el
+agente y la intención que la originaron, tokens de prompt y de respuesta,
+latencia, reintentos y si terminó bien. Los agentes anotan además las
+llamadas que se evitaron: aciertos de caché, mensajes resueltos localmente
+(reglas, parser) y respuestas de fallback.
+
+El agente y la intención no viajan como parámetros: se fijan en un
+ContextVar con `atribuir` (o el decorador `agente`) y el gateway los lee al
+registrar, así funciona igual en código sync, async y en los pools de hilos
+(core.executors copia el contexto).
+
+Los registros van a un buffer circular en memoria (LEDGER_SIZE); el
+agregado por agente (percentiles de latencia, tokens, costo estimado) se
+recalcula como mucho cada LEDGER_AGREGACION segundos y se expone en
+/api/admin/llm/llamadas.
+"""
+
+import asyncio
+import functools
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+LEDGER_SIZE = int(os.getenv("LEDGER_SIZE", "5000"))
+LEDGER_AGREGACION = float(os.getenv("LEDGER_AGREGACION", "10"))
+
+# USD por millón de tokens (por defecto, precios de gpt-4o-mini)
+PRECIO_PROMPT = float(os.getenv("LLM_PRECIO_PROMPT", "0.15"))
+PRECIO_COMPLETION = float(os.getenv("LLM_PRECIO_COMPLETION", "0.60"))
+
+SIN_AGENTE = "desconocido"
+
+_atribucion: ContextVar[Tuple[str, Optional[str]]] = ContextVar(
+    "llm_atribucion", default=(SIN_AGENTE, None)
+)
+
+
+@contextmanager
+def atribuir(agente: str = None, intent: str = None):
+    """Atribuye las llamadas y eventos del bloque a un agente y/o intención."""
+    actual_agente, actual_intent = _atribucion.get()
+    token = _atribucion.set((agente or actual_agente, intent or actual_intent))
+    try:
+        yield
+    finally:
+        _atribucion.reset(token)
+
+
+def agente(nombre: str):
+    """Decorador: atribuye a `nombre` todo lo que haga la función (sync o async)."""
+    def decorador(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def envoltura_async(*args, **kwargs):
+                with atribuir(agente=nombre):
+                    return await func(*args, **kwargs)
+            return envoltura_async
+
+        @functools.wraps(func)
+        def envoltura(*args, **kwargs):
+            with atribuir(agente=nombre):
+                return func(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+class Registro:
+    """Una entrada del ledger: llamada al LLM ("llm") o evento sin llamada ("cache", "local", "fallback")."""
+
+    __slots__ = ("ts", "tipo", "agente", "intent", "latencia", "prompt_tokens",
+                 "completion_tokens", "reintentos", "ok", "error", "stream")
+
+    def __init__(self, tipo: str, agente: str, intent: Optional[str], latencia: float = 0.0,
+                 prompt_tokens: int = 0, completion_tokens: int = 0, reintentos: int = 0,
+                 ok: bool = True, error: str = None, stream: bool = False):
+        self.ts = time.time()
+        self.tipo = tipo
+        self.agente = agente
+        self.intent = intent
+        self.latencia = latencia
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.reintentos = reintentos
+        self.ok = ok
+        self.error = error
+        self.stream = stream
+
+    def to_dict(self) -> Dict:
+        return {campo: getattr(self, campo) for campo in self.__slots__}
+
+
+_CONTADOR_EVENTO = {"cache": "cache_hits", "local": "locales", "fallback": "fallbacks"}
+
+
+def percentil(ordenados: List[float], p: float) -> float:
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not ordenados:
+        return 0.0
+    indice = max(math.ceil(p / 100 * len(ordenados)) - 1, 0)
+    return ordenados[min(indice, len(ordenados) - 1)]
+
+
+def _costo(prompt_tokens: int, completion_tokens: int) -> float:
+    return (prompt_tokens * PRECIO_PROMPT + completion_tokens * PRECIO_COMPLETION) / 1_000_000
+
+
+class Ledger:
+    """Buffer circular de registros con agregado periódico por agente."""
+
+    def __init__(self, size: int = LEDGER_SIZE, agregacion: float = LEDGER_AGREGACION):
+        self._registros: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.agregacion = agregacion
+        self._agregado: Optional[Dict] = None
+        self._agregado_en = 0.0
+        self.total = 0
+
+    def agregar(self, registro: Registro) -> None:
+        with self._lock:
+            self._registros.append(registro)
+            self.total += 1
+
+    def recientes(self, cantidad: int = 20) -> List[Dict]:
+        with self._lock:
+            ultimos = list(self._registros)[-cantidad:] if cantidad > 0 else []
+        return [r.to_dict() for r in reversed(ultimos)]
+
+    def agregado(self, forzar: bool = False) -> Dict:
+        """
+        Métricas por agente sobre la ventana del buffer.
+
+        Se recalcula como mucho cada `agregacion` segundos; entre medio se
+        devuelve el último cálculo.
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            if (not forzar and self._agregado is not None
+                    and ahora - self._agregado_en < self.agregacion):
+                return self._agregado
+            registros = list(self._registros)
+            total = self.total
+
+        por_agente: Dict[str, Dict] = {}
+        latencias: Dict[str, List[float]] = {}
+        for r in registros:
+            a = por_agente.setdefault(r.agente, {
+                "llamadas": 0, "errores": 0, "reintentos": 0, "streams": 0,
+                "prompt_tokens": 0, "completion_tokens": 0,
+                "cache_hits": 0, "locales": 0, "fallbacks": 0, "intents": {},
+            })
+            if r.tipo != "llm":
+                a[_CONTADOR_EVENTO[r.tipo]] += 1
+                continue
+
+            a["llamadas"] += 1
+            a["errores"] += 0 if r.ok else 1
+            a["reintentos"] += r.reintentos
+            a["streams"] += 1 if r.stream else 0
+            a["prompt_tokens"] += r.prompt_tokens
+            a["completion_tokens"] += r.completion_tokens
+            if r.intent:
+                a["intents"][r.intent] = a["intents"].get(r.intent, 0) + 1
+            latencias.setdefault(r.agente, []).append(r.latencia)
+
+        for nombre, a in por_agente.items():
+            ordenadas = sorted(latencias.get(nombre, []))
+            a["latencia_ms"] = {
+                p: round(percentil(ordenadas, q) * 1000, 1)
+                for p, q in (("p50", 50), ("p95", 95), ("p99", 99))
+            }
+            a["costo_usd"] = round(_costo(a["prompt_tokens"], a["completion_tokens"]), 6)
+
+        agregado = {
+            "ventana": len(registros),
+            "capacidad": self._registros.maxlen,
+            "total_registrados": total,
+            "calculado_en": time.time(),
+            "agentes": por_agente,
+        }
+        with self._lock:
+            self._agregado = agregado
+            self._agregado_en = ahora
+        return agregado
+
+    def clear(self) -> None:
+        with self._lock:
+            self._registros.clear()
+            self._agregado = None
+            self.total = 0
+
+
+_ledger = Ledger()
+
+
+def get_ledger() -> Ledger:
+    return _ledger
+
+
+class Medicion:
+    """Mide una llamada al LLM desde que se pide hasta que termina."""
+
+    def __init__(self, stream: bool = False):
+        self.agente, self.intent = _atribucion.get()
+        self.inicio = time.monotonic()
+        self.reintentos = 0
+        self.stream = stream
+
+    def terminar(self, uso=None, error: Exception = None) -> None:
+        """Registra la llamada. `uso` es el objeto usage de la respuesta, si vino."""
+        _ledger.agregar(Registro(
+            "llm", self.agente, self.intent,
+            latencia=time.monotonic() - self.inicio,
+            prompt_tokens=getattr(uso, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(uso, "completion_tokens", 0) or 0,
+            reintentos=self.reintentos,
+            ok=error is None,
+            error=type(error).__name__ if error is not None else None,
+            stream=self.stream,
+        ))
+
+
+def anotar(tipo: str) -> None:
+    """Anota un evento sin llamada al LLM ("cache", "local" o "fallback") para el agente actual."""
+    agente_actual, intent = _atribucion.get()
+    _ledger.agregar(Registro(tipo, agente_actual, intent))
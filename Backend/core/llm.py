@@ -0,0 +1,511 @@
+"""
+Gateway compartido para las llamadas al LLM.
+
+Todos los agentes pasan por aquí en vez de crear su propio cliente OpenAI:
+  - Un solo cliente por proceso, con pool de conexiones HTTP keep-alive
+    (se evita un handshake TLS por llamada).
+  - Deadline por llamada que cubre también los reintentos.
+  - Reintentos acotados con backoff exponencial y jitter, solo para errores
+    transitorios (conexión, timeout, 429, 5xx).
+  - Límite de llamadas concurrentes para todo el proceso (hilos y event
+    loops juntos, ver Cupo), para que un pico no deje colgados a todos los
+    workers esperando al proveedor.
+  - Circuit breaker: tras varios fallos seguidos del backend las llamadas
+    fallan de inmediato (LLMUnavailable) durante un rato, y los agentes
+    responden con su análisis local en vez de esperar timeouts.
+  - Cada llamada queda en el ledger (core.ledger) con latencia, tokens y
+    reintentos, atribuida al agente que la hizo.
+
+Los agentes corren cada invocación bajo un Deadline total: el reintento de
+"recovery" solo se intenta si queda tiempo y el circuito está cerrado.
+
+Hay una variante async (achat / achat_completion) sobre AsyncOpenAI para el
+bot y las rutas async: la espera de la red no bloquea el event loop. Con
+`al_token`, achat pide la respuesta en streaming y entrega cada fragmento a
+medida que llega (el bot los va mostrando editando su mensaje).
+
+OPENAI_BASE_URL permite apuntar el gateway a un servidor local de prueba
+(ver scripts/fake_llm_server.py).
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import httpx
+from dotenv import load_dotenv
+from openai import (
+    APIConnectionError,
+    AsyncOpenAI,
+    InternalServerError,
+    OpenAI,
+    RateLimitError,
+)
+
+from core.ledger import Medicion
+
+load_dotenv(dotenv_path=Path(__file__).parent.parent / ".env")
+
+logger = logging.getLogger(__name__)
+
+MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+# Tiempo total de una invocación de agente (llamada principal + recovery)
+AGENT_DEADLINE = float(os.getenv("AGENT_DEADLINE", "15"))
+# Por debajo de este margen no vale la pena intentar otra llamada
+MIN_RESTANTE = 1.0
+
+BREAKER_FALLOS = int(os.getenv("LLM_BREAKER_FALLOS", "5"))
+BREAKER_ESPERA = float(os.getenv("LLM_BREAKER_ESPERA", "30"))
+
+# Backoff: base * 2^intento, con "full jitter" hasta ese tope
+BACKOFF_BASE = 0.25
+BACKOFF_MAX = 4.0
+
+_RETRYABLE = (APIConnectionError, RateLimitError, InternalServerError)
+
+
+class LLMUnavailable(Exception):
+    """No hay backend LLM utilizable (sin API key, saturado o circuito abierto)."""
+
+
+class CircuitBreaker:
+    """
+    Corta las llamadas al LLM cuando el backend viene fallando.
+
+    cerrado → abierto tras `fallos` errores transitorios seguidos. Pasados
+    `espera` segundos deja pasar una sola llamada de prueba (semiabierto):
+    si sale bien se cierra, si falla vuelve a abrirse. Si la prueba nunca
+    termina, pasado otro `espera` se permite una nueva.
+    """
+
+    def __init__(self, fallos: int = BREAKER_FALLOS, espera: float = BREAKER_ESPERA):
+        self.fallos = fallos
+        self.espera = espera
+        self._lock = threading.Lock()
+        self._estado = "cerrado"
+        self._seguidos = 0
+        self._abierto_desde = 0.0
+        self.aperturas = 0
+
+    def _enfriado(self) -> bool:
+        return time.monotonic() - self._abierto_desde >= self.espera
+
+    def permite(self) -> bool:
+        """True si la llamada puede salir (en semiabierto, solo la de prueba)."""
+        with self._lock:
+            if self._estado == "cerrado":
+                return True
+            if self._enfriado():
+                self._estado = "semiabierto"
+                self._abierto_desde = time.monotonic()
+                return True
+            return False
+
+    @property
+    def abierto(self) -> bool:
+        """True si ahora mismo una llamada sería rechazada."""
+        with self._lock:
+            return self._estado != "cerrado" and not self._enfriado()
+
+    def registrar(self, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self._estado = "cerrado"
+                self._seguidos = 0
+                return
+
+            self._seguidos += 1
+            if self._estado == "semiabierto" or self._seguidos >= self.fallos:
+                if self._estado != "abierto":
+                    self.aperturas += 1
+                    logger.error(f"[llm] Circuito abierto tras {self._seguidos} fallos seguidos")
+                self._estado = "abierto"
+                self._abierto_desde = time.monotonic()
+
+    def estado(self) -> Dict:
+        with self._lock:
+            return {
+                "estado": self._estado,
+                "fallos_seguidos": self._seguidos,
+                "aperturas": self.aperturas,
+            }
+
+
+class Deadline:
+    """Tiempo total disponible para una invocación de agente."""
+
+    def __init__(self, segundos: float = None):
+        self.fin = time.monotonic() + (segundos or AGENT_DEADLINE)
+
+    def restante(self) -> float:
+        return max(self.fin - time.monotonic(), 0.0)
+
+    def alcanza(self, minimo: float = MIN_RESTANTE) -> bool:
+        """True si vale la pena otra llamada: queda tiempo y el circuito está cerrado."""
+        return self.restante() >= minimo and not _breaker.abierto
+
+
+_breaker = CircuitBreaker()
+
+
+class Cupo:
+    """
+    Límite de llamadas en curso para todo el proceso: lo comparten los hilos
+    (chat) y todos los event loops (achat), así el pool de la API, el loop
+    del bot y los scripts no suman cada uno su propio límite.
+
+    Los que esperan desde un event loop no bloquean un hilo: dejan un future
+    que se despierta (call_soon_threadsafe) al liberarse un lugar y vuelven a
+    intentar tomarlo.
+    """
+
+    def __init__(self, limite: int):
+        self.limite = limite
+        self.en_curso = 0
+        self._cond = threading.Condition(threading.Lock())
+        self._esperando: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = set()
+
+    def _tomar_libre(self) -> bool:
+        # Requiere el lock
+        if self.en_curso < self.limite:
+            self.en_curso += 1
+            return True
+        return False
+
+    def tomar(self, timeout: float) -> bool:
+        """Toma un lugar esperando hasta `timeout` segundos (bloqueante)."""
+        with self._cond:
+            return self._cond.wait_for(self._tomar_libre, timeout=timeout)
+
+    async def atomar(self, timeout: float) -> bool:
+        """Como `tomar`, sin bloquear el event loop."""
+        loop = asyncio.get_running_loop()
+        fin = loop.time() + timeout
+        while True:
+            with self._cond:
+                if self._tomar_libre():
+                    return True
+                aviso = (loop, loop.create_future())
+                self._esperando.add(aviso)
+            try:
+                await asyncio.wait_for(aviso[1], timeout=max(fin - loop.time(), 0))
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                with self._cond:
+                    self._esperando.discard(aviso)
+
+    def liberar(self) -> None:
+        with self._cond:
+            self.en_curso -= 1
+            self._cond.notify()
+            esperando = list(self._esperando)
+        # Se despierta a todos los async: el primero que vuelva a tomar el lock gana
+        for loop, futuro in esperando:
+            try:
+                loop.call_soon_threadsafe(_despertar, futuro)
+            except RuntimeError:
+                pass  # loop cerrado
+
+
+def _despertar(futuro: asyncio.Future) -> None:
+    if not futuro.done():
+        futuro.set_result(None)
+
+
+_client: Optional[OpenAI] = None
+_client_lock = threading.Lock()
+_cupo = Cupo(MAX_CONCURRENCY)
+
+# El cliente async queda atado al event loop que lo creó:
+# uno por loop (el de la API, el del bot en polling, cada asyncio.run de un
+# script). Al cerrarse un loop su entrada desaparece sola; quien lo maneja
+# llama a cerrar_async() antes, para devolver las conexiones del pool.
+_async_clientes: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+def get_client() -> Optional[OpenAI]:
+    """Retorna el cliente compartido, o None si no hay API key configurada."""
+    global _client
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return None
+
+    with _client_lock:
+        if _client is None:
+            http_client = httpx.Client(
+                timeout=TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=MAX_CONCURRENCY * 2,
+                    max_keepalive_connections=MAX_CONCURRENCY,
+                    keepalive_expiry=60,
+                ),
+            )
+            _client = OpenAI(
+                api_key=api_key,
+                base_url=os.getenv("OPENAI_BASE_URL") or None,
+                timeout=TIMEOUT,
+                # Los reintentos los maneja el gateway, con deadline propio
+                max_retries=0,
+                http_client=http_client,
+            )
+        return _client
+
+
+def _get_async_client() -> Optional[AsyncOpenAI]:
+    """Cliente async compartido del event loop actual."""
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return None
+
+    loop = asyncio.get_running_loop()
+    cliente = _async_clientes.get(loop)
+    if cliente is None:
+        cliente = _async_clientes[loop] = AsyncOpenAI(
+            api_key=api_key,
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+            timeout=TIMEOUT,
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                timeout=TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=MAX_CONCURRENCY * 2,
+                    max_keepalive_connections=MAX_CONCURRENCY,
+                    keepalive_expiry=60,
+                ),
+            ),
+        )
+    return cliente
+
+
+async def cerrar_async() -> None:
+    """Cierra el cliente async del event loop actual (al apagar el bot o la API)."""
+    cliente = _async_clientes.pop(asyncio.get_running_loop(), None)
+    if cliente is not None:
+        await cliente.close()
+
+def disponible() -> bool:
+    """True si hay un backend LLM configurado y el circuito no está abierto."""
+    return get_client() is not None and not _breaker.abierto
+
+
+def get_breaker() -> CircuitBreaker:
+    return _breaker
+
+
+def es_transitorio(error: Exception) -> bool:
+    """True si el error es de disponibilidad del backend (vale la pena reintentar más tarde)."""
+    return isinstance(error, (LLMUnavailable, asyncio.TimeoutError) + _RETRYABLE)
+
+
+def _espera_backoff(intento: int) -> float:
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** intento)))
+
+
+def chat_completion(messages: List[Dict], temperature: float = 0, model: str = None,
+                    timeout: float = None, max_retries: int = None, **kwargs):
+    """
+    Ejecuta una chat completion y retorna la respuesta cruda del SDK.
+
+    Args:
+        messages: Mensajes en formato OpenAI.
+        timeout: Deadline total en segundos (incluye reintentos y espera de cupo).
+        max_retries: Reintentos para errores transitorios.
+        **kwargs: Parámetros extra para la API (tools, response_format, ...).
+
+    Raises:
+        LLMUnavailable: Sin API key, circuito abierto, o sin cupo de
+            concurrencia antes del deadline.
+        La última excepción del SDK si se agotan los reintentos o el deadline.
+    """
+    client = get_client()
+    if client is None:
+        raise LLMUnavailable("OPENAI_API_KEY no configurada")
+
+    deadline = time.monotonic() + (timeout or TIMEOUT)
+    retries = MAX_RETRIES if max_retries is None else max_retries
+    medicion = Medicion()
+
+    if not _cupo.tomar(timeout=max(deadline - time.monotonic(), 0)):
+        raise LLMUnavailable("Demasiadas llamadas LLM en curso")
+
+    try:
+        if not _breaker.permite():
+            raise LLMUnavailable("Circuito abierto: el backend LLM viene fallando")
+
+        intento = 0
+        while True:
+            restante = deadline - time.monotonic()
+            try:
+                response = client.chat.completions.create(
+                    model=model or MODEL,
+                    messages=messages,
+                    temperature=temperature,
+                    timeout=restante,
+                    **kwargs,
+                )
+                _breaker.registrar(True)
+                medicion.terminar(getattr(response, "usage", None))
+                return response
+            except _RETRYABLE as e:
+                espera = _espera_backoff(intento)
+                if intento >= retries or time.monotonic() + espera >= deadline:
+                    _breaker.registrar(False)
+                    medicion.terminar(error=e)
+                    raise
+                intento += 1
+                medicion.reintentos = intento
+                logger.warning(f"[llm] {type(e).__name__}, reintento {intento}/{retries} en {espera:.2f}s")
+                time.sleep(espera)
+            except Exception as e:
+                # El backend respondió (400, 401...): no es una falla de disponibilidad
+                _breaker.registrar(True)
+                medicion.terminar(error=e)
+                raise
+    finally:
+        _cupo.liberar()
+
+
+def chat(messages: List[Dict], temperature: float = 0, model: str = None,
+         timeout: float = None, **kwargs) -> Optional[str]:
+    """Como chat_completion, pero retorna solo el texto de la respuesta."""
+    response = chat_completion(messages, temperature=temperature, model=model,
+                               timeout=timeout, **kwargs)
+    return response.choices[0].message.content
+
+
+async def achat_completion(messages: List[Dict], temperature: float = 0, model: str = None,
+                           timeout: float = None, max_retries: int = None,
+                           medicion: Medicion = None, **kwargs):
+    """
+    Versión async de chat_completion (mismo deadline, reintentos y cupo).
+
+    Args:
+        medicion: Medición del ledger ya iniciada por quien llama. Si se
+            pasa, registrar la llamada exitosa queda a su cargo (los streams
+            se registran recién al terminar de leerse).
+    """
+    client = _get_async_client()
+    if client is None:
+        raise LLMUnavailable("OPENAI_API_KEY no configurada")
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + (timeout or TIMEOUT)
+    retries = MAX_RETRIES if max_retries is None else max_retries
+    propia = medicion is None
+    medicion = medicion or Medicion()
+
+    if not await _cupo.atomar(timeout=max(deadline - loop.time(), 0)):
+        raise LLMUnavailable("Demasiadas llamadas LLM en curso")
+
+    try:
+        if not _breaker.permite():
+            raise LLMUnavailable("Circuito abierto: el backend LLM viene fallando")
+
+        intento = 0
+        while True:
+            restante = deadline - loop.time()
+            try:
+                response = await client.chat.completions.create(
+                    model=model or MODEL,
+                    messages=messages,
+                    temperature=temperature,
+                    timeout=restante,
+                    **kwargs,
+                )
+                _breaker.registrar(True)
+                if propia:
+                    medicion.terminar(getattr(response, "usage", None))
+                return response
+            except _RETRYABLE as e:
+                espera = _espera_backoff(intento)
+                if intento >= retries or loop.time() + espera >= deadline:
+                    _breaker.registrar(False)
+                    medicion.terminar(error=e)
+                    raise
+                intento += 1
+                medicion.reintentos = intento
+                logger.warning(f"[llm] {type(e).__name__}, reintento {intento}/{retries} en {espera:.2f}s")
+                await asyncio.sleep(espera)
+            except Exception as e:
+                _breaker.registrar(True)
+                medicion.terminar(error=e)
+                raise
+    finally:
+        _cupo.liberar()
+
+
+async def achat_stream(messages: List[Dict], al_token: Callable[[str], Awaitable[None]],
+                       temperature: float = 0, model: str = None, timeout: float = None,
+                       **kwargs) -> str:
+    """
+    Pide la respuesta en streaming y llama a `al_token` con cada fragmento.
+
+    El deadline cubre también la lectura del stream: si los tokens dejan de
+    llegar a tiempo se lanza asyncio.TimeoutError. Los reintentos y el cupo
+    de concurrencia aplican hasta que el stream queda establecido.
+
+    Returns:
+        El texto completo de la respuesta.
+    """
+    loop = asyncio.get_running_loop()
+    fin = loop.time() + (timeout or TIMEOUT)
+    medicion = Medicion(stream=True)
+    # El último chunk trae el uso de tokens, para el ledger
+    kwargs.setdefault("stream_options", {"include_usage": True})
+    stream = await achat_completion(messages, temperature=temperature, model=model,
+                                    timeout=timeout, medicion=medicion, stream=True, **kwargs)
+
+    partes = []
+    uso = None
+    fragmentos = stream.__aiter__()
+    try:
+        while True:
+            try:
+                chunk = await asyncio.wait_for(fragmentos.__anext__(),
+                                               timeout=max(fin - loop.time(), 0))
+            except StopAsyncIteration:
+                break
+            uso = getattr(chunk, "usage", None) or uso
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                partes.append(delta)
+                await al_token(delta)
+    except Exception as e:
+        medicion.terminar(uso, error=e)
+        raise
+    finally:
+        cerrar = getattr(stream, "close", None)
+        if cerrar is not None:
+            await cerrar()
+
+    medicion.terminar(uso)
+    return "".join(partes)
+
+
+async def achat(messages: List[Dict], temperature: float = 0, model: str = None,
+                timeout: float = None, al_token: Callable[[str], Awaitable[None]] = None,
+                **kwargs) -> Optional[str]:
+    """
+    Como achat_completion, pero retorna solo el texto de la respuesta.
+
+    Si se pasa `al_token`, la respuesta se pide en streaming (ver achat_stream).
+    """
+    if al_token is not None:
+        return await achat_stream(messages, al_token, temperature=temperature, model=model,
+                                  timeout=timeout, **kwargs)
+
+    response = await achat_completion(messages, temperature=temperature, model=model,
+                                      timeout=timeout, **kwargs)
+    return response.choices[0].message.content
@@ -0,0 +1,442 @@
+"""
+Extractor local de movimientos financieros (sin red).
+
+La mayoría de los registros son frases obvias ("Vendí 3 camisetas a 20 mil",
+"Pagué el arriendo, 800.000"). Aquí se sacan tipo, monto y categoría con
+reglas, y el parser_agent solo consulta al LLM cuando el resultado es ambiguo.
+
+Gramática de montos colombiana:
+  - Separadores: "500.000" y "1.500.000" son miles; "1,5" es decimal.
+  - Multiplicadores: "mil", "k", "lucas", "millón/millones", "palos", "M".
+  - Palabras: "un millón", "medio palo", "dos palos 500", "1 millón y medio".
+  - "3 camisetas a 20 mil" es precio unitario (total 60.000); "por 20 mil" es total.
+
+Las categorías salen de un mapa de palabras clave por tipo, que cada tenant
+puede extender (ver set_categorias y CATEGORIAS_PATH).
+
+Un mensaje puede traer varios movimientos ("vendí 3 gorras por 60 mil y pagué
+40 mil de arriendo"): extraer_movimientos lo corta en cada verbo que tenga su
+propio monto y analiza cada parte por separado.
+"""
+
+import json
+import logging
+import os
+import re
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from core.intent_classifier import normalizar
+
+logger = logging.getLogger(__name__)
+
+# Overrides por tenant: {"<user_id>": {"gasto": {"Categoria": ["palabra", ...]}}}
+CATEGORIAS_PATH = Path(os.getenv(
+    "CATEGORIAS_PATH", Path(__file__).parent.parent / "database" / "categorias.json"
+))
+
+# ── Verbos → tipo ────────────────────────────────────────────────────────────
+
+# Se revisan primero: "me pagaron" es ingreso aunque contenga "pag"
+_INGRESO = re.compile(
+    r"\b(?:vend\w*|venta\w*|cobr\w*|factur\w*|me (?:pag|consign|transfir|abon)\w*|"
+    r"recib\w*|ingres\w*|entr(?:o|aron)|gane|ganamos|ganancia)\b"
+)
+_GASTO = re.compile(
+    r"\b(?:compr\w*|pag(?:ue|amos|aron|o|ar|a|ado|ada|os|ando)|gast\w*|invert\w*|inverti|"
+    r"transferi|consigne|abone|cancele|saque|sacamos)\b"
+)
+
+_VERBO = re.compile(f"{_INGRESO.pattern}|{_GASTO.pattern}")
+
+# Conectores que quedan al final de un segmento al cortar por verbos
+_CONECTOR_FINAL = re.compile(r"(?:[\s,;.]|\by\b|\btambi[eé]n\b|\badem[aá]s\b)+$", re.IGNORECASE)
+
+# Categoría cuando no hay palabra clave: un ingreso de una Mipyme casi
+# siempre es una venta y "compré X" es compra de mercancía. Un gasto sin
+# pista ("pagué 45 mil") queda ambiguo.
+_CATEGORIA_VERBO = re.compile(r"\bcompr\w*\b")
+_CATEGORIA_TIPO = {"ingreso": "Ventas"}
+
+CATEGORIAS_DEFAULT: Dict[str, Dict[str, List[str]]] = {
+    "ingreso": {
+        "Préstamos": ["prestamo", "credito", "prestaron"],
+        "Intereses": ["intereses", "rendimientos"],
+        "Ventas": ["venta", "ventas", "vendi", "vendimos", "cliente", "pedido"],
+    },
+    "gasto": {
+        "Arriendo": ["arriendo", "alquiler", "renta del local"],
+        "Servicios": ["luz", "agua", "internet", "gas", "energia", "servicios", "telefono"],
+        "Salarios": ["nomina", "sueldo", "sueldos", "salario", "salarios", "empleado",
+                     "empleada", "quincena", "trabajador", "ayudante"],
+        "Transporte": ["taxi", "gasolina", "transporte", "domicilio", "domicilios", "envio",
+                       "envios", "flete", "uber", "parqueadero", "pasajes"],
+        "Marketing": ["publicidad", "marketing", "anuncio", "anuncios", "facebook",
+                      "instagram", "volantes", "pauta", "tiktok"],
+        "Impuestos": ["impuesto", "impuestos", "dian", "iva", "predial", "retencion"],
+        "Insumos": ["insumos", "materia prima", "tela", "telas", "harina", "empaques",
+                    "empaque", "bolsas"],
+        "Mantenimiento": ["reparacion", "mantenimiento", "arreglo", "tecnico"],
+        "Proveedores": ["proveedor", "proveedores"],
+        "Compras": ["mercancia", "inventario", "surtido"],
+    },
+}
+
+# ── Montos ───────────────────────────────────────────────────────────────────
+
+_MULTIPLICADORES = {
+    "mil": 1_000, "k": 1_000, "luca": 1_000, "lucas": 1_000, "barras": 1_000,
+    "millon": 1_000_000, "millones": 1_000_000, "mill": 1_000_000, "m": 1_000_000,
+    "palo": 1_000_000, "palos": 1_000_000, "melones": 1_000_000,
+}
+
+_PALABRAS_NUMERO = {
+    "un": 1, "uno": 1, "una": 1, "medio": 0.5, "media": 0.5, "dos": 2, "tres": 3,
+    "cuatro": 4, "cinco": 5, "seis": 6, "siete": 7, "ocho": 8, "nueve": 9, "diez": 10,
+    "quince": 15, "veinte": 20, "treinta": 30, "cuarenta": 40, "cincuenta": 50,
+    "sesenta": 60, "setenta": 70, "ochenta": 80, "noventa": 90, "cien": 100,
+    "doscientos": 200, "trescientos": 300, "cuatrocientos": 400, "quinientos": 500,
+    "seiscientos": 600, "setecientos": 700, "ochocientos": 800, "novecientos": 900,
+}
+
+_MONEDA = {"pesos", "peso", "cop", "$"}
+_UNITARIO_DESPUES = ("c/u", "cada una", "cada uno", "la unidad", "por unidad", "c/una")
+
+# Palabras que pueden seguir a un monto sin que el número pase a ser una
+# cantidad de algo: "gasté 5000 en bolsas", "1500 cada una", "3000 de taxi"
+_NO_SUSTANTIVO = {
+    "de", "del", "en", "por", "para", "con", "y", "o", "a", "al", "cada", "c/u",
+    "el", "la", "los", "las", "lo", "que", "hoy", "ayer", "ya", "mas", "menos",
+}
+# Antes del número marcan precio: "a 1500 la unidad", "por 2000 cajas"
+_MARCA_PRECIO = {"a", "de", "por", "$"}
+
+_TOKEN = re.compile(r"\$?\d+(?:[.,]\d+)*[a-z]*|c/u|[a-z]+|\$")
+_NUM_SUFIJO = re.compile(r"^\$?(\d+(?:[.,]\d+)*)([a-z]*)$")
+
+
+def _numero(texto: str) -> float:
+    """
+    "500.000" → 500000, "1.500.000" → 1500000, "1,5" → 1.5, "1.234,5" → 1234.5.
+
+    Un separador seguido de exactamente 3 dígitos se toma como de miles.
+    """
+    partes = re.split(r"[.,]", texto)
+    if len(partes) == 1:
+        return float(texto)
+
+    if all(len(p) == 3 for p in partes[1:]) and len(set(re.findall(r"[.,]", texto))) == 1:
+        return float("".join(partes))
+
+    # El último separador es decimal; los anteriores, de miles
+    return float("".join(partes[:-1]) + "." + partes[-1])
+
+
+class Monto:
+    __slots__ = ("valor", "inicio", "fin", "explicito")
+
+    def __init__(self, valor: float, inicio: int, fin: int, explicito: bool):
+        self.valor = valor
+        self.inicio = inicio      # índice del primer token
+        self.fin = fin            # índice siguiente al último token
+        self.explicito = explicito  # lleva $, multiplicador, miles o "pesos"
+
+
+def _tokens(norm: str) -> List[str]:
+    return _TOKEN.findall(norm)
+
+
+def _leer_monto(tokens: List[str], i: int) -> Optional[Tuple[float, int, bool]]:
+    """Intenta leer un monto que empieza en tokens[i]. Retorna (valor, fin, explícito)."""
+    tok = tokens[i]
+    explicito = False
+
+    if tok == "$" and i + 1 < len(tokens):
+        i += 1
+        tok = tokens[i]
+        explicito = True
+
+    m = _NUM_SUFIJO.match(tok)
+    if m:
+        valor = _numero(m.group(1))
+        sufijo = m.group(2)
+        explicito = explicito or tok.startswith("$") or bool(re.search(r"\d[.,]\d{3}\b", m.group(1)))
+        if sufijo:
+            if sufijo not in _MULTIPLICADORES:
+                return None
+            valor *= _MULTIPLICADORES[sufijo]
+            explicito = True
+        fin = i + 1
+    elif tok in _PALABRAS_NUMERO:
+        valor = float(_PALABRAS_NUMERO[tok])
+        fin = i + 1
+        # Una palabra-número solo es dinero si la sigue un multiplicador
+        if fin >= len(tokens) or tokens[fin] not in _MULTIPLICADORES:
+            return None
+    elif tok == "mil":
+        # "mil pesos", "gasté mil en bolsas"
+        return 1_000, i + 1, True
+    else:
+        return None
+
+    # Multiplicador como palabra aparte: "20 mil", "1,5 millones", "2 palos"
+    ya_multiplicado = bool(m and m.group(2))
+    if not ya_multiplicado and fin < len(tokens) and tokens[fin] in _MULTIPLICADORES:
+        mult = _MULTIPLICADORES[tokens[fin]]
+        valor *= mult
+        fin += 1
+        explicito = True
+
+        if mult == 1_000_000 and fin < len(tokens):
+            # "un millón y medio", "un palo y medio"
+            if tokens[fin] == "y" and fin + 1 < len(tokens) and tokens[fin + 1] in ("medio", "media"):
+                valor += 500_000
+                fin += 2
+            else:
+                resto = _leer_resto_miles(tokens, fin)
+                if resto:
+                    valor += resto[0]
+                    fin = resto[1]
+
+    if fin < len(tokens) and tokens[fin] in _MONEDA:
+        explicito = True
+        fin += 1
+
+    return valor, fin, explicito
+
+
+def _leer_resto_miles(tokens: List[str], i: int) -> Optional[Tuple[float, int]]:
+    """Miles que siguen a los millones: "1 millón 200 mil", "dos palos 500"."""
+    tok = tokens[i]
+    if tok.isdigit():
+        n = int(tok)
+    elif tok in _PALABRAS_NUMERO and _PALABRAS_NUMERO[tok] >= 1:
+        n = _PALABRAS_NUMERO[tok]
+    else:
+        return None
+
+    if not 0 < n < 1000:
+        return None
+    fin = i + 1
+    if fin < len(tokens) and tokens[fin] in ("mil", "k", "lucas"):
+        fin += 1
+    return n * 1_000, fin
+
+
+def _montos(tokens: List[str]) -> List[Monto]:
+    montos = []
+    i = 0
+    while i < len(tokens):
+        leido = _leer_monto(tokens, i)
+        if leido:
+            valor, fin, explicito = leido
+            montos.append(Monto(valor, i, fin, explicito))
+            i = fin
+        else:
+            i += 1
+    return montos
+
+
+# ── Categorías por tenant ────────────────────────────────────────────────────
+
+_categorias_tenant: Dict[str, Dict[str, Dict[str, List[str]]]] = {}
+_cargado = False
+
+
+def _cargar_overrides() -> None:
+    global _cargado
+    _cargado = True
+    if not CATEGORIAS_PATH.exists():
+        return
+    try:
+        data = json.loads(CATEGORIAS_PATH.read_text(encoding="utf-8"))
+        for tenant, mapa in data.items():
+            set_categorias(tenant, mapa)
+    except Exception as e:
+        logger.error(f"[parser] No se pudo leer {CATEGORIAS_PATH}: {e}")
+
+
+def set_categorias(tenant, mapa: Dict[str, Dict[str, List[str]]]) -> None:
+    """
+    Registra palabras clave propias de un tenant.
+
+    Args:
+        tenant: user_id del negocio.
+        mapa: {"gasto": {"Categoria": ["palabra", ...]}, "ingreso": {...}}.
+            Se evalúan antes que las categorías por defecto.
+    """
+    _categorias_tenant[str(tenant)] = {
+        tipo: {cat: [normalizar(p) for p in palabras] for cat, palabras in por_cat.items()}
+        for tipo, por_cat in mapa.items()
+    }
+
+
+def get_categorias(tenant=None) -> Dict[str, Dict[str, List[str]]]:
+    """Mapa efectivo (overrides del tenant primero, luego el por defecto)."""
+    if not _cargado:
+        _cargar_overrides()
+
+    propio = _categorias_tenant.get(str(tenant), {}) if tenant is not None else {}
+    return {
+        tipo: {**propio.get(tipo, {}), **{c: p for c, p in defaults.items() if c not in propio.get(tipo, {})}}
+        for tipo, defaults in CATEGORIAS_DEFAULT.items()
+    }
+
+
+def _categoria(norm: str, tokens: List[str], tipo: str, tenant) -> Optional[str]:
+    texto = f" {' '.join(tokens)} "
+    for categoria, palabras in get_categorias(tenant).get(tipo, {}).items():
+        if any(f" {p} " in texto for p in palabras):
+            return categoria
+
+    if tipo == "gasto" and _CATEGORIA_VERBO.search(norm):
+        return "Compras"
+    return _CATEGORIA_TIPO.get(tipo)
+
+
+# ── Extracción ───────────────────────────────────────────────────────────────
+
+def _tipo(norm: str) -> Optional[str]:
+    es_ingreso = bool(_INGRESO.search(norm))
+    resto = _INGRESO.sub(" ", norm)
+    es_gasto = bool(_GASTO.search(resto))
+
+    if es_ingreso == es_gasto:
+        return None
+    return "ingreso" if es_ingreso else "gasto"
+
+
+def _cantidad(tokens: List[str], antes_de: int, ventana: int) -> Optional[int]:
+    """Cantidad de unidades antes del monto: "vendí 3 camisetas a ..."."""
+    for i in range(antes_de - 1, max(antes_de - ventana, 0) - 1, -1):
+        tok = tokens[i]
+        if tok.isdigit() and 1 < int(tok) < 1000:
+            return int(tok)
+        if tok in _PALABRAS_NUMERO and _PALABRAS_NUMERO[tok] > 1:
+            return int(_PALABRAS_NUMERO[tok])
+    return None
+
+
+def _dudoso(tokens: List[str], monto: Monto) -> bool:
+    """
+    Número suelto sin marca de dinero pegado a un sustantivo: "vendí 1000
+    camisetas" puede ser una cantidad y no $1000, así que decide el LLM.
+    """
+    if monto.explicito or monto.fin >= len(tokens):
+        return False
+    siguiente = tokens[monto.fin]
+    anterior = tokens[monto.inicio - 1] if monto.inicio > 0 else ""
+    return (siguiente.isalpha() and siguiente not in _NO_SUSTANTIVO
+            and anterior not in _MARCA_PRECIO)
+
+
+def _monto_total(tokens: List[str], monto: Monto) -> Tuple[float, Optional[int]]:
+    """Aplica la cantidad cuando el monto es un precio unitario."""
+    conector = tokens[monto.inicio - 1] if monto.inicio > 0 else ""
+    despues = " ".join(tokens[monto.fin:monto.fin + 2])
+
+    if conector in ("a", "c/u") or any(despues.startswith(u) for u in _UNITARIO_DESPUES):
+        ventana = 4    # "compré 20 metros de tela a 18 mil"
+    elif conector == "de":
+        ventana = 2    # "2 tortas de 35 mil", pero no "gasto de 60 mil"
+    else:
+        return monto.valor, None
+
+    cantidad = _cantidad(tokens, monto.inicio - 1, ventana)
+    if cantidad:
+        return monto.valor * cantidad, cantidad
+    return monto.valor, None
+
+
+def analizar(texto: str, tenant=None) -> Dict:
+    """
+    Extrae el movimiento de un mensaje sin llamar al LLM.
+
+    Returns:
+        {"tipo", "monto", "categoria", "descripcion", "cantidad",
+         "ambiguo": bool, "motivo": str | None}. Los campos que no se
+        pudieron determinar quedan en None.
+    """
+    norm = normalizar(texto)
+    tokens = _tokens(norm)
+    tipo = _tipo(norm)
+
+    candidatos = _montos(tokens)
+    # Los números sueltos pequeños ("3 camisetas") son cantidades, no dinero
+    montos = [m for m in candidatos if m.explicito or m.valor >= 1000]
+
+    resultado = {
+        "tipo": tipo,
+        "monto": None,
+        "categoria": _categoria(norm, tokens, tipo, tenant) if tipo else None,
+        "descripcion": (texto or "").strip()[:200],
+        "cantidad": None,
+        "ambiguo": False,
+        "motivo": None,
+    }
+
+    if len(montos) == 1:
+        resultado["monto"], resultado["cantidad"] = _monto_total(tokens, montos[0])
+
+    if not tipo:
+        resultado["motivo"] = "tipo"
+    elif not montos or (len(montos) == 1 and _dudoso(tokens, montos[0])):
+        resultado["monto"] = None
+        resultado["motivo"] = "monto"
+    elif len(montos) > 1:
+        resultado["motivo"] = "varios_montos"
+    elif not resultado["categoria"]:
+        resultado["motivo"] = "categoria"
+    resultado["ambiguo"] = resultado["motivo"] is not None
+    return resultado
+
+
+def _plano(texto: str) -> str:
+    """Minúsculas y sin tildes, carácter por carácter (conserva las posiciones)."""
+    return "".join(unicodedata.normalize("NFD", c.lower())[0] for c in texto)
+
+
+def _tiene_monto(texto: str) -> bool:
+    return any(m.explicito or m.valor >= 1000 for m in _montos(_tokens(normalizar(texto))))
+
+
+def _segmentos(texto: str) -> List[str]:
+    """Corta el mensaje en un trozo por verbo; un trozo sin monto se une al anterior."""
+    inicios = [m.start() for m in _VERBO.finditer(_plano(texto))]
+    if len(inicios) < 2:
+        return [texto]
+
+    cortes = [0] + inicios[1:] + [len(texto)]
+    segmentos: List[str] = []
+    for a, b in zip(cortes, cortes[1:]):
+        trozo = texto[a:b]
+        if segmentos and not _tiene_monto(trozo):
+            # "Ingreso de 2 millones por ventas del fin de semana"
+            segmentos[-1] += trozo
+        else:
+            segmentos.append(trozo)
+
+    if len(segmentos) > 1 and not _tiene_monto(segmentos[0]):
+        segmentos[1] = segmentos[0] + segmentos[1]
+        del segmentos[0]
+
+    return [_CONECTOR_FINAL.sub("", s).strip() for s in segmentos]
+
+
+def extraer_movimientos(texto: str, tenant=None) -> List[Dict]:
+    """
+    Extrae todos los movimientos de un mensaje (uno por segmento).
+
+    Returns:
+        Lista de resultados de analizar(), en el orden del mensaje.
+    """
+    return [analizar(segmento, tenant) for segmento in _segmentos(texto)]
+
+
+def parsear_movimiento(texto: str, tenant=None) -> Optional[Dict]:
+    """Movimiento listo para registrar, o None si hay que preguntarle al LLM."""
+    resultado = analizar(texto, tenant)
+    if resultado["ambiguo"]:
+        return None
+    return {k: resultado[k] for k in ("tipo", "monto", "categoria", "descripcion")}
@@ -1,55 +1,224 @@
-from agents.conversacional_agent import conversar
-from agents.inventory_agent import inventoryAgent
-from agents.financial_agent import obtener_estado_financiero
-from agents.parser_agent import parserAgent
-from core.conversation_history import get_history
+from agents.conversacional_agent import conversar, conversar_async
+from agents.inventory_agent import inventoryAgent, inventoryAgentAsync, registrar_producto
+from agents.financial_agent import obtener_estado_financiero, obtener_estado_financiero_async
+from agents.parser_agent import parserAgent, parserAgentAsync, registrar_movimientos
+from core.brain import decidir_intencion, decidir_intencion_async, intencion_local
+from core.executors import run_db
+from core.ledger import atribuir
+from core.router import enrutar, enrutar_async, usar_router
+from core.sessions import clave_sesion, get_sesiones
 
 
-def ejecutar_accion(intent, texto):
-    """Ejecuta la acción según el intent y mantiene historial."""
-    
-    historial = get_history()
+def _registro(historial, data):
+    respuesta = data.get("message", "Movimiento registrado")
+    historial.add_agent_response("ParserAgent", respuesta)
+    return {
+        "type": "registro",
+        "data": data,
+        "message": respuesta
+    }
+
+
+def _resumen(historial, data):
+    respuesta = data.get("data", data.get("message", "Análisis financiero"))
+    # El historial recorta y condensa por presupuesto de tokens
+    historial.add_agent_response("FinancialAgent", respuesta)
+    return {
+        "type": "resumen",
+        "data": data["data"] if isinstance(data, dict) and "data" in data else data,
+        "message": respuesta
+    }
+
+
+def _inventario(historial, respuesta):
+    if not respuesta or not respuesta.strip():
+        respuesta = (
+            "Revisé tu inventario, pero no pude generar el análisis en este momento. "
+            "¿Quieres que lo intente de nuevo?"
+        )
+
+    historial.add_agent_response("InventoryAgent", respuesta)
+    return {
+        "type": "inventario",
+        "message": respuesta
+    }
+
+
+def _conversacion(historial, respuesta):
+    historial.add_agent_response("ConversationalAgent", respuesta)
+    return {
+        "type": "conversacion",
+        "message": respuesta
+    }
+
+
+def _ejecutar(historial, intent, texto, chat_id=None, user_id=None):
+    # Las llamadas al LLM del agente quedan atribuidas a la intención en el ledger
+    with atribuir(intent=intent):
+        if intent == "registro":
+            return _registro(historial, parserAgent(texto, context=historial.get_context(),
+                                                    user_id=user_id, chat_id=chat_id))
+
+        if intent == "resumen":
+            return _resumen(historial, obtener_estado_financiero(context=historial.get_context(),
+                                                                 user_id=user_id))
+
+        if intent == "inventario":
+            return _inventario(historial, inventoryAgent(texto, context=historial.get_context(),
+                                                         user_id=user_id))
+
+        if intent == "conversacion":
+            return _conversacion(historial, conversar(texto, context=historial.get_context()))
+
+
+async def _ejecutar_async(historial, intent, texto, al_token=None, chat_id=None, user_id=None):
+    # Las llamadas al LLM del agente quedan atribuidas a la intención en el ledger
+    with atribuir(intent=intent):
+        if intent == "registro":
+            data = await parserAgentAsync(texto, context=historial.get_context(),
+                                          user_id=user_id, chat_id=chat_id)
+            return _registro(historial, data)
+
+        if intent == "resumen":
+            data = await obtener_estado_financiero_async(context=historial.get_context(),
+                                                         al_token=al_token, user_id=user_id)
+            return _resumen(historial, data)
+
+        if intent == "inventario":
+            respuesta = await inventoryAgentAsync(texto, context=historial.get_context(),
+                                                  al_token=al_token, user_id=user_id)
+            return _inventario(historial, respuesta)
+
+        if intent == "conversacion":
+            respuesta = await conversar_async(texto, context=historial.get_context())
+            return _conversacion(historial, respuesta)
+
+
+def _sesion(chat_id=None, user_id=None):
+    """Sesión (historial propio) del chat o usuario que envió el mensaje."""
+    return get_sesiones().obtener(clave_sesion(chat_id, user_id))
+
+
+async def _sesion_async(chat_id=None, user_id=None):
+    return await get_sesiones().obtener_async(clave_sesion(chat_id, user_id))
+
+
+def ejecutar_accion(intent, texto, chat_id=None, user_id=None):
+    """Ejecuta la acción según el intent y mantiene el historial del chat."""
+
+    historial = _sesion(chat_id, user_id).historial
     historial.add_user_message(texto)
-    
-    if intent == "registro":
-        data = parserAgent(texto, context=historial.get_context())
-        respuesta = data.get("message", "Movimiento registrado")
-        historial.add_agent_response("ParserAgent", respuesta)
-        return {
-            "type": "registro",
-            "data": data,
-            "message": respuesta
-        }
-
-    if intent == "resumen":
-        data = obtener_estado_financiero(context=historial.get_context())
-        respuesta = data.get("data", data.get("message", "Análisis financiero"))
-        historial.add_agent_response("FinancialAgent", respuesta[:100])  # Guardar resumen
-        return {
-            "type": "resumen",
-            "data": data["data"] if isinstance(data, dict) and "data" in data else data,
-            "message": respuesta
-        }
-
-    if intent == "inventario":
-        respuesta = inventoryAgent(texto, context=historial.get_context())
-        
-        if not respuesta or not respuesta.strip():
-            respuesta = (
-                "Revisé tu inventario, pero no pude generar el análisis en este momento. "
-                "¿Quieres que lo intente de nuevo?"
-            )
-        
-        historial.add_agent_response("InventoryAgent", respuesta[:100])
-        return {
-            "type": "inventario",
-            "message": respuesta
-        }
-        
+    return _ejecutar(historial, intent, texto, chat_id, user_id)
+
+
+async def ejecutar_accion_async(intent, texto, al_token=None, chat_id=None, user_id=None):
+    """Versión async de ejecutar_accion: los agentes no bloquean el event loop."""
+
+    sesion = await _sesion_async(chat_id, user_id)
+    async with sesion.turno:
+        sesion.historial.add_user_message(texto)
+        return await _ejecutar_async(sesion.historial, intent, texto, al_token, chat_id, user_id)
+
+
+# ─────────────────────────────────────────────
+# PUNTO DE ENTRADA ÚNICO
+# ─────────────────────────────────────────────
+
+def _despachar(historial, ruta, texto, chat_id=None, user_id=None):
+    """Ejecuta una ruta del router de tools contra los servicios (bloqueante)."""
+    intent = ruta["intent"]
+    argumentos = ruta["argumentos"]
+
+    if ruta["herramienta"] == "registrar_movimientos":
+        return _registro(historial, registrar_movimientos(argumentos.get("movimientos", []),
+                                                          user_id=user_id))
+
+    if ruta["herramienta"] == "agregar_producto":
+        return _inventario(historial, registrar_producto(argumentos, user_id=user_id))
+
     if intent == "conversacion":
-        respuesta = conversar(texto, context=historial.get_context())
-        historial.add_agent_response("ConversationalAgent", respuesta)
-        return {
-            "type": "conversacion",
-            "message": respuesta
-        }
\ No newline at end of file
+        return _conversacion(historial, ruta["mensaje"])
+
+    # Los análisis necesitan los datos reales: los genera el agente
+    return _ejecutar(historial, intent, texto, chat_id, user_id)
+
+
+async def _despachar_async(historial, ruta, texto, al_token=None, chat_id=None, user_id=None):
+    if ruta["herramienta"] == "registrar_movimientos":
+        data = await run_db(registrar_movimientos, ruta["argumentos"].get("movimientos", []),
+                            user_id=user_id)
+        return _registro(historial, data)
+
+    if ruta["herramienta"] == "agregar_producto":
+        return _inventario(historial, await run_db(registrar_producto, ruta["argumentos"],
+                                                   user_id=user_id))
+
+    if ruta["intent"] == "conversacion":
+        return _conversacion(historial, ruta["mensaje"])
+
+    return await _ejecutar_async(historial, ruta["intent"], texto, al_token, chat_id, user_id)
+
+
+def procesar_mensaje(texto, chat_id=None, user_id=None):
+    """
+    Decide la intención y ejecuta la acción de un mensaje.
+
+    Con ROUTER_MODE=tools, los mensajes que no se resuelven localmente usan
+    una sola llamada al LLM (core.router) en vez de clasificar y luego
+    ejecutar; si esa llamada falla se vuelve al flujo clásico.
+
+    Args:
+        chat_id: Chat de origen. Identifica la sesión (historial propio) y
+            sirve para avisar si un registro queda diferido hasta que vuelva
+            el LLM.
+        user_id: Tenant dueño de los datos. Si no hay chat, identifica la sesión.
+    """
+    if not usar_router():
+        return ejecutar_accion(decidir_intencion(texto), texto, chat_id, user_id)
+
+    intent = intencion_local(texto)
+    if intent:
+        return ejecutar_accion(intent, texto, chat_id, user_id)
+
+    historial = _sesion(chat_id, user_id).historial
+    historial.add_user_message(texto)
+
+    ruta = enrutar(texto, context=historial.get_context())
+    if ruta is None:
+        return _ejecutar(historial, decidir_intencion(texto), texto, chat_id, user_id)
+    return _despachar(historial, ruta, texto, chat_id, user_id)
+
+
+async def procesar_mensaje_async(texto, al_token=None, chat_id=None, user_id=None):
+    """
+    Versión async de procesar_mensaje.
+
+    Los mensajes de una misma sesión se procesan de a uno, en orden de
+    llegada; los de sesiones distintas corren en paralelo.
+
+    Args:
+        al_token: Corrutina opcional que recibe, a medida que se generan, los
+            fragmentos de los análisis (resumen e inventario). La acción
+            retornada trae igual el texto completo.
+        chat_id, user_id: Ver procesar_mensaje.
+    """
+    sesion = await _sesion_async(chat_id, user_id)
+    async with sesion.turno:
+        historial = sesion.historial
+
+        if not usar_router():
+            intent = await decidir_intencion_async(texto)
+            historial.add_user_message(texto)
+            return await _ejecutar_async(historial, intent, texto, al_token, chat_id, user_id)
+
+        historial.add_user_message(texto)
+
+        intent = intencion_local(texto)
+        if intent:
+            return await _ejecutar_async(historial, intent, texto, al_token, chat_id, user_id)
+
+        ruta = await enrutar_async(texto, context=historial.get_context())
+        if ruta is None:
+            intent = await decidir_intencion_async(texto)
+            return await _ejecutar_async(historial, intent, texto, al_token, chat_id, user_id)
+        return await _despachar_async(historial, ruta, texto, al_token, chat_id, user_id)
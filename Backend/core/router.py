@@ -0,0 +1,191 @@
+"""
+Router de una sola llamada con tool calling.
+
+En el modo clásico un mensaje cuesta al menos dos llamadas secuenciales al
+LLM: decidir_intencion para clasificar y luego la del agente (más la de
+recovery si la primera vuelve vacía). En este modo el modelo recibe las
+acciones disponibles como herramientas y en una sola respuesta elige la
+intención y trae los argumentos ya estructurados (movimientos, producto,
+pregunta de inventario); el orquestador los despacha directo a los servicios.
+Las conversaciones se responden en la misma llamada, como texto sin tool call.
+
+Se activa con ROUTER_MODE=tools (por defecto "clasico"). Los mensajes que
+se resuelven localmente (caché, reglas, clasificador) no llegan aquí.
+"""
+
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+
+from agents.conversacional_agent import SYSTEM_PROMPT as PERSONA
+from core.ledger import agente
+from core.llm import achat_completion, chat_completion
+
+logger = logging.getLogger(__name__)
+
+ROUTER_MODE = os.getenv("ROUTER_MODE", "clasico")
+
+_MOVIMIENTO = {
+    "type": "object",
+    "properties": {
+        "tipo": {"type": "string", "enum": ["ingreso", "gasto"]},
+        "monto": {"type": "number", "description": "Monto total en pesos, positivo"},
+        "categoria": {"type": "string", "description": "Ej: Ventas, Marketing, Salarios"},
+        "descripcion": {"type": "string"},
+    },
+    "required": ["tipo", "monto", "categoria"],
+}
+
+TOOLS: List[Dict] = [
+    {
+        "type": "function",
+        "function": {
+            "name": "registrar_movimientos",
+            "description": "Registra ventas, ingresos, compras o gastos que el usuario reporta. "
+                           "Un elemento por cada movimiento del mensaje.",
+            "parameters": {
+                "type": "object",
+                "properties": {"movimientos": {"type": "array", "items": _MOVIMIENTO}},
+                "required": ["movimientos"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "analizar_finanzas",
+            "description": "El usuario pide un resumen, balance o análisis de sus finanzas.",
+            "parameters": {"type": "object", "properties": {}},
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "consultar_inventario",
+            "description": "El usuario pregunta por su inventario, stock o productos.",
+            "parameters": {
+                "type": "object",
+                "properties": {"pregunta": {"type": "string"}},
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "agregar_producto",
+            "description": "El usuario pide agregar un producto nuevo al inventario.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "producto": {"type": "string"},
+                    "categoria": {"type": "string"},
+                    "stock_actual": {"type": "integer"},
+                    "stock_minimo": {"type": "integer"},
+                    "precio": {"type": "number"},
+                },
+                "required": ["producto"],
+            },
+        },
+    },
+]
+
+_INTENT_POR_TOOL = {
+    "registrar_movimientos": "registro",
+    "analizar_finanzas": "resumen",
+    "consultar_inventario": "inventario",
+    "agregar_producto": "inventario",
+}
+
+ROUTER_PROMPT = """
+Tienes herramientas para registrar movimientos, analizar finanzas y consultar
+o modificar el inventario. Si el mensaje pide una de esas acciones, llama a la
+herramienta correspondiente con los datos del mensaje (montos en pesos, ya
+multiplicados: "3 camisetas a 20 mil" son 60000). Si el mensaje es
+conversación, responde directamente como Fina, sin usar herramientas.
+"""
+
+
+def usar_router() -> bool:
+    return ROUTER_MODE == "tools"
+
+
+def _mensajes(texto: str, context: str = "") -> List[Dict]:
+    system = PERSONA + "\n" + ROUTER_PROMPT
+    if context:
+        system += f"\n\nCONTEXTO DE CONVERSACIÓN PREVIA:\n{context}"
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": texto},
+    ]
+
+
+def _interpretar(response) -> Optional[Dict]:
+    """
+    Convierte la respuesta del modelo en una ruta.
+
+    Returns:
+        {"intent", "herramienta", "argumentos", "mensaje"} o None si la
+        respuesta no sirve (ni tool call válida ni texto).
+    """
+    message = response.choices[0].message
+    llamadas = getattr(message, "tool_calls", None) or []
+
+    validas = []
+    for llamada in llamadas:
+        nombre = llamada.function.name
+        if nombre not in _INTENT_POR_TOOL:
+            continue
+        try:
+            argumentos = json.loads(llamada.function.arguments or "{}")
+        except json.JSONDecodeError:
+            logger.warning(f"[router] Argumentos inválidos para {nombre}")
+            continue
+        validas.append((nombre, argumentos))
+
+    if validas:
+        nombre, argumentos = validas[0]
+        if nombre == "registrar_movimientos":
+            # Llamadas paralelas de registro se juntan en una sola transacción
+            argumentos = {"movimientos": [
+                m for n, a in validas if n == nombre for m in a.get("movimientos", [])
+            ]}
+        return {
+            "intent": _INTENT_POR_TOOL[nombre],
+            "herramienta": nombre,
+            "argumentos": argumentos,
+            "mensaje": None,
+        }
+
+    if message.content and message.content.strip():
+        return {
+            "intent": "conversacion",
+            "herramienta": None,
+            "argumentos": {},
+            "mensaje": message.content.strip(),
+        }
+    return None
+
+
+@agente("router")
+def enrutar(texto: str, context: str = "") -> Optional[Dict]:
+    """Clasifica y extrae argumentos en una sola llamada. None si falla."""
+    try:
+        response = chat_completion(_mensajes(texto, context), temperature=0.3,
+                                   tools=TOOLS, tool_choice="auto")
+        return _interpretar(response)
+    except Exception as e:
+        logger.warning(f"[router] Falló el enrutamiento con tools: {e}")
+        return None
+
+
+@agente("router")
+async def enrutar_async(texto: str, context: str = "") -> Optional[Dict]:
+    """Versión async de enrutar."""
+    try:
+        response = await achat_completion(_mensajes(texto, context), temperature=0.3,
+                                          tools=TOOLS, tool_choice="auto")
+        return _interpretar(response)
+    except Exception as e:
+        logger.warning(f"[router] Falló el enrutamiento con tools: {e}")
+        return None
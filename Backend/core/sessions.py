@@ -0,0 +1,194 @@
+"""
+Sesiones de conversación por chat.
+
+Cada chat (o usuario, si no hay chat) tiene su propio historial: el
+contexto de un usuario no aparece en los prompts de otro. Las sesiones
+viven en un LRU acotado (SESSIONS_MAX) y las que pasan SESSIONS_TTL
+segundos sin uso se descartan, así la memoria queda acotada aunque el
+proceso atienda decenas de miles de chats; cada historial, a su vez, está
+acotado por su presupuesto de tokens (ver core.conversation_history).
+
+Con persistencia (core.history_store), descartar una sesión solo la saca
+de la RAM: sus mensajes ya están en disco o en el buffer de escritura, y el
+próximo mensaje del chat la rehidrata. La carga es una lectura de SQLite,
+por eso desde código async se usa `obtener_async`, que la hace en el pool
+de BD.
+
+Cada sesión lleva un asyncio.Lock de turno: los mensajes de un mismo chat
+se procesan de a uno y en orden, mientras chats distintos corren en
+paralelo. Una sesión con un turno en curso nunca se desaloja.
+
+Métricas (sesiones vivas, desalojos, memoria aproximada) en
+/api/admin/sesiones.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+from core.conversation_history import ConversationHistory
+from core.executors import run_db
+from core.history_store import HistorialSQLite, get_persistencia
+
+SESSIONS_MAX = int(os.getenv("SESSIONS_MAX", "10000"))
+SESSIONS_TTL = float(os.getenv("SESSIONS_TTL", "3600"))
+
+SIN_SESION = "default"
+
+
+class Sesion:
+    """Historial de un chat más el lock que ordena sus turnos."""
+
+    __slots__ = ("clave", "historial", "turno", "creada", "ultimo_uso")
+
+    def __init__(self, clave: Hashable, persistencia: HistorialSQLite = None):
+        self.clave = clave
+        self.historial = ConversationHistory(user_id=str(clave))
+        if persistencia is not None:
+            guardado = persistencia.cargar(self.historial.user_id, self.historial.max_messages)
+            if guardado:
+                self.historial.restaurar(*guardado)
+            self.historial.persistencia = persistencia
+        self.turno = asyncio.Lock()
+        self.creada = time.monotonic()
+        self.ultimo_uso = self.creada
+
+    def ocupada(self) -> bool:
+        return self.turno.locked()
+
+
+class SesionStore:
+    """LRU de sesiones con expiración por inactividad, seguro entre hilos."""
+
+    def __init__(self, maxsize: int = SESSIONS_MAX, ttl: float = SESSIONS_TTL,
+                 persistencia: HistorialSQLite = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.persistencia = persistencia
+        self._sesiones: "OrderedDict[Hashable, Sesion]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.creadas = 0
+        self.expiradas = 0
+        self.desalojadas = 0
+
+    def _tocar(self, clave: Hashable) -> Optional[Sesion]:
+        """Sesión en memoria (marcada como usada), o None. Requiere el lock."""
+        ahora = time.monotonic()
+        self._purgar(ahora)
+        sesion = self._sesiones.get(clave)
+        if sesion is not None:
+            sesion.ultimo_uso = ahora
+            self._sesiones.move_to_end(clave)
+        return sesion
+
+    def obtener(self, clave: Hashable = None) -> Sesion:
+        """
+        Retorna la sesión de `clave`, creándola (o rehidratándola desde la
+        persistencia) si no está en memoria. Puede leer de disco.
+        """
+        clave = SIN_SESION if clave is None else clave
+        with self._lock:
+            sesion = self._tocar(clave)
+            if sesion is not None:
+                return sesion
+
+        # La carga va fuera del lock para no frenar a las demás sesiones
+        nueva = Sesion(clave, self.persistencia)
+        with self._lock:
+            sesion = self._tocar(clave)
+            if sesion is not None:
+                return sesion
+            self._sesiones[clave] = nueva
+            self.creadas += 1
+            self._desalojar()
+            return nueva
+
+    async def obtener_async(self, clave: Hashable = None) -> Sesion:
+        """Como `obtener`, pero si hay que cargar la sesión lo hace en el pool de BD."""
+        with self._lock:
+            sesion = self._tocar(SIN_SESION if clave is None else clave)
+        if sesion is not None:
+            return sesion
+        return await run_db(self.obtener, clave)
+
+    def _purgar(self, ahora: float) -> None:
+        # El frente del LRU es lo menos usado: se corta en la primera sesión
+        # vigente, sin recorrer (ni copiar) el resto
+        while self._sesiones:
+            clave, sesion = next(iter(self._sesiones.items()))
+            if ahora - sesion.ultimo_uso < self.ttl:
+                break
+            if sesion.ocupada():
+                # Tiene un mensaje en curso: está en uso, pasa al final
+                sesion.ultimo_uso = ahora
+                self._sesiones.move_to_end(clave)
+                continue
+            del self._sesiones[clave]
+            self.expiradas += 1
+
+    def _desalojar(self) -> None:
+        # Las ocupadas pasan al final; a lo sumo una vuelta por si lo están todas
+        saltadas = 0
+        while len(self._sesiones) > self.maxsize and saltadas < len(self._sesiones):
+            clave, sesion = next(iter(self._sesiones.items()))
+            if sesion.ocupada():
+                sesion.ultimo_uso = time.monotonic()
+                self._sesiones.move_to_end(clave)
+                saltadas += 1
+                continue
+            del self._sesiones[clave]
+            self.desalojadas += 1
+
+    def descartar(self, clave: Hashable) -> None:
+        with self._lock:
+            self._sesiones.pop(SIN_SESION if clave is None else clave, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sesiones.clear()
+
+    def __len__(self) -> int:
+        return len(self._sesiones)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._purgar(time.monotonic())
+            sesiones = list(self._sesiones.values())
+            contadores = {
+                "creadas": self.creadas,
+                "expiradas": self.expiradas,
+                "desalojadas": self.desalojadas,
+            }
+
+        return {
+            "vivas": len(sesiones),
+            "ocupadas": sum(1 for s in sesiones if s.ocupada()),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            **contadores,
+            "mensajes": sum(len(s.historial.messages) for s in sesiones),
+            "memoria_aprox_bytes": sum(s.historial.bytes_aprox() for s in sesiones),
+            "persistencia": self.persistencia.stats() if self.persistencia else None,
+        }
+
+
+_store: Optional[SesionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_sesiones() -> SesionStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SesionStore(persistencia=get_persistencia())
+        return _store
+
+
+def clave_sesion(chat_id: Hashable = None, user_id: Hashable = None) -> Hashable:
+    """Clave de la sesión: el chat si se conoce, si no el usuario."""
+    if chat_id is not None:
+        return chat_id
+    return user_id
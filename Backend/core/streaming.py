@@ -0,0 +1,154 @@
+"""
+Respuestas progresivas para Telegram.
+
+El bot envía un mensaje provisorio apenas recibe el texto y lo va editando
+con los fragmentos que genera el modelo, así el usuario empieza a leer al
+llegar el primer token en vez de esperar la respuesta completa.
+
+Telegram limita las ediciones (del orden de una por segundo por chat) y
+responde RetryAfter si se excede. Por eso las ediciones intermedias se
+espacian al menos EDIT_INTERVALO segundos, se saltan si el texto creció
+poco, y un RetryAfter solo posterga la próxima. La edición final siempre se
+hace: es la que deja el texto completo, partido en varios mensajes si pasa
+del límite de 4096 caracteres.
+
+No depende de python-telegram-bot: recibe las funciones para enviar y
+editar, de modo que se puede probar con objetos falsos.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LIMITE_MENSAJE = 4096
+EDIT_INTERVALO = float(os.getenv("TELEGRAM_EDIT_INTERVALO", "1.0"))
+EDIT_MIN_CARACTERES = 20
+# Lo máximo que se espera un RetryAfter antes de la edición final
+MAX_ESPERA_FINAL = 5.0
+
+PLACEHOLDER = "✍️ ..."
+CURSOR = " ▌"
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Segundos pedidos por un RetryAfter de Telegram, o None si es otro error."""
+    espera = getattr(error, "retry_after", None)
+    if isinstance(espera, timedelta):
+        return espera.total_seconds()
+    return float(espera) if espera is not None else None
+
+
+def partir(texto: str, limite: int = LIMITE_MENSAJE) -> List[str]:
+    """Parte un texto en trozos que entran en un mensaje, cortando en saltos de línea si se puede."""
+    partes = []
+    while len(texto) > limite:
+        corte = texto.rfind("\n", 0, limite)
+        if corte <= 0:
+            corte = limite
+        partes.append(texto[:corte])
+        texto = texto[corte:].lstrip("\n")
+    partes.append(texto)
+    return partes
+
+
+class EdicionProgresiva:
+    """
+    Muestra una respuesta a medida que se genera editando un solo mensaje.
+
+    Args:
+        enviar: Corrutina que envía un mensaje nuevo y retorna su handle
+            (p. ej. `update.message.reply_text`).
+        editar: Corrutina `(handle, texto)` que reemplaza el texto del mensaje.
+        intervalo: Segundos mínimos entre ediciones intermedias.
+        min_caracteres: Crecimiento mínimo del texto para justificar una edición.
+    """
+
+    def __init__(self, enviar: Callable[[str], Awaitable[Any]],
+                 editar: Callable[[Any, str], Awaitable[Any]],
+                 intervalo: float = None, min_caracteres: int = EDIT_MIN_CARACTERES,
+                 reloj: Callable[[], float] = time.monotonic):
+        self._enviar = enviar
+        self._editar = editar
+        self.intervalo = EDIT_INTERVALO if intervalo is None else intervalo
+        self.min_caracteres = min_caracteres
+        self._reloj = reloj
+        self._mensaje = None
+        self._partes: List[str] = []
+        self._largo_mostrado = 0
+        self._mostrado = ""
+        self._proxima = 0.0
+        self.ediciones = 0
+
+    async def iniciar(self, placeholder: str = PLACEHOLDER) -> None:
+        """Envía el mensaje provisorio. Si falla, la respuesta se enviará al final."""
+        try:
+            self._mensaje = await self._enviar(placeholder)
+            self._mostrado = placeholder
+            self._proxima = self._reloj() + self.intervalo
+        except Exception as e:
+            logger.warning(f"[streaming] No se pudo enviar el mensaje provisorio: {e}")
+
+    async def agregar(self, fragmento: str) -> None:
+        """Suma un fragmento y edita el mensaje si ya corresponde."""
+        self._partes.append(fragmento)
+        if self._mensaje is None:
+            return
+
+        texto = "".join(self._partes)
+        if len(texto) - self._largo_mostrado < self.min_caracteres:
+            return
+        if self._reloj() < self._proxima:
+            return
+        # Lo que no entra en un mensaje se muestra recién en la edición final
+        if len(texto) + len(CURSOR) > LIMITE_MENSAJE:
+            return
+
+        if await self._editar_seguro(texto + CURSOR):
+            self._largo_mostrado = len(texto)
+
+    async def _editar_seguro(self, texto: str) -> bool:
+        try:
+            await self._editar(self._mensaje, texto)
+        except Exception as e:
+            espera = _retry_after(e)
+            if espera is not None:
+                self._proxima = self._reloj() + espera
+                return False
+            if "not modified" in str(e).lower():
+                return True
+            logger.warning(f"[streaming] Falló la edición del mensaje: {e}")
+            self._proxima = self._reloj() + self.intervalo
+            return False
+
+        self.ediciones += 1
+        self._mostrado = texto
+        self._proxima = self._reloj() + self.intervalo
+        return True
+
+    async def terminar(self, texto: str) -> None:
+        """Deja el texto final completo, aunque haya que esperar un RetryAfter."""
+        partes = partir(texto)
+
+        if self._mensaje is None:
+            for parte in partes:
+                await self._enviar(parte)
+            return
+
+        primera, resto = partes[0], partes[1:]
+        if primera != self._mostrado:
+            ok = await self._editar_seguro(primera)
+            if not ok:
+                espera = max(self._proxima - self._reloj(), 0)
+                if espera <= MAX_ESPERA_FINAL:
+                    await asyncio.sleep(espera)
+                    ok = await self._editar_seguro(primera)
+            if not ok:
+                await self._enviar(primera)
+
+        for parte in resto:
+            await self._enviar(parte)
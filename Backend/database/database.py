@@ -5,29 +5,163 @@ Base de datos SQLite para ChatPyme.
 Cada usuario tiene su propio espacio de datos aislado por user_id.
 """
 
+import os
 import sqlite3
 import json
 import logging
+import threading
 from pathlib import Path
+from typing import List
 
-DB_PATH = Path(__file__).parent / "inventario.db"
+from database.shards import directory_from_env
+
+
+def sqlite_path_from_url(url: str = None):
+    """Ruta del archivo para una DATABASE_URL sqlite:///..., o None."""
+    if url and url.startswith("sqlite:///"):
+        return Path(url[len("sqlite:///"):])
+    return None
+
+
+DB_PATH = sqlite_path_from_url(os.getenv("DATABASE_URL")) or Path(__file__).parent / "inventario.db"
 logger = logging.getLogger(__name__)
 
+# Escritor único con group commit (ver database/writer.py). Desactivable con
+# DB_SINGLE_WRITER=0 para volver a una conexión por escritura.
+SINGLE_WRITER = os.getenv("DB_SINGLE_WRITER", "1") != "0"
+
+# Sharding opcional por tenant (ver database/shards.py)
+SHARDS = directory_from_env()
+
+_writers = {}
+_writer_lock = threading.Lock()
+_shards_listos = set()
 
-def get_db() -> sqlite3.Connection:
-    """Retorna una conexión a la base de datos SQLite."""
-    conn = sqlite3.connect(str(DB_PATH))
+
+def _ruta_para(tenant: int = None) -> Path:
+    """Archivo SQLite que guarda los datos del tenant."""
+    if tenant is None or not SHARDS.enabled:
+        return DB_PATH
+    return SHARDS.path_for(tenant)
+
+
+def _conectar(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(path))
     conn.row_factory = sqlite3.Row
     # Activar foreign keys para integridad referencial
     conn.execute("PRAGMA foreign_keys = ON")
     return conn
 
 
+def get_db(tenant: int = None) -> sqlite3.Connection:
+    """
+    Retorna una conexión a la base de datos SQLite.
+
+    Con sharding activo y un tenant (user_id), la conexión apunta al shard de
+    ese tenant; sin tenant, a la base principal.
+    """
+    path = _ruta_para(tenant)
+    conn = _conectar(path)
+    if path != DB_PATH:
+        _preparar_shard(conn, path, tenant)
+    return conn
+
+
+def get_dbs(tenant: int = None) -> List[sqlite3.Connection]:
+    """
+    Conexiones para una lectura: la del tenant o, sin tenant, la base
+    principal más cada shard existente (los datos de todos los tenants).
+    Quien llama las cierra.
+    """
+    if tenant is not None or not SHARDS.enabled:
+        return [get_db(tenant)]
+    return [get_db()] + [_conectar(path) for path in SHARDS.todos()]
+
+
+def _preparar_shard(conn: sqlite3.Connection, path: Path, tenant: int) -> None:
+    """Crea el esquema en el shard y replica la fila del tenant (para las FK)."""
+    clave = (str(path), tenant)
+    if clave in _shards_listos:
+        return
+
+    _crear_tablas(conn.cursor())
+
+    main = _conectar(DB_PATH)
+    try:
+        row = main.execute(
+            "SELECT id, telegram_id FROM users WHERE id = ?", (tenant,)
+        ).fetchone()
+    finally:
+        main.close()
+
+    if row:
+        conn.execute(
+            "INSERT OR IGNORE INTO users (id, telegram_id) VALUES (?, ?)",
+            (row["id"], row["telegram_id"]),
+        )
+    conn.commit()
+    _shards_listos.add(clave)
+
+
+def get_writer(tenant: int = None):
+    """Retorna el escritor único del archivo del tenant (lo crea la primera vez)."""
+    path = _ruta_para(tenant)
+    with _writer_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            from database.writer import SQLiteWriter
+            writer = _writers[path] = SQLiteWriter(path)
+        return writer
+
+
+def run_write(fn, tenant: int = None):
+    """
+    Ejecuta fn(conn) como una escritura y retorna su resultado.
+
+    Con el escritor único activo, la escritura se encola y se confirma junto a
+    las demás del mismo lote; fn no debe llamar a commit() ni cerrar la conexión.
+    """
+    path = _ruta_para(tenant)
+    if path != DB_PATH and (str(path), tenant) not in _shards_listos:
+        get_db(tenant).close()
+
+    if SINGLE_WRITER:
+        return get_writer(tenant).execute(fn)
+
+    conn = get_db(tenant)
+    try:
+        resultado = fn(conn)
+        conn.commit()
+        return resultado
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
 def init_db():
+    """Inicializa el motor de almacenamiento configurado (ver database/engine.py)."""
+    from database.engine import get_engine
+    get_engine()
+
+
+def init_sqlite_schema():
     """Crea todas las tablas si no existen. Seguro de llamar múltiples veces."""
     conn = get_db()
     cursor = conn.cursor()
+    _crear_tablas(cursor)
+    _crear_tablas_globales(cursor)
+    conn.commit()
+
+    # Migrar BD existente si le faltan columnas
+    _migrate(cursor, conn)
+
+    conn.close()
 
+
+def _crear_tablas(cursor):
+    """DDL compartido por la base principal y los shards."""
     # ── Usuarios ────────────────────────────────────────────────────────────
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS users (
@@ -66,9 +200,19 @@ def init_db():
             categoria   TEXT NOT NULL,
             descripcion TEXT,
             fecha       TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            origen      TEXT
         )
     """)
+    # origen: clave del mensaje que generó el movimiento (ej. "diferido:42"),
+    # para no registrarlo dos veces. Las bases y shards anteriores no la tienen.
+    cols_mov = {row[1] for row in cursor.execute("PRAGMA table_info(movimientos)")}
+    if "origen" not in cols_mov:
+        cursor.execute("ALTER TABLE movimientos ADD COLUMN origen TEXT")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_movimientos_origen "
+        "ON movimientos (user_id, origen) WHERE origen IS NOT NULL"
+    )
 
     # ── Auditoría (opcional, para debug) ─────────────────────────────────────
     cursor.execute("""
@@ -81,12 +225,19 @@ def init_db():
         )
     """)
 
-    conn.commit()
-
-    # Migrar BD existente si le faltan columnas
-    _migrate(cursor, conn)
 
-    conn.close()
+def _crear_tablas_globales(cursor):
+    """Tablas que no son de un tenant: solo en la base principal, no en los shards."""
+    # ── update_id del webhook de Telegram ya recibidos (compartido entre réplicas)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS telegram_updates (
+            update_id INTEGER PRIMARY KEY,
+            visto_en  REAL NOT NULL
+        )
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_telegram_updates_visto ON telegram_updates (visto_en)"
+    )
 
 
 def _migrate(cursor, conn):
@@ -127,31 +278,12 @@ def get_or_create_user(telegram_id: str) -> int:
     Raises:
         RuntimeError si no puede crear/encontrar el usuario.
     """
-    conn = get_db()
-    cursor = conn.cursor()
+    from database.engine import get_engine
     try:
-        # Buscar usuario existente
-        cursor.execute(
-            "SELECT id FROM users WHERE telegram_id = ?", (str(telegram_id),)
-        )
-        row = cursor.fetchone()
-        if row:
-            return row["id"]
-
-        # Crear nuevo usuario
-        cursor.execute(
-            "INSERT INTO users (telegram_id) VALUES (?)", (str(telegram_id),)
-        )
-        conn.commit()
-        user_id = cursor.lastrowid
-        logger.info(f"[db] Nuevo usuario registrado: telegram_id={telegram_id}, user_id={user_id}")
-        return user_id
-
+        return get_engine().get_or_create_user(str(telegram_id))
     except Exception as e:
         logger.error(f"[db] Error en get_or_create_user({telegram_id}): {e}")
         raise RuntimeError(f"No se pudo obtener/crear el usuario: {e}") from e
-    finally:
-        conn.close()
 
 
 def seed_db_from_test(user_id: int = None):
@@ -164,14 +296,10 @@ def seed_db_from_test(user_id: int = None):
         logger.debug("[db] seed_db_from_test ignorado: no se proporcionó user_id")
         return
 
-    conn = get_db()
-    cursor = conn.cursor()
+    from database.engine import get_engine
+    engine = get_engine()
 
-    cursor.execute(
-        "SELECT COUNT(*) as count FROM products WHERE user_id = ?", (user_id,)
-    )
-    if cursor.fetchone()["count"] > 0:
-        conn.close()
+    if engine.list_products(user_id):
         logger.debug(f"[db] Seed omitido: user_id={user_id} ya tiene productos")
         return
 
@@ -204,40 +332,29 @@ def seed_db_from_test(user_id: int = None):
 
     try:
         for producto, categoria, stock_actual, stock_minimo, stock_maximo, precio in productos_iniciales:
-            cursor.execute("""
-                INSERT OR IGNORE INTO products
-                    (user_id, producto, categoria, stock_actual, stock_minimo, stock_maximo, precio)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (user_id, producto, categoria, stock_actual, stock_minimo, stock_maximo, precio))
-
-        cursor.execute(
-            "SELECT COUNT(*) as count FROM movimientos WHERE user_id = ?", (user_id,)
-        )
-        if cursor.fetchone()["count"] == 0:
+            engine.upsert_product({
+                "producto": producto,
+                "categoria": categoria,
+                "stock_actual": stock_actual,
+                "stock_minimo": stock_minimo,
+                "stock_maximo": stock_maximo,
+                "precio": precio,
+            }, user_id=user_id)
+
+        if not engine.list_movimientos(user_id=user_id, limit=1):
             for tipo, monto, categoria, descripcion in movimientos_iniciales:
-                cursor.execute("""
-                    INSERT INTO movimientos (user_id, tipo, monto, categoria, descripcion)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (user_id, tipo, monto, categoria, descripcion))
+                engine.add_movimiento(tipo, monto, categoria, descripcion, user_id=user_id)
 
-        conn.commit()
         logger.info(f"[db] Seed cargado para user_id={user_id}")
 
     except Exception as e:
         logger.error(f"[db] Error en seed: {e}")
-    finally:
-        conn.close()
 
 
 def log_action(user_id: int, action: str, payload: dict = None):
     """Registra una acción en el log de auditoría."""
     try:
-        conn = get_db()
-        conn.execute(
-            "INSERT INTO audit_log (user_id, action, payload) VALUES (?, ?, ?)",
-            (user_id, action, json.dumps(payload or {}, default=str))
-        )
-        conn.commit()
-        conn.close()
+        from database.engine import get_engine
+        get_engine().log_action(user_id, action, json.dumps(payload or {}, default=str))
     except Exception as e:
         logger.debug(f"[db] audit_log falló (no crítico): {e}")
\ No newline at end of file
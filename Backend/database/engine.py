@@ -0,0 +1,153 @@
+"""
+database/engine.py
+
+Interfaz de almacenamiento para movimientos, productos, usuarios y auditoría.
+
+Los servicios hablan con un StorageEngine en vez de escribir SQL contra
+sqlite3 directamente. El motor se elige con DATABASE_URL:
+
+  - sin definir o sqlite:///ruta.db → SQLiteEngine (por defecto)
+  - memory://                       → MemoryEngine (tests y benchmarks, sin disco)
+
+Un motor para un servidor (PostgreSQL) solo tiene que implementar esta
+interfaz; ni los servicios ni los agentes cambian.
+"""
+
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StorageEngine(ABC):
+    """Contrato que cumple cada motor de almacenamiento."""
+
+    nombre = "base"
+
+    # ── Ciclo de vida ────────────────────────────────────────────────────────
+
+    @abstractmethod
+    def init(self) -> None:
+        """Prepara el almacenamiento (tablas, índices). Idempotente."""
+
+    @abstractmethod
+    def ping(self) -> None:
+        """Lanza excepción si el almacenamiento no responde."""
+
+    # ── Usuarios ─────────────────────────────────────────────────────────────
+
+    @abstractmethod
+    def get_or_create_user(self, telegram_id: str) -> int:
+        """Retorna el user_id interno del telegram_id, creándolo si no existe."""
+
+    # ── Movimientos ──────────────────────────────────────────────────────────
+
+    @abstractmethod
+    def add_movimiento(self, tipo: str, monto: float, categoria: str,
+                       descripcion: str = "", user_id: int = None) -> Dict:
+        """Guarda un movimiento ya validado y lo retorna con id y fecha."""
+
+    @abstractmethod
+    def add_movimientos(self, movimientos: List[Dict], user_id: int = None,
+                        origen: str = None) -> List[Dict]:
+        """
+        Guarda varios movimientos ya validados en una sola transacción.
+
+        Cada item trae tipo, monto, categoria y descripcion, y opcionalmente
+        fecha (UTC, "YYYY-MM-DD HH:MM:SS"; por defecto, ahora). Se guardan
+        todos o ninguno; retorna los movimientos con id y fecha, en el mismo
+        orden.
+
+        `origen` es una clave idempotente del mensaje que los generó: si el
+        tenant ya tiene movimientos con ese origen no se guarda nada y se
+        retornan esos, marcados con "repetido": True. La verificación corre
+        en la misma transacción que la escritura.
+        """
+
+    @abstractmethod
+    def list_movimientos(self, user_id: int = None, desde: str = None,
+                         limit: int = None) -> List[Dict]:
+        """Movimientos ordenados del más reciente al más antiguo."""
+
+    @abstractmethod
+    def totales_por_categoria(self, desde: str, user_id: int = None) -> Dict[str, Dict]:
+        """
+        Agrega movimientos desde una fecha.
+
+        Returns:
+            {"ingreso": {categoria: {"cantidad", "total"}}, "gasto": {...}},
+            cada dict ordenado por total descendente.
+        """
+
+    # ── Productos ────────────────────────────────────────────────────────────
+
+    @abstractmethod
+    def list_products(self, user_id: int = None) -> List[Dict]:
+        """Productos ordenados por id."""
+
+    @abstractmethod
+    def upsert_product(self, product: Dict, user_id: int = None) -> Dict:
+        """Crea el producto o, si ya existe con ese nombre, actualiza su stock."""
+
+    @abstractmethod
+    def replace_products(self, items: List[Dict], user_id: int = None) -> None:
+        """Reemplaza todo el inventario (del tenant, si se indica)."""
+
+    # ── Updates de Telegram ──────────────────────────────────────────────────
+
+    @abstractmethod
+    def marcar_update(self, update_id: int, ttl: float) -> bool:
+        """
+        Registra un update_id recibido por el webhook. Retorna False si ya
+        estaba (visto hace menos de `ttl` segundos, por este proceso o por
+        otro que comparta el almacenamiento).
+        """
+
+    # ── Auditoría ────────────────────────────────────────────────────────────
+
+    @abstractmethod
+    def log_action(self, user_id: Optional[int], action: str, payload: str) -> None:
+        """Registra una acción; payload ya viene serializado como JSON."""
+
+
+_engine: Optional[StorageEngine] = None
+_engine_lock = threading.Lock()
+
+
+def create_engine(url: str = None) -> StorageEngine:
+    """Construye el motor correspondiente a una DATABASE_URL."""
+    url = (url or "").strip()
+
+    if url.startswith("memory://"):
+        from database.memory_engine import MemoryEngine
+        return MemoryEngine()
+
+    if url and not url.startswith("sqlite:///"):
+        esquema = url.split("://", 1)[0]
+        logger.warning(f"[db] DATABASE_URL con esquema '{esquema}' aún no soportado; usando SQLite")
+
+    from database.sqlite_engine import SQLiteEngine
+    return SQLiteEngine()
+
+
+def get_engine() -> StorageEngine:
+    """Retorna el motor del proceso, inicializándolo la primera vez."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_engine(os.getenv("DATABASE_URL"))
+            _engine.init()
+            logger.info(f"[db] Motor de almacenamiento: {_engine.nombre}")
+        return _engine
+
+
+def set_engine(engine: Optional[StorageEngine]) -> None:
+    """Reemplaza el motor del proceso (tests y benchmarks). None = re-leer DATABASE_URL."""
+    global _engine
+    with _engine_lock:
+        if engine is not None:
+            engine.init()
+        _engine = engine
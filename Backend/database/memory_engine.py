@@ -0,0 +1,220 @@
+"""
+database/memory_engine.py
+
+Motor de almacenamiento en memoria, sin disco.
+
+Pensado para tests y benchmarks de carga (DATABASE_URL=memory://). Los
+movimientos se guardan en arreglos por tenant ordenados por fecha, así que
+los filtros por fecha son una búsqueda binaria; los productos se indexan por
+(user_id, nombre). Los datos viven solo mientras viva el proceso.
+"""
+
+import bisect
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from database.engine import StorageEngine
+
+# Entradas de auditoría que se conservan (las más viejas se descartan)
+MAX_AUDIT = 10_000
+
+
+def _ahora() -> str:
+    # Mismo formato que CURRENT_TIMESTAMP de SQLite (UTC)
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _publico(movimiento: Dict) -> Dict:
+    return {k: movimiento[k] for k in ("id", "tipo", "monto", "categoria", "descripcion", "fecha")}
+
+
+class MemoryEngine(StorageEngine):
+    nombre = "memory"
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._users: Dict[str, int] = {}
+        self._user_ids = itertools.count(1)
+        # user_id → movimientos en orden de fecha, y sus fechas en paralelo
+        self._movimientos: Dict[Optional[int], List[Dict]] = {}
+        self._fechas: Dict[Optional[int], List[str]] = {}
+        self._mov_ids = itertools.count(1)
+        # (user_id, origen) → movimientos que generó ese mensaje
+        self._origenes: Dict[Tuple[Optional[int], str], List[Dict]] = {}
+        # user_id → {producto: dict}; los dicts conservan el orden de inserción (= id)
+        self._products: Dict[Optional[int], Dict[str, Dict]] = {}
+        self._product_ids = itertools.count(1)
+        self.audit = deque(maxlen=MAX_AUDIT)
+        # update_id → momento en que se recibió (dedupe del webhook)
+        self._updates: "OrderedDict[int, float]" = OrderedDict()
+
+    def init(self) -> None:
+        pass
+
+    def ping(self) -> None:
+        pass
+
+    # ── Usuarios ─────────────────────────────────────────────────────────────
+
+    def get_or_create_user(self, telegram_id: str) -> int:
+        with self._lock:
+            if telegram_id not in self._users:
+                self._users[telegram_id] = next(self._user_ids)
+            return self._users[telegram_id]
+
+    # ── Movimientos ──────────────────────────────────────────────────────────
+
+    def add_movimiento(self, tipo: str, monto: float, categoria: str,
+                       descripcion: str = "", user_id: int = None) -> Dict:
+        return self.add_movimientos([{
+            "tipo": tipo,
+            "monto": monto,
+            "categoria": categoria,
+            "descripcion": descripcion,
+        }], user_id=user_id)[0]
+
+    def add_movimientos(self, movimientos: List[Dict], user_id: int = None,
+                        origen: str = None) -> List[Dict]:
+        ahora = _ahora()
+        nuevos = []
+        with self._lock:
+            if origen is not None and (user_id, origen) in self._origenes:
+                return [dict(_publico(m), repetido=True) for m in self._origenes[(user_id, origen)]]
+
+            fechas = self._fechas.setdefault(user_id, [])
+            lista = self._movimientos.setdefault(user_id, [])
+            for mov in movimientos:
+                fecha = mov.get("fecha") or ahora
+                movimiento = {
+                    "id": next(self._mov_ids),
+                    "user_id": user_id,
+                    "tipo": mov["tipo"],
+                    "monto": mov["monto"],
+                    "categoria": mov["categoria"],
+                    "descripcion": mov.get("descripcion") or "",
+                    "fecha": fecha,
+                    "created_at": ahora,
+                }
+                pos = bisect.bisect_right(fechas, fecha)
+                fechas.insert(pos, fecha)
+                lista.insert(pos, movimiento)
+                nuevos.append(movimiento)
+            if origen is not None:
+                self._origenes[(user_id, origen)] = nuevos
+
+        return [_publico(m) for m in nuevos]
+
+    def _desde(self, user_id: Optional[int], desde: Optional[str]) -> List[Dict]:
+        """Movimientos (más antiguo primero) con fecha >= desde."""
+        if user_id is not None:
+            tenants = [user_id]
+        else:
+            tenants = list(self._movimientos)
+
+        resultado = []
+        for tenant in tenants:
+            movs = self._movimientos.get(tenant, [])
+            inicio = bisect.bisect_left(self._fechas[tenant], desde) if desde and movs else 0
+            resultado.extend(movs[inicio:])
+
+        if len(tenants) > 1:
+            resultado.sort(key=lambda m: m["fecha"])
+        return resultado
+
+    def list_movimientos(self, user_id: int = None, desde: str = None,
+                         limit: int = None) -> List[Dict]:
+        with self._lock:
+            movs = self._desde(user_id, desde)
+        recientes = movs[::-1][:limit] if limit else movs[::-1]
+        return [dict(m) for m in recientes]
+
+    def totales_por_categoria(self, desde: str, user_id: int = None) -> Dict[str, Dict]:
+        totales = {"ingreso": {}, "gasto": {}}
+        with self._lock:
+            for mov in self._desde(user_id, desde):
+                cat = totales[mov["tipo"]].setdefault(mov["categoria"], {"cantidad": 0, "total": 0})
+                cat["cantidad"] += 1
+                cat["total"] += mov["monto"]
+
+        for tipo, por_cat in totales.items():
+            totales[tipo] = dict(sorted(por_cat.items(), key=lambda kv: kv[1]["total"], reverse=True))
+        return totales
+
+    # ── Productos ────────────────────────────────────────────────────────────
+
+    def list_products(self, user_id: int = None) -> List[Dict]:
+        with self._lock:
+            if user_id is not None:
+                productos = list(self._products.get(user_id, {}).values())
+            else:
+                productos = [p for por_nombre in self._products.values() for p in por_nombre.values()]
+                productos.sort(key=lambda p: p["id"])
+            return [dict(p) for p in productos]
+
+    def _nuevo_producto(self, item: Dict, user_id: Optional[int]) -> Dict:
+        fecha = _ahora()
+        return {
+            "id": next(self._product_ids),
+            "user_id": user_id,
+            "producto": item.get("producto"),
+            "categoria": item.get("categoria", "General"),
+            "stock_actual": item.get("stock_actual", 0),
+            "stock_minimo": item.get("stock_minimo", 0),
+            "stock_maximo": item.get("stock_maximo"),
+            "precio": item.get("precio", 0),
+            "sku": item.get("sku"),
+            "ultimo_movimiento_dias": item.get("ultimo_movimiento_dias", 0),
+            "created_at": fecha,
+            "updated_at": fecha,
+        }
+
+    def upsert_product(self, product: Dict, user_id: int = None) -> Dict:
+        nombre = product.get("producto")
+        with self._lock:
+            por_nombre = self._products.setdefault(user_id, {})
+            existente = por_nombre.get(nombre)
+            if existente is None:
+                nuevo = self._nuevo_producto(product, user_id)
+                por_nombre[nombre] = nuevo
+                product["id"] = nuevo["id"]
+            else:
+                existente.update(
+                    stock_actual=product.get("stock_actual", 0),
+                    stock_minimo=product.get("stock_minimo", 0),
+                    precio=product.get("precio", 0),
+                    stock_maximo=product.get("stock_maximo"),
+                )
+        return product
+
+    def replace_products(self, items: List[Dict], user_id: int = None) -> None:
+        with self._lock:
+            if user_id is None:
+                self._products.clear()
+            por_nombre = self._products[user_id] = {}
+            for item in items:
+                por_nombre[item.get("producto")] = self._nuevo_producto(item, user_id)
+
+    # ── Updates de Telegram ──────────────────────────────────────────────────
+
+    def marcar_update(self, update_id: int, ttl: float) -> bool:
+        ahora = time.time()
+        with self._lock:
+            # Orden de llegada = orden de vencimiento: se purga desde el frente
+            while self._updates:
+                primero, visto_en = next(iter(self._updates.items()))
+                if ahora - visto_en < ttl:
+                    break
+                del self._updates[primero]
+            if update_id in self._updates:
+                return False
+            self._updates[update_id] = ahora
+            return True
+
+    # ── Auditoría ────────────────────────────────────────────────────────────
+
+    def log_action(self, user_id: Optional[int], action: str, payload: str) -> None:
+        self.audit.append((user_id, action, payload, _ahora()))
@@ -0,0 +1,119 @@
+"""
+database/rebalance_shards.py
+
+Mueve los datos de los tenants cuando cambia la configuración de shards.
+
+Uso (desde Backend/, con la app detenida):
+    python -m database.rebalance_shards --hacia-modo hash --hacia-shards 6 \
+        --desde-modo hash --desde-shards 4 [--dry-run]
+
+Por cada tenant cuyo archivo cambia, copia products y movimientos al destino
+en una sola transacción y luego los borra del origen. Es seguro re-ejecutarlo
+si se interrumpe: el destino se limpia antes de cada copia.
+"""
+
+import argparse
+import logging
+import sqlite3
+from pathlib import Path
+from typing import List, Tuple
+
+from database.database import DB_PATH, _conectar, _crear_tablas, _preparar_shard
+from database.shards import ShardDirectory
+
+logger = logging.getLogger(__name__)
+
+TABLAS = ("products", "movimientos")
+
+
+def _ruta(directorio: ShardDirectory, tenant: int) -> Path:
+    return directorio.path_for(tenant) or DB_PATH
+
+
+def planear(desde: ShardDirectory, hacia: ShardDirectory, tenants: List[int]) -> List[Tuple[int, Path, Path]]:
+    """Lista (tenant, origen, destino) de los tenants que cambian de archivo."""
+    plan = []
+    for tenant in tenants:
+        origen, destino = _ruta(desde, tenant), _ruta(hacia, tenant)
+        if origen != destino:
+            plan.append((tenant, origen, destino))
+    return plan
+
+
+def _columnas(conn: sqlite3.Connection, tabla: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({tabla})") if row[1] != "id"]
+
+
+def mover_tenant(tenant: int, origen: Path, destino: Path) -> dict:
+    """Copia los datos del tenant al destino y los borra del origen."""
+    src = _conectar(origen)
+    dst = _conectar(destino)
+    movidos = {}
+    try:
+        if destino == DB_PATH:
+            _crear_tablas(dst.cursor())
+            dst.commit()
+        else:
+            _preparar_shard(dst, destino, tenant)
+
+        with dst:
+            for tabla in TABLAS:
+                cols = _columnas(src, tabla)
+                filas = src.execute(
+                    f"SELECT {', '.join(cols)} FROM {tabla} WHERE user_id = ?", (tenant,)
+                ).fetchall()
+                dst.execute(f"DELETE FROM {tabla} WHERE user_id = ?", (tenant,))
+                dst.executemany(
+                    f"INSERT INTO {tabla} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                    [tuple(fila) for fila in filas],
+                )
+                movidos[tabla] = len(filas)
+
+        with src:
+            for tabla in TABLAS:
+                src.execute(f"DELETE FROM {tabla} WHERE user_id = ?", (tenant,))
+    finally:
+        src.close()
+        dst.close()
+
+    return movidos
+
+
+def rebalancear(desde: ShardDirectory, hacia: ShardDirectory, dry_run: bool = False) -> List[dict]:
+    main = _conectar(DB_PATH)
+    try:
+        tenants = [row["id"] for row in main.execute("SELECT id FROM users ORDER BY id")]
+    finally:
+        main.close()
+
+    resultados = []
+    for tenant, origen, destino in planear(desde, hacia, tenants):
+        resultado = {"tenant": tenant, "origen": origen.name, "destino": destino.name}
+        if not dry_run:
+            resultado.update(mover_tenant(tenant, origen, destino))
+        logger.info(f"[shards] {resultado}")
+        resultados.append(resultado)
+
+    logger.info(f"[shards] {len(resultados)} de {len(tenants)} tenants cambian de archivo")
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebalancea tenants entre shards SQLite")
+    parser.add_argument("--desde-modo", default="", choices=["", "hash", "tenant"])
+    parser.add_argument("--desde-shards", type=int, default=1)
+    parser.add_argument("--hacia-modo", required=True, choices=["", "hash", "tenant"])
+    parser.add_argument("--hacia-shards", type=int, default=1)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    rebalancear(
+        ShardDirectory(args.desde_modo, args.desde_shards),
+        ShardDirectory(args.hacia_modo, args.hacia_shards),
+        dry_run=args.dry_run,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+database/shards.py
+
+Directorio de shards para repartir tenants entre varios archivos SQLite.
+
+Modos (variable DB_SHARD_MODE):
+  - ""       → sin sharding, todo en database/inventario.db (por defecto)
+  - "hash"   → DB_SHARDS archivos; cada user_id va a uno vía hash consistente
+  - "tenant" → un archivo por tenant
+
+La base principal (inventario.db) sigue guardando el directorio de usuarios y
+la auditoría; los shards guardan products y movimientos de sus tenants.
+Con hash consistente, pasar de N a N+1 shards solo mueve ~1/(N+1) tenants
+(ver database/rebalance_shards.py).
+"""
+
+import bisect
+import hashlib
+import os
+from pathlib import Path
+from typing import List, Optional
+
+SHARDS_DIR = Path(__file__).parent / "shards"
+
+# Nodos virtuales por shard: suavizan el reparto en el anillo
+VNODES = 64
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Anillo de hash consistente sobre nombres de shard."""
+
+    def __init__(self, shards: List[str], vnodes: int = VNODES):
+        self.shards = list(shards)
+        self._ring = sorted(
+            (_hash(f"{shard}#{i}"), shard) for shard in self.shards for i in range(vnodes)
+        )
+        self._keys = [k for k, _ in self._ring]
+
+    def get(self, key: str) -> str:
+        idx = bisect.bisect(self._keys, _hash(key)) % len(self._ring)
+        return self._ring[idx][1]
+
+
+class ShardDirectory:
+    """Resuelve el archivo SQLite que corresponde a cada tenant."""
+
+    def __init__(self, mode: str = "", num_shards: int = 1, base_dir: Path = SHARDS_DIR):
+        if mode not in ("", "hash", "tenant"):
+            raise ValueError(f"DB_SHARD_MODE inválido: {mode!r}")
+        self.mode = mode
+        self.num_shards = max(1, num_shards)
+        self.base_dir = Path(base_dir)
+        self._ring = HashRing(self.shard_names()) if mode == "hash" else None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.mode)
+
+    def shard_names(self) -> List[str]:
+        return [f"shard_{i:02d}" for i in range(self.num_shards)]
+
+    def shard_for(self, tenant: int) -> Optional[str]:
+        """Nombre del shard del tenant, o None si el sharding está apagado."""
+        if self.mode == "hash":
+            return self._ring.get(str(tenant))
+        if self.mode == "tenant":
+            return f"tenant_{int(tenant)}"
+        return None
+
+    def path_for(self, tenant: int) -> Optional[Path]:
+        shard = self.shard_for(tenant)
+        if shard is None:
+            return None
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        return self.base_dir / f"{shard}.db"
+
+
+    def todos(self) -> List[Path]:
+        """Archivos de shard que existen (para lecturas sin tenant)."""
+        if not self.enabled or not self.base_dir.exists():
+            return []
+        if self.mode == "hash":
+            rutas = [self.base_dir / f"{shard}.db" for shard in self.shard_names()]
+            return [ruta for ruta in rutas if ruta.exists()]
+        return sorted(self.base_dir.glob("tenant_*.db"))
+
+
+def directory_from_env() -> ShardDirectory:
+    return ShardDirectory(
+        mode=os.getenv("DB_SHARD_MODE", "").strip().lower(),
+        num_shards=int(os.getenv("DB_SHARDS", "4")),
+    )
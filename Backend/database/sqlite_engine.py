@@ -0,0 +1,272 @@
+"""
+database/sqlite_engine.py
+
+Motor de almacenamiento sobre SQLite.
+
+Usa la infraestructura de database.database: conexiones por tenant (sharding
+opcional) para lecturas y el escritor único con group commit para escrituras.
+Las lecturas sin tenant (el dashboard) recorren la base principal y todos los
+shards, así los tenants movidos a un shard no desaparecen de los totales.
+"""
+
+import logging
+import sqlite3
+import time
+from typing import Callable, Dict, List, Optional
+
+from database import database as db
+from database.engine import StorageEngine
+
+logger = logging.getLogger(__name__)
+
+
+def _filtro_usuario(user_id: int = None):
+    """Fragmento SQL y parámetros para limitar la consulta a un tenant."""
+    if user_id is None:
+        return "", []
+    return " AND user_id = ?", [user_id]
+
+
+def _movimiento(row) -> Dict:
+    return {
+        "id": row["id"],
+        "tipo": row["tipo"],
+        "monto": row["monto"],
+        "categoria": row["categoria"],
+        "descripcion": row["descripcion"],
+        "fecha": row["fecha"],
+    }
+
+
+def _leer(user_id: Optional[int], consulta: Callable[[sqlite3.Connection], List]) -> List:
+    """
+    Corre `consulta` en el archivo del tenant o, sin tenant, en la base
+    principal y en todos los shards, y junta las filas.
+    """
+    filas = []
+    for conn in db.get_dbs(user_id):
+        try:
+            filas.extend(consulta(conn))
+        finally:
+            conn.close()
+    return filas
+
+
+class SQLiteEngine(StorageEngine):
+    nombre = "sqlite"
+
+    def init(self) -> None:
+        db.init_sqlite_schema()
+
+    def ping(self) -> None:
+        conn = db.get_db()
+        try:
+            conn.execute("SELECT 1")
+        finally:
+            conn.close()
+
+    # ── Usuarios ─────────────────────────────────────────────────────────────
+
+    def get_or_create_user(self, telegram_id: str) -> int:
+        conn = db.get_db()
+        try:
+            row = conn.execute(
+                "SELECT id FROM users WHERE telegram_id = ?", (telegram_id,)
+            ).fetchone()
+            if row:
+                return row["id"]
+        finally:
+            conn.close()
+
+        def _crear(conn):
+            conn.execute(
+                "INSERT OR IGNORE INTO users (telegram_id) VALUES (?)", (telegram_id,)
+            )
+            return conn.execute(
+                "SELECT id FROM users WHERE telegram_id = ?", (telegram_id,)
+            ).fetchone()["id"]
+
+        user_id = db.run_write(_crear)
+        logger.info(f"[db] Nuevo usuario registrado: telegram_id={telegram_id}, user_id={user_id}")
+        return user_id
+
+    # ── Movimientos ──────────────────────────────────────────────────────────
+
+    def add_movimiento(self, tipo: str, monto: float, categoria: str,
+                       descripcion: str = "", user_id: int = None) -> Dict:
+        return self.add_movimientos([{
+            "tipo": tipo,
+            "monto": monto,
+            "categoria": categoria,
+            "descripcion": descripcion,
+        }], user_id=user_id)[0]
+
+    def add_movimientos(self, movimientos: List[Dict], user_id: int = None,
+                        origen: str = None) -> List[Dict]:
+        def _insertar(conn):
+            if origen is not None:
+                previos = conn.execute(
+                    "SELECT * FROM movimientos WHERE user_id IS ? AND origen = ? ORDER BY id",
+                    (user_id, origen),
+                ).fetchall()
+                if previos:
+                    return [dict(_movimiento(row), repetido=True) for row in previos]
+
+            guardados = []
+            for mov in movimientos:
+                cursor = conn.execute("""
+                    INSERT INTO movimientos (user_id, tipo, monto, categoria, descripcion, fecha, origen)
+                    VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?)
+                """, (user_id, mov["tipo"], mov["monto"], mov["categoria"], mov.get("descripcion") or "",
+                      mov.get("fecha"), origen))
+
+                row = conn.execute(
+                    "SELECT * FROM movimientos WHERE id = ?", (cursor.lastrowid,)
+                ).fetchone()
+                guardados.append(_movimiento(row))
+            return guardados
+
+        # Un solo trabajo del escritor = un solo SAVEPOINT: todos o ninguno
+        return db.run_write(_insertar, tenant=user_id)
+
+    def list_movimientos(self, user_id: int = None, desde: str = None,
+                         limit: int = None) -> List[Dict]:
+        query = "SELECT * FROM movimientos WHERE 1 = 1"
+        params = []
+
+        if desde:
+            query += " AND fecha >= ?"
+            params.append(desde)
+
+        filtro, filtro_params = _filtro_usuario(user_id)
+        query += filtro + " ORDER BY fecha DESC"
+        params += filtro_params
+
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        filas = [dict(row) for row in _leer(user_id, lambda conn: conn.execute(query, params).fetchall())]
+        # Sin tenant con sharding llegan de varios archivos: se vuelven a ordenar
+        filas.sort(key=lambda m: m["fecha"] or "", reverse=True)
+        return filas[:limit] if limit else filas
+
+    def totales_por_categoria(self, desde: str, user_id: int = None) -> Dict[str, Dict]:
+        filtro, filtro_params = _filtro_usuario(user_id)
+        rows = _leer(user_id, lambda conn: conn.execute(f"""
+            SELECT tipo, categoria, COUNT(*) as cantidad, SUM(monto) as total
+            FROM movimientos
+            WHERE fecha >= ?{filtro}
+            GROUP BY tipo, categoria
+        """, [desde] + filtro_params).fetchall())
+
+        totales = {"ingreso": {}, "gasto": {}}
+        for row in rows:
+            actual = totales[row["tipo"]].setdefault(row["categoria"], {"cantidad": 0, "total": 0})
+            actual["cantidad"] += row["cantidad"]
+            actual["total"] += row["total"]
+        for tipo, por_categoria in totales.items():
+            totales[tipo] = dict(sorted(por_categoria.items(), key=lambda kv: kv[1]["total"], reverse=True))
+        return totales
+
+    # ── Productos ────────────────────────────────────────────────────────────
+
+    def list_products(self, user_id: int = None) -> List[Dict]:
+        if user_id is not None:
+            rows = _leer(user_id, lambda conn: conn.execute(
+                "SELECT * FROM products WHERE user_id = ? ORDER BY id", (user_id,)
+            ).fetchall())
+            return [dict(row) for row in rows]
+
+        # Todos los tenants: los ids son por archivo, se ordena por tenant
+        rows = _leer(None, lambda conn: conn.execute("SELECT * FROM products").fetchall())
+        return sorted((dict(row) for row in rows), key=lambda p: (p["user_id"] or 0, p["id"]))
+
+    def upsert_product(self, product: Dict, user_id: int = None) -> Dict:
+        def _upsert(conn):
+            try:
+                cursor = conn.execute("""
+                    INSERT INTO products (
+                        user_id, producto, categoria, stock_actual, stock_minimo,
+                        precio, sku, stock_maximo
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    user_id,
+                    product.get("producto"),
+                    product.get("categoria", "General"),
+                    product.get("stock_actual", 0),
+                    product.get("stock_minimo", 0),
+                    product.get("precio", 0),
+                    product.get("sku"),
+                    product.get("stock_maximo"),
+                ))
+                product["id"] = cursor.lastrowid
+
+            except sqlite3.IntegrityError:
+                query = """
+                    UPDATE products SET
+                        stock_actual = ?, stock_minimo = ?, precio = ?, stock_maximo = ?
+                    WHERE producto = ?
+                """
+                params = [
+                    product.get("stock_actual", 0),
+                    product.get("stock_minimo", 0),
+                    product.get("precio", 0),
+                    product.get("stock_maximo"),
+                    product.get("producto"),
+                ]
+                if user_id is not None:
+                    query += " AND user_id = ?"
+                    params.append(user_id)
+                conn.execute(query, params)
+
+        db.run_write(_upsert, tenant=user_id)
+        return product
+
+    def replace_products(self, items: List[Dict], user_id: int = None) -> None:
+        def _reemplazar(conn):
+            if user_id is None:
+                conn.execute("DELETE FROM products")
+            else:
+                conn.execute("DELETE FROM products WHERE user_id = ?", (user_id,))
+
+            conn.executemany("""
+                INSERT INTO products (
+                    user_id, producto, categoria, stock_actual, stock_minimo,
+                    ultimo_movimiento_dias, precio, sku, stock_maximo
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(
+                user_id,
+                item.get("producto"),
+                item.get("categoria", "General"),
+                item.get("stock_actual", 0),
+                item.get("stock_minimo", 0),
+                item.get("ultimo_movimiento_dias", 0),
+                item.get("precio", 0),
+                item.get("sku"),
+                item.get("stock_maximo"),
+            ) for item in items])
+
+        db.run_write(_reemplazar, tenant=user_id)
+
+    # ── Updates de Telegram ──────────────────────────────────────────────────
+
+    def marcar_update(self, update_id: int, ttl: float) -> bool:
+        def _marcar(conn):
+            ahora = time.time()
+            conn.execute("DELETE FROM telegram_updates WHERE visto_en < ?", (ahora - ttl,))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO telegram_updates (update_id, visto_en) VALUES (?, ?)",
+                (update_id, ahora),
+            )
+            return cursor.rowcount == 1
+
+        return db.run_write(_marcar)
+
+    # ── Auditoría ────────────────────────────────────────────────────────────
+
+    def log_action(self, user_id: Optional[int], action: str, payload: str) -> None:
+        db.run_write(lambda conn: conn.execute(
+            "INSERT INTO audit_log (user_id, action, payload) VALUES (?, ?, ?)",
+            (user_id, action, payload)
+        ))
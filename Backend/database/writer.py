@@ -0,0 +1,153 @@
+"""
+database/writer.py
+
+Escritor único con group commit para SQLite.
+
+SQLite admite un solo escritor a la vez. Cuando varios hilos (threadpool de
+FastAPI, bot de Telegram) escriben con conexiones propias, compiten por el
+lock y terminan en "database is locked". Aquí todas las escrituras del proceso
+pasan por un hilo dedicado que las agrupa en una sola transacción (group
+commit): un fsync por lote en vez de uno por escritura. Mientras un lote se
+confirma, las escrituras nuevas se acumulan en la cola y forman el siguiente;
+espera_ms permite además esperar un poco a que lleguen más.
+
+Cada trabajo corre dentro de su propio SAVEPOINT, así que si uno falla solo se
+revierte ese trabajo y el resto del lote se confirma igual.
+"""
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class _Trabajo:
+    __slots__ = ("fn", "future")
+
+    def __init__(self, fn: Callable[[sqlite3.Connection], object]):
+        self.fn = fn
+        self.future: Future = Future()
+
+
+class SQLiteWriter:
+    """Hilo escritor que serializa y agrupa escrituras sobre un archivo SQLite."""
+
+    def __init__(self, db_path: str, max_lote: int = 64, espera_ms: float = 0.0):
+        self.db_path = str(db_path)
+        self.max_lote = max_lote
+        self.espera = espera_ms / 1000
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.lotes = 0
+        self.trabajos = 0
+
+    # ── API pública ──────────────────────────────────────────────────────────
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="sqlite-writer", daemon=True
+            )
+            self._thread.start()
+
+    def submit(self, fn: Callable[[sqlite3.Connection], object]) -> Future:
+        """Encola fn(conn) y retorna un Future con su resultado."""
+        self.start()
+        trabajo = _Trabajo(fn)
+        self._queue.put(trabajo)
+        return trabajo.future
+
+    def execute(self, fn: Callable[[sqlite3.Connection], object], timeout: float = 30):
+        """Ejecuta fn(conn) en el escritor y espera el resultado (o su excepción)."""
+        if threading.current_thread() is self._thread:
+            # Escritura anidada desde otro trabajo: ya estamos dentro del lote
+            return fn(self._conn)
+        return self.submit(fn).result(timeout=timeout)
+
+    def stop(self, timeout: float = 5) -> None:
+        if self._thread and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout=timeout)
+
+    # ── Hilo escritor ────────────────────────────────────────────────────────
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path, isolation_level=None, check_same_thread=False, timeout=30
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        # WAL: los lectores no bloquean al escritor ni viceversa
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def _run(self) -> None:
+        self._conn = self._connect()
+        logger.info(f"[writer] Escritor único iniciado para {self.db_path}")
+
+        detener = False
+        while not detener:
+            primero = self._queue.get()
+            if primero is _STOP:
+                break
+
+            lote = [primero]
+            limite = time.monotonic() + self.espera
+            while len(lote) < self.max_lote:
+                restante = limite - time.monotonic()
+                try:
+                    trabajo = self._queue.get(timeout=max(restante, 0)) if restante > 0 \
+                        else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if trabajo is _STOP:
+                    detener = True
+                    break
+                lote.append(trabajo)
+
+            self._commit_lote(lote)
+
+        self._conn.close()
+
+    def _commit_lote(self, lote) -> None:
+        conn = self._conn
+        resultados = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for trabajo in lote:
+                conn.execute("SAVEPOINT trabajo")
+                try:
+                    resultados.append((trabajo, trabajo.fn(conn), None))
+                    conn.execute("RELEASE trabajo")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO trabajo")
+                    conn.execute("RELEASE trabajo")
+                    resultados.append((trabajo, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            logger.error(f"[writer] Falló el commit de un lote de {len(lote)}: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for trabajo in lote:
+                trabajo.future.set_exception(e)
+            return
+
+        self.lotes += 1
+        self.trabajos += len(lote)
+        for trabajo, resultado, error in resultados:
+            if error is not None:
+                trabajo.future.set_exception(error)
+            else:
+                trabajo.future.set_result(resultado)
@@ -0,0 +1,63 @@
+from fastapi import APIRouter
+
+from core import cache
+from core.debounce import get_agrupador
+from core.deferred_queue import get_cola
+from core.dispatcher import get_despachador
+from core.executors import run_db
+from core.ledger import get_ledger
+from core.llm import get_breaker
+from core.sessions import get_sesiones
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+
+@router.get("/cache")
+async def cache_stats():
+    """Tamaño, aciertos y tasa de acierto de las cachés del proceso."""
+    return cache.stats()
+
+
+@router.get("/llm")
+async def llm_status():
+    """Estado del circuit breaker del backend LLM."""
+    return get_breaker().estado()
+
+
+@router.get("/llm/llamadas")
+async def llm_ledger(recientes: int = 0, forzar: bool = False):
+    """
+    Latencia (p50/p95/p99), tokens, costo estimado, reintentos, aciertos de
+    caché y fallbacks por agente, sobre la ventana del ledger.
+
+    Args:
+        recientes: Cantidad de registros crudos a incluir (los más nuevos primero).
+        forzar: Recalcular ya en vez de usar el último agregado periódico.
+    """
+    ledger = get_ledger()
+    respuesta = ledger.agregado(forzar=forzar)
+    if recientes > 0:
+        respuesta = dict(respuesta, recientes=ledger.recientes(min(recientes, 500)))
+    return respuesta
+
+
+@router.get("/diferidos")
+async def deferred_stats():
+    """Registros en la cola de diferidos por estado (pendiente, procesando, registrado, fallido)."""
+    return await run_db(get_cola().stats)
+
+
+@router.get("/sesiones")
+async def session_stats():
+    """Sesiones de conversación vivas, desalojos por LRU/inactividad y memoria aproximada."""
+    return get_sesiones().stats()
+
+
+@router.get("/despachador")
+async def dispatcher_stats():
+    """
+    Colas por chat del despachador (profundidad, mensajes en proceso,
+    rechazos, tiempo de espera) y ráfagas agrupadas por el debounce.
+    """
+    agrupador = get_agrupador()
+    return dict(get_despachador().stats(), agrupador=agrupador.stats() if agrupador else None)
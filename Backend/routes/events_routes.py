@@ -0,0 +1,43 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+
+from core.events import get_event_bus
+
+router = APIRouter(prefix="/api", tags=["eventos"])
+
+# Cada cuánto mandar un comentario para que proxies no corten la conexión
+KEEPALIVE_SEGUNDOS = 15
+
+
+def _formatear_sse(evento: dict) -> str:
+    data = json.dumps(evento, ensure_ascii=False, default=str)
+    return f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {data}\n\n"
+
+
+@router.get("/eventos")
+async def stream_events(request: Request, user_id: int):
+    """Stream server-sent events con los cambios de datos del tenant (user_id obligatorio)."""
+    bus = get_event_bus()
+    sub = bus.subscribe(tenant=user_id)
+
+    async def _stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    evento = await asyncio.wait_for(sub.get(), timeout=KEEPALIVE_SEGUNDOS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _formatear_sse(evento)
+        finally:
+            bus.unsubscribe(sub)
+
+    return StreamingResponse(
+        _stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
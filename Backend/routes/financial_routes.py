@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Body
 from pydantic import BaseModel
 from services.financial_service import get_resumen, get_ultimos_movimientos, add_movimiento
-from agents.financial_agent import obtener_estado_financiero
+from agents.financial_agent import obtener_estado_financiero_async
+from core.executors import run_db
 
 router = APIRouter(prefix="/api", tags=["financial"])
 
@@ -14,23 +15,23 @@ class MovimientoCreate(BaseModel):
 
 
 @router.get("/finanzas/resumen")
-def get_financial_summary():
+async def get_financial_summary():
     """Retorna resumen financiero de los últimos 30 días."""
-    resumen = get_resumen(dias=30)
+    resumen = await run_db(get_resumen, dias=30)
     return resumen
 
 
 @router.get("/finanzas/analisis")
-def get_financial_analysis():
+async def get_financial_analysis():
     """Retorna análisis del agente financiero."""
-    analisis = obtener_estado_financiero()
+    analisis = await obtener_estado_financiero_async()
     return analisis
 
 
 @router.get("/finanzas/movimientos")
-def get_recent_movements(limit: int = 10, dias: int = 30):
+async def get_recent_movements(limit: int = 10, dias: int = 30):
     """Retorna movimientos recientes."""
-    movimientos = get_ultimos_movimientos(cantidad=limit)
+    movimientos = await run_db(get_ultimos_movimientos, cantidad=limit)
     return {
         "movimientos": [dict(m) for m in movimientos],
         "cantidad": len(movimientos)
@@ -38,10 +39,11 @@ def get_recent_movements(limit: int = 10, dias: int = 30):
 
 
 @router.post("/finanzas/movimiento")
-def create_movement(movimiento: MovimientoCreate):
+async def create_movement(movimiento: MovimientoCreate):
     """Registra un nuevo movimiento financiero."""
     try:
-        resultado = add_movimiento(
+        resultado = await run_db(
+            add_movimiento,
             movimiento.tipo,
             movimiento.monto,
             movimiento.categoria,
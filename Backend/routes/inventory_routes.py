@@ -1,12 +1,13 @@
 from fastapi import APIRouter
 from services.inventory_service import read_inventory, add_product
+from core.executors import run_db
 
 router = APIRouter(prefix="/api", tags=["inventory"])
 
 @router.get("/inventory")
-def get_inventory():
-    return read_inventory()
+async def get_inventory():
+    return await run_db(read_inventory)
 
 @router.post("/inventory")
-def create_product(product: dict):
-    return add_product(product)
\ No newline at end of file
+async def create_product(product: dict):
+    return await run_db(add_product, product)
\ No newline at end of file
@@ -0,0 +1,31 @@
+import hmac
+
+from fastapi import APIRouter, Header, HTTPException, Request
+
+from bot.webhook import WEBHOOK_SECRET, get_webhook
+
+router = APIRouter(prefix="/telegram", tags=["telegram"])
+
+
+@router.post("/webhook")
+async def telegram_webhook(request: Request,
+                           x_telegram_bot_api_secret_token: str = Header(default="")):
+    """
+    Recibe un update de Telegram (modo webhook) y lo pasa al despachador.
+
+    Los update_id repetidos responden 200 sin volver a procesarse. Sin
+    TELEGRAM_WEBHOOK_SECRET configurado se rechaza todo.
+    """
+    if not WEBHOOK_SECRET or not hmac.compare_digest(x_telegram_bot_api_secret_token, WEBHOOK_SECRET):
+        raise HTTPException(status_code=403, detail="Secret token inválido")
+
+    webhook = get_webhook()
+    if webhook is None:
+        raise HTTPException(status_code=503, detail="El bot no está en modo webhook")
+
+    data = await request.json()
+    if not isinstance(data, dict) or "update_id" not in data:
+        raise HTTPException(status_code=400, detail="Update sin update_id")
+
+    nuevo = await webhook.procesar(data)
+    return {"ok": True, "duplicado": not nuevo}
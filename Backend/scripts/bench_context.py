@@ -0,0 +1,224 @@
+"""
+Compara el contexto de inventario con presupuesto contra el JSON completo.
+
+Genera catálogos sintéticos de distintos tamaños y, para cada uno, reporta
+tokens estimados y tiempo de armado. Además verifica el contenido del
+contexto y falla (exit 1) si:
+
+- algún contexto se pasa del presupuesto;
+- alguno de los TOP_RIESGO productos más riesgosos no queda en la tabla
+  EN RIESGO tras el recorte;
+- los agregados (RESUMEN, TOTALES, conteo de filas omitidas, orden y
+  porcentajes por categoría) no coinciden con los calculados aparte.
+
+Uso (desde Backend/):
+    python scripts/bench_context.py [--presupuesto 1500]
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from core.context_builder import (
+    TOP_RIESGO,
+    _riesgo,
+    contexto_financiero,
+    contexto_inventario,
+    estimar_tokens,
+)
+
+TAMANOS = (10, 100, 1_000, 10_000, 100_000)
+CATEGORIAS = ["Ropa", "Accesorios", "Calzado", "Hogar", "Papelería", "Aseo", "Alimentos"]
+
+
+def _catalogo(n, rnd):
+    productos = []
+    for i in range(n):
+        minimo = rnd.randint(0, 20)
+        productos.append({
+            "id": i + 1,
+            "producto": f"Producto {i + 1} {rnd.choice(CATEGORIAS).lower()}",
+            "categoria": rnd.choice(CATEGORIAS),
+            "stock_actual": rnd.randint(minimo + 1, 200),
+            "stock_minimo": minimo,
+            "stock_maximo": 250,
+            "precio": rnd.randint(1, 500) * 1000,
+            "sku": f"SKU-{i + 1:06d}",
+            "ultimo_movimiento_dias": rnd.randint(0, 60),
+        })
+    # Unos pocos productos críticos escondidos en el catálogo
+    for p in rnd.sample(productos, min(3, n)):
+        p["stock_actual"] = 0
+        p["stock_minimo"] = 5
+    return productos
+
+
+def _resumen(n_categorias, rnd):
+    ingresos = {f"Ventas {i}": float(rnd.randint(1, 900) * 1000) for i in range(n_categorias)}
+    gastos = {f"Gasto {i}": float(rnd.randint(1, 500) * 1000) for i in range(n_categorias)}
+    return {
+        "ingresos_total": sum(ingresos.values()),
+        "gastos_total": sum(gastos.values()),
+        "balance": sum(ingresos.values()) - sum(gastos.values()),
+        "ingresos_por_categoria": ingresos,
+        "gastos_por_categoria": gastos,
+        "cantidad_movimientos": n_categorias * 10,
+    }
+
+
+def _secciones(contexto):
+    """Separa el contexto en {titulo: [líneas]} (la primera línea es el título)."""
+    secciones = {}
+    for parte in contexto.split("\n\n"):
+        lineas = parte.split("\n")
+        secciones[lineas[0]] = lineas[1:]
+    return secciones
+
+
+def _filas(lineas):
+    """Filas de una tabla sin encabezado ni nota de omitidas."""
+    return [l.split("|") for l in lineas[1:] if not l.startswith("(... ")]
+
+
+def _omitidas(lineas):
+    for l in lineas:
+        if l.startswith("(... "):
+            return int(l[5:].split()[0])
+    return 0
+
+
+def _campos(linea):
+    return dict(par.split("=", 1) for par in linea.split())
+
+
+def _verificar_inventario(productos, contexto, presupuesto):
+    """Retorna la lista de fallas encontradas en el contexto de inventario."""
+    fallas = []
+    if estimar_tokens(contexto) > presupuesto:
+        fallas.append(f"{estimar_tokens(contexto)} tokens > presupuesto {presupuesto}")
+
+    secciones = _secciones(contexto)
+    titulo_riesgo = f"EN RIESGO (top {TOP_RIESGO}, stock bajo o sin movimiento)"
+    if "RESUMEN" not in secciones or titulo_riesgo not in secciones:
+        return fallas + ["falta RESUMEN o EN RIESGO"]
+
+    resumen = _campos(secciones["RESUMEN"][0])
+    esperado = {
+        "productos": str(len(productos)),
+        "unidades": str(sum(p["stock_actual"] for p in productos)),
+        "valor_total": f"${sum(p['stock_actual'] * p['precio'] for p in productos):,.0f}",
+        "stock_bajo": str(sum(p["stock_actual"] <= p["stock_minimo"] for p in productos)),
+        "sin_movimiento_30d": str(sum(p["ultimo_movimiento_dias"] >= 30 for p in productos)),
+        "categorias": str(len({p["categoria"] for p in productos})),
+    }
+    for campo, valor in esperado.items():
+        if resumen.get(campo) != valor:
+            fallas.append(f"RESUMEN {campo}={resumen.get(campo)} (esperado {valor})")
+
+    top = sorted(productos, key=_riesgo)[:TOP_RIESGO]
+    en_riesgo = [f[0] for f in _filas(secciones[titulo_riesgo])]
+    if en_riesgo != [p["producto"] for p in top]:
+        fallas.append(f"EN RIESGO no trae los {len(top)} más riesgosos en orden")
+    faltan = [p["producto"] for p in productos if p["stock_actual"] == 0
+              and p["producto"] not in en_riesgo]
+    if faltan:
+        fallas.append(f"productos agotados fuera de EN RIESGO: {faltan}")
+
+    resto = secciones.get("RESTO DEL CATALOGO")
+    if resto is not None:
+        mostradas = len(_filas(resto))
+        if mostradas + _omitidas(resto) != len(productos) - len(top):
+            fallas.append(f"RESTO: {mostradas} filas + {_omitidas(resto)} omitidas "
+                          f"!= {len(productos) - len(top)}")
+    return fallas
+
+
+def _verificar_financiero(resumen, contexto, presupuesto):
+    """Retorna la lista de fallas encontradas en el contexto financiero."""
+    fallas = []
+    if estimar_tokens(contexto) > presupuesto:
+        fallas.append(f"{estimar_tokens(contexto)} tokens > presupuesto {presupuesto}")
+
+    secciones = _secciones(contexto)
+    totales = next((l for t, l in secciones.items() if t.startswith("TOTALES")), None)
+    if totales is None:
+        return fallas + ["falta TOTALES"]
+    campos = _campos(totales[0])
+    for campo, clave in (("ingresos", "ingresos_total"), ("gastos", "gastos_total"),
+                         ("balance", "balance")):
+        valor = f"${resumen[clave]:,.0f}"
+        if campos.get(campo) != valor:
+            fallas.append(f"TOTALES {campo}={campos.get(campo)} (esperado {valor})")
+
+    for titulo, clave, total in (
+        ("INGRESOS POR CATEGORIA", "ingresos_por_categoria", resumen["ingresos_total"]),
+        ("GASTOS POR CATEGORIA", "gastos_por_categoria", resumen["gastos_total"]),
+    ):
+        if titulo not in secciones:
+            continue
+        filas = _filas(secciones[titulo])
+        montos = [float(f[1]) for f in filas]
+        if montos != sorted(montos, reverse=True):
+            fallas.append(f"{titulo} no está ordenado de mayor a menor")
+        if montos and montos[0] != max(resumen[clave].values()):
+            fallas.append(f"{titulo} no empieza por la categoría más grande")
+        for cat, monto, porcentaje in filas:
+            if resumen[clave].get(cat) != float(monto) or porcentaje != f"{float(monto) / total:.0%}":
+                fallas.append(f"{titulo} fila incorrecta: {cat}|{monto}|{porcentaje}")
+                break
+        if len(filas) + _omitidas(secciones[titulo]) != len(resumen[clave]):
+            fallas.append(f"{titulo}: filas + omitidas != {len(resumen[clave])}")
+    return fallas
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--presupuesto", type=int, default=1500)
+    args = parser.parse_args()
+
+    rnd = random.Random(3)
+    fallas = []
+
+    print(f"presupuesto={args.presupuesto} tokens")
+    print(f"{'productos':>10} {'json (tokens)':>14} {'contexto':>9} {'ms':>8}  verificación")
+    for n in TAMANOS:
+        productos = _catalogo(n, rnd)
+
+        inicio = time.perf_counter()
+        contexto = contexto_inventario(productos, presupuesto=args.presupuesto)
+        ms = (time.perf_counter() - inicio) * 1000
+
+        tokens = estimar_tokens(contexto)
+        # El JSON de los catálogos grandes solo se estima sobre una muestra
+        muestra = productos[:1000]
+        json_tokens = estimar_tokens(json.dumps({"inventario": muestra}, indent=2)) * n // len(muestra)
+
+        errores = _verificar_inventario(productos, contexto, args.presupuesto)
+        fallas += [f"inventario n={n}: {e}" for e in errores]
+        print(f"{n:>10} {json_tokens:>14} {tokens:>9} {ms:>8.1f}  {'ok' if not errores else 'FALLA'}")
+
+    for n in (5, 50, 500):
+        resumen = _resumen(n, rnd)
+        ultimos = [{"fecha": "2026-01-01 10:00:00", "tipo": "gasto", "monto": 1000.0,
+                    "categoria": "Gasto 1", "descripcion": "compra " * 20}] * 10
+        contexto = contexto_financiero(resumen, ultimos, presupuesto=args.presupuesto)
+        errores = _verificar_financiero(resumen, contexto, args.presupuesto)
+        fallas += [f"finanzas n={n}: {e}" for e in errores]
+        print(f"finanzas con {n:>3} categorías: {estimar_tokens(contexto)} tokens  "
+              f"{'ok' if not errores else 'FALLA'}")
+
+    for falla in fallas:
+        print(f"FALLA {falla}")
+    print("OK" if not fallas else f"FALLÓ: {len(fallas)} verificaciones")
+    sys.exit(0 if not fallas else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Micro-benchmark del historial de conversación.
+
+Compara ConversationHistory (buffer circular de registros con __slots__ y
+líneas de contexto memorizadas) contra el esquema anterior: una lista de
+dicts con timestamp ISO y metadata vacía, re-cortada en cada mensaje y
+re-formateada en cada get_context.
+
+Mide por separado, en turnos típicos (mensaje del usuario, get_context
+para el router y para el agente, respuesta), el costo de agregar mensajes
+y el de armar el contexto, y la memoria por mensaje con tracemalloc. El
+historial actual hace más trabajo al agregar (estima los tokens de cada
+mensaje y condensa en el resumen lo que sale de la ventana), así que solo
+se exige que arme el contexto más rápido y que no ocupe más memoria por
+mensaje (exit 1 si no); el costo de agregar se reporta sin exigirlo.
+
+Uso (desde Backend/):
+    python scripts/bench_history.py [--turnos 20000] [--sesiones 2000]
+"""
+
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from core.conversation_history import ConversationHistory
+
+USUARIO = ["vendí 3 gorras a 20 mil", "pagué el arriendo 800.000", "cómo voy este mes",
+           "cuánto stock tengo de camisetas", "hola", "compré insumos por 150 mil"]
+AGENTE = ["✅ Registré la venta de 3 gorras por $60.000.",
+          "Tu flujo de caja está sano: entraron $2.300.000 y salieron $1.100.000. "
+          "El gasto principal es arriendo.",
+          "Tienes 12 camisetas, por encima del mínimo de 5.", "¡Hola! ¿En qué te ayudo?"]
+
+
+class HistorialDicts:
+    """El almacenamiento anterior, reproducido para comparar."""
+
+    def __init__(self, max_messages=20):
+        self.messages = []
+        self.max_messages = max_messages
+
+    def add_user_message(self, mensaje, metadata=None):
+        self.messages.append({"role": "user", "content": mensaje,
+                              "timestamp": datetime.now().isoformat(), "metadata": metadata or {}})
+        self._truncate()
+
+    def add_agent_response(self, agent_name, response, metadata=None):
+        self.messages.append({"role": "assistant", "agent": agent_name, "content": response,
+                              "timestamp": datetime.now().isoformat(), "metadata": metadata or {}})
+        self._truncate()
+
+    def get_context(self, last_n=None):
+        if not last_n:
+            last_n = min(10, len(self.messages))
+        if not self.messages:
+            return "Sin historial previo."
+        formatted = []
+        for msg in self.messages[-last_n:]:
+            timestamp = msg.get("timestamp", "").split("T")[1][:5]
+            if msg["role"] == "user":
+                formatted.append(f"[{timestamp}] Usuario: {msg['content']}")
+            else:
+                formatted.append(f"[{timestamp}] {msg.get('agent', 'Agente')}: {msg['content']}")
+        return "\n".join(formatted)
+
+    def _truncate(self):
+        if len(self.messages) > self.max_messages:
+            self.messages = self.messages[-self.max_messages:]
+
+
+def _turnos(historial, n, rnd):
+    """Retorna (µs por turno agregando mensajes, µs por turno armando contexto)."""
+    agregar = contexto = 0.0
+    reloj = time.perf_counter
+    for _ in range(n):
+        t0 = reloj()
+        historial.add_user_message(rnd.choice(USUARIO))
+        t1 = reloj()
+        historial.get_context()  # router / clasificador
+        historial.get_context()  # agente
+        t2 = reloj()
+        historial.add_agent_response("FinancialAgent", rnd.choice(AGENTE))
+        t3 = reloj()
+        agregar += (t1 - t0) + (t3 - t2)
+        contexto += t2 - t1
+    return agregar / n * 1e6, contexto / n * 1e6
+
+
+def _memoria(clase, sesiones, rnd):
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    historiales = []
+    for _ in range(sesiones):
+        h = clase()
+        for _ in range(10):
+            h.add_user_message(rnd.choice(USUARIO))
+            h.get_context()  # como en un turno real: las líneas quedan formateadas
+            h.add_agent_response("FinancialAgent", rnd.choice(AGENTE))
+        historiales.append(h)
+    usado = tracemalloc.get_traced_memory()[0] - antes
+    tracemalloc.stop()
+    mensajes = sum(len(h.messages) for h in historiales)
+    return usado / mensajes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turnos", type=int, default=20000)
+    parser.add_argument("--sesiones", type=int, default=2000)
+    args = parser.parse_args()
+
+    resultados = {}
+    for nombre, clase in (("dicts", HistorialDicts), ("actual", ConversationHistory)):
+        agregar, contexto = _turnos(clase(), args.turnos, random.Random(42))
+        por_mensaje = _memoria(clase, args.sesiones, random.Random(42))
+        resultados[nombre] = (contexto, por_mensaje)
+        print(f"{nombre:>7}: agregar {agregar:6.1f} µs/turno, contexto {contexto:6.1f} µs/turno, "
+              f"total {agregar + contexto:6.1f} µs/turno, {por_mensaje:6.0f} bytes/mensaje")
+
+    (ctx_antes, mem_antes), (ctx_ahora, mem_ahora) = resultados["dicts"], resultados["actual"]
+    print(f"\ncontexto x{ctx_antes / ctx_ahora:.1f} más rápido, memoria x{mem_antes / mem_ahora:.2f} menor")
+
+    ok = ctx_ahora <= ctx_antes and mem_ahora <= mem_antes
+    if not ok:
+        print("ERROR: el historial actual no mejora al esquema anterior")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Compara el clasificador local contra las reglas por palabras clave de core.brain.
+
+Sobre el conjunto de validación mide exactitud, latencia por mensaje y qué
+fracción de mensajes seguiría yendo al LLM con cada estrategia.
+
+Uso (desde Backend/):
+    python scripts/bench_intent.py [--umbral 0.75]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from core.brain import _detectar_local
+from core.intent_classifier import IntentClassifier, cargar_ejemplos, dividir
+
+
+def _medir(nombre, fn, ejemplos):
+    aciertos = al_llm = 0
+    inicio = time.perf_counter()
+    for texto, esperado in ejemplos:
+        intent = fn(texto)
+        if intent is None:
+            al_llm += 1
+        elif intent == esperado:
+            aciertos += 1
+    total_ms = (time.perf_counter() - inicio) * 1000
+
+    decididos = len(ejemplos) - al_llm
+    exactitud = aciertos / decididos if decididos else 0
+    print(f"{nombre:>14}: exactitud {exactitud:6.1%} sobre {decididos:3d} decididos, "
+          f"{al_llm:3d} al LLM ({al_llm / len(ejemplos):5.1%}), "
+          f"{total_ms * 1000 / len(ejemplos):7.1f} µs/mensaje")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--umbral", type=float, default=0.75)
+    args = parser.parse_args()
+
+    # Se entrena sin el conjunto de validación para no medir sobre datos vistos
+    train, valid = dividir(cargar_ejemplos())
+    modelo = IntentClassifier().fit(train)
+    modelo.calibrar(valid)
+
+    def clasificador(texto):
+        intent, confianza = modelo.predict(texto)
+        return intent if confianza >= args.umbral else None
+
+    def combinado(texto):
+        return _detectar_local(texto) or clasificador(texto)
+
+    print(f"{len(valid)} mensajes de validación, umbral={args.umbral}")
+    _medir("palabras clave", _detectar_local, valid)
+    _medir("clasificador", clasificador, valid)
+    _medir("combinado", combinado, valid)
+
+
+if __name__ == "__main__":
+    main()
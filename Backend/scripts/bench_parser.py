@@ -0,0 +1,79 @@
+"""
+Mide el extractor local de movimientos sobre un corpus etiquetado.
+
+Reporta cobertura (mensajes que se registran sin LLM), exactitud de tipo,
+monto y categoría sobre esos mensajes, y latencia por mensaje. Las filas del
+corpus traen un movimiento (tipo, monto, categoria) o varios ("movimientos").
+
+Uso (desde Backend/):
+    python scripts/bench_parser.py [--corpus scripts/corpus_movimientos.jsonl] [-v]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from core.movement_parser import extraer_movimientos
+
+CORPUS_PATH = Path(__file__).parent / "corpus_movimientos.jsonl"
+REPETICIONES = 200
+
+
+def _cargar(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(linea) for linea in f if linea.strip()]
+
+
+def _esperados(row):
+    movimientos = row.get("movimientos") or [row]
+    return [(m["tipo"], m["monto"], m["categoria"]) for m in movimientos]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=str(CORPUS_PATH))
+    parser.add_argument("-v", "--verbose", action="store_true", help="Mostrar fallos y mensajes al LLM")
+    args = parser.parse_args()
+
+    corpus = _cargar(args.corpus)
+    decididos = aciertos = 0
+    motivos = {}
+
+    for row in corpus:
+        resultados = extraer_movimientos(row["texto"])
+        ambiguos = [r["motivo"] for r in resultados if r["ambiguo"]]
+        if ambiguos:
+            for motivo in ambiguos:
+                motivos[motivo] = motivos.get(motivo, 0) + 1
+            if args.verbose:
+                print(f"  LLM ({', '.join(ambiguos)}): {row['texto']}")
+            continue
+
+        decididos += 1
+        obtenidos = [(r["tipo"], r["monto"], r["categoria"]) for r in resultados]
+        if obtenidos == _esperados(row):
+            aciertos += 1
+        elif args.verbose:
+            print(f"  FALLO: {row['texto']} → {obtenidos}")
+
+    inicio = time.perf_counter()
+    for _ in range(REPETICIONES):
+        for row in corpus:
+            extraer_movimientos(row["texto"])
+    us = (time.perf_counter() - inicio) * 1e6 / (REPETICIONES * len(corpus))
+
+    print(f"{len(corpus)} mensajes en el corpus")
+    print(f"  cobertura local: {decididos / len(corpus):6.1%} ({decididos} sin LLM)")
+    print(f"  exactitud:       {aciertos / decididos if decididos else 0:6.1%} sobre los decididos")
+    print(f"  al LLM:          {len(corpus) - decididos} {motivos}")
+    print(f"  latencia:        {us:6.1f} µs/mensaje")
+
+
+if __name__ == "__main__":
+    main()
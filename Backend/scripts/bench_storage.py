@@ -0,0 +1,71 @@
+"""
+Benchmark de carga de los motores de almacenamiento.
+
+Registra movimientos y productos para varios tenants y mide el tiempo de
+escritura y de get_resumen con cada motor.
+
+Uso (desde Backend/):
+    python scripts/bench_storage.py [--tenants 50] [--movimientos 200]
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from database import database
+from database.engine import create_engine, set_engine
+from services.financial_service import add_movimiento, get_resumen
+from services.inventory_service import add_product, read_inventory
+
+
+def _correr(nombre, tenants, movimientos):
+    set_engine(create_engine("memory://" if nombre == "memory" else None))
+    user_ids = [database.get_or_create_user(f"bench-{i}") for i in range(tenants)]
+    rnd = random.Random(42)
+
+    inicio = time.perf_counter()
+    for user_id in user_ids:
+        for _ in range(movimientos):
+            add_movimiento(
+                rnd.choice(("ingreso", "gasto")),
+                rnd.randint(1, 500) * 1000,
+                rnd.choice(("Ventas", "Arriendo", "Proveedores", "Servicios")),
+                user_id=user_id,
+            )
+        for j in range(20):
+            add_product({"producto": f"Producto {j}", "stock_actual": j}, user_id=user_id)
+    escritura = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for user_id in user_ids:
+        get_resumen(dias=30, user_id=user_id)
+        read_inventory(user_id=user_id)
+    lectura = time.perf_counter() - inicio
+
+    total = tenants * (movimientos + 20)
+    print(f"{nombre:>7}: {total} escrituras en {escritura:.2f}s "
+          f"({total / escritura:,.0f}/s), {tenants} resúmenes en {lectura * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tenants", type=int, default=50)
+    parser.add_argument("--movimientos", type=int, default=200)
+    args = parser.parse_args()
+
+    # SQLite en un archivo temporal para no tocar inventario.db
+    database.DB_PATH = Path(tempfile.mkdtemp()) / "bench.db"
+
+    for nombre in ("memory", "sqlite"):
+        _correr(nombre, args.tenants, args.movimientos)
+
+
+if __name__ == "__main__":
+    main()
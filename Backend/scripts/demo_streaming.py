@@ -0,0 +1,135 @@
+"""
+Prueba de punta a punta de las respuestas progresivas sin Telegram ni OpenAI.
+
+Levanta scripts/fake_llm_server.py en modo streaming, pide un análisis
+financiero por el orquestador y muestra cada envío/edición que haría el bot
+sobre un mensaje falso. Reporta el tiempo hasta la primera edición con texto
+contra el tiempo total, y falla (exit 1) si dos ediciones quedaron más cerca
+que el intervalo o si el mensaje final no es la respuesta completa.
+
+Uso (desde Backend/):
+    python scripts/demo_streaming.py [--token-delay 0.05] [--intervalo 1.0] [--retry-after 3]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from fake_llm_server import make_handler
+
+RESPUESTA = (
+    "Tienes un flujo de caja saludable: este mes entraron más ventas de las que "
+    "salieron en gastos. El culpable de la mayor salida es la categoría de insumos, "
+    "que representa casi la mitad de tus gastos. Podrías negociar con tu proveedor "
+    "principal o comprar en menor volumen esta semana para cuidar la liquidez."
+)
+
+
+class RetryAfter(Exception):
+    """Imita telegram.error.RetryAfter."""
+
+    def __init__(self, segundos):
+        super().__init__(f"Flood control exceeded. Retry in {segundos} seconds")
+        self.retry_after = segundos
+
+
+class MensajeFalso:
+    """Mensaje de Telegram falso: registra envíos y ediciones con su instante."""
+
+    def __init__(self, inicio, retry_after_cada=0):
+        self.inicio = inicio
+        self.retry_after_cada = retry_after_cada
+        self.texto = None
+        self.eventos = []
+        self._intentos = 0
+
+    def _log(self, accion, texto):
+        t = time.monotonic() - self.inicio
+        self.eventos.append((t, accion, texto))
+        print(f"  {t:6.2f}s {accion:<7} {texto[:70]!r}")
+
+    async def reply_text(self, texto):
+        self._log("envio", texto)
+        self.texto = texto
+        return self
+
+    async def edit_text(self, texto):
+        self._intentos += 1
+        if self.retry_after_cada and self._intentos % self.retry_after_cada == 0:
+            self._log("429", texto)
+            raise RetryAfter(1)
+        self._log("edicion", texto)
+        self.texto = texto
+
+
+async def _correr(args):
+    from core.llm import cerrar_async
+    from core.orchestrator import ejecutar_accion_async
+    from core.streaming import CURSOR, EdicionProgresiva
+
+    inicio = time.monotonic()
+    mensaje = MensajeFalso(inicio, args.retry_after)
+    editor = EdicionProgresiva(
+        enviar=mensaje.reply_text,
+        editar=lambda m, contenido: m.edit_text(contenido),
+        intervalo=args.intervalo,
+    )
+
+    await editor.iniciar()
+    accion = await ejecutar_accion_async("resumen", "cómo van mis finanzas", al_token=editor.agregar)
+    await editor.terminar(accion["data"])
+    total = time.monotonic() - inicio
+    await cerrar_async()
+
+    ediciones = [t for t, accion_, _ in mensaje.eventos if accion_ == "edicion"]
+    primera = next((t for t, accion_, texto in mensaje.eventos
+                    if accion_ == "edicion" and texto.endswith(CURSOR)), None)
+    separaciones = [b - a for a, b in zip(ediciones, ediciones[1:-1])]
+
+    print()
+    print(f"primera edición con texto: {primera:.2f}s" if primera is not None
+          else "primera edición con texto: (ninguna, respuesta corta)")
+    print(f"respuesta completa:        {total:.2f}s")
+    print(f"ediciones: {len(ediciones)}")
+
+    ok = True
+    if mensaje.texto != RESPUESTA:
+        print("ERROR: el mensaje final no es la respuesta completa")
+        ok = False
+    if separaciones and min(separaciones) < args.intervalo * 0.95:
+        print(f"ERROR: ediciones separadas por {min(separaciones):.2f}s (< {args.intervalo}s)")
+        ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--token-delay", type=float, default=0.05)
+    parser.add_argument("--intervalo", type=float, default=1.0)
+    parser.add_argument("--retry-after", type=int, default=0,
+                        help="Responder RetryAfter cada N ediciones (0 = nunca)")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(0.0, 0.0, RESPUESTA, args.token_delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    os.environ["OPENAI_API_KEY"] = "test"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ.setdefault("DATABASE_URL", "memory://")
+
+    ok = asyncio.run(_correr(args))
+    server.shutdown()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Servidor HTTP local que imita /v1/chat/completions de OpenAI.
+
+Sirve para probar el gateway (core/llm.py) y los agentes sin red ni API key
+real: latencia artificial, fallos 503 aleatorios y respuestas fijas. Con
+"stream": true responde por SSE, una palabra por chunk cada --token-delay
+segundos (ver scripts/demo_streaming.py).
+
+Uso (desde Backend/):
+    python scripts/fake_llm_server.py --port 8765 --latency 0.2 --fail-rate 0.3
+    OPENAI_API_KEY=test OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python bot/test.py
+"""
+
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RESPUESTA_POR_DEFECTO = '{"intent": "conversacion"}'
+
+
+def _completion(content: str, model: str) -> dict:
+    return {
+        "id": f"chatcmpl-fake-{int(time.time() * 1000)}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+    }
+
+
+def _chunk(delta: dict, model: str, finish_reason=None) -> dict:
+    return {
+        "id": "chatcmpl-fake-stream",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def make_handler(latency: float, fail_rate: float, content: str, token_delay: float = 0.0):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, como la API real
+
+        def _responder(self, status: int, body: dict):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            largo = int(self.headers.get("Content-Length", 0))
+            pedido = json.loads(self.rfile.read(largo) or b"{}")
+
+            time.sleep(latency)
+            if random.random() < fail_rate:
+                self._responder(503, {"error": {"message": "fake overload", "type": "server_error"}})
+                return
+
+            if pedido.get("stream"):
+                self._responder_stream(pedido.get("model", "fake"))
+                return
+
+            self._responder(200, _completion(content, pedido.get("model", "fake")))
+
+        def _responder_stream(self, model: str):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            eventos = [_chunk({"role": "assistant", "content": ""}, model)]
+            palabras = content.split(" ")
+            eventos += [
+                _chunk({"content": p if i == 0 else " " + p}, model)
+                for i, p in enumerate(palabras)
+            ]
+            eventos.append(_chunk({}, model, finish_reason="stop"))
+
+            for evento in eventos:
+                self.wfile.write(f"data: {json.dumps(evento)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(token_delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--content", default=RESPUESTA_POR_DEFECTO)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", args.port), make_handler(args.latency, args.fail_rate, args.content, args.token_delay)
+    )
+    print(f"Fake LLM escuchando en http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
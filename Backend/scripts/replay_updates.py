@@ -0,0 +1,150 @@
+"""
+Prueba local del modo webhook, sin Telegram.
+
+Dos subcomandos:
+
+  api     Bot API falsa: responde getMe, sendMessage, editMessageText y
+          setWebhook como Telegram e imprime cada mensaje que el bot envía
+          o edita.
+  enviar  Reenvía updates grabados (un JSON por línea) por POST a
+          /telegram/webhook y verifica que los update_id repetidos vuelvan
+          marcados como duplicados (exit 1 si alguno se procesó dos veces).
+
+Uso (desde Backend/, en tres terminales):
+    python scripts/replay_updates.py api --puerto 8081
+    TELEGRAM_MODE=webhook TELEGRAM_TOKEN=123:test TELEGRAM_API_URL=http://127.0.0.1:8081 \\
+        TELEGRAM_WEBHOOK_SECRET=prueba uvicorn app:app --port 8000
+    TELEGRAM_WEBHOOK_SECRET=prueba python scripts/replay_updates.py enviar \\
+        --url http://127.0.0.1:8000/telegram/webhook
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl
+
+UPDATES_GRABADOS = Path(__file__).resolve().parent / "updates_grabados.jsonl"
+
+BOT = {"id": 1, "is_bot": True, "first_name": "Fina", "username": "fina_test_bot"}
+
+
+def make_handler():
+    ids = itertools.count(1000)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _parametros(self) -> dict:
+            largo = int(self.headers.get("Content-Length", 0))
+            cuerpo = self.rfile.read(largo).decode("utf-8")
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                return json.loads(cuerpo or "{}")
+            return dict(parse_qsl(cuerpo))
+
+        def _responder(self, resultado):
+            data = json.dumps({"ok": True, "result": resultado}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            metodo = self.path.rsplit("/", 1)[-1]
+            parametros = self._parametros()
+
+            if metodo == "getMe":
+                self._responder(BOT)
+                return
+
+            if metodo in ("sendMessage", "editMessageText"):
+                chat_id = int(parametros.get("chat_id", 0))
+                texto = parametros.get("text", "")
+                message_id = int(parametros.get("message_id") or next(ids))
+                print(f"[{chat_id}] {metodo:<15} #{message_id}: {texto[:100]!r}", flush=True)
+                self._responder({
+                    "message_id": message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"},
+                    "from": BOT,
+                    "text": texto,
+                })
+                return
+
+            # setWebhook, deleteWebhook, sendChatAction...
+            self._responder(True)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def _api(args):
+    server = ThreadingHTTPServer(("127.0.0.1", args.puerto), make_handler())
+    print(f"Bot API falsa en http://127.0.0.1:{args.puerto} (TELEGRAM_API_URL)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def _enviar(args):
+    updates = [json.loads(linea) for linea in Path(args.archivo).read_text("utf-8").splitlines() if linea.strip()]
+    vistos = set()
+    ok = True
+
+    for update in updates:
+        pedido = urllib.request.Request(
+            args.url,
+            data=json.dumps(update).encode("utf-8"),
+            headers={"Content-Type": "application/json",
+                     "X-Telegram-Bot-Api-Secret-Token": args.secret},
+            method="POST",
+        )
+        inicio = time.perf_counter()
+        with urllib.request.urlopen(pedido, timeout=10) as respuesta:
+            cuerpo = json.loads(respuesta.read())
+        ms = (time.perf_counter() - inicio) * 1000
+
+        update_id = update["update_id"]
+        texto = update.get("message", {}).get("text", "")
+        print(f"update {update_id}: {respuesta.status} en {ms:.0f} ms, duplicado={cuerpo['duplicado']}  {texto!r}")
+
+        if cuerpo["duplicado"] != (update_id in vistos):
+            print(f"ERROR: update {update_id} mal deduplicado")
+            ok = False
+        vistos.add(update_id)
+        time.sleep(args.pausa)
+
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    api = sub.add_parser("api")
+    api.add_argument("--puerto", type=int, default=8081)
+
+    enviar = sub.add_parser("enviar")
+    enviar.add_argument("--url", default="http://127.0.0.1:8000/telegram/webhook")
+    enviar.add_argument("--archivo", default=str(UPDATES_GRABADOS))
+    enviar.add_argument("--secret", default=os.getenv("TELEGRAM_WEBHOOK_SECRET", ""))
+    enviar.add_argument("--pausa", type=float, default=0.0)
+
+    args = parser.parse_args()
+    if args.comando == "api":
+        _api(args)
+    else:
+        sys.exit(0 if _enviar(args) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Entrena el clasificador local de intenciones.
+
+Lee core/intent_examples.jsonl, entrena con el 80%, calibra la temperatura
+con el 20% restante, reporta la exactitud y guarda core/intent_model.json.
+
+Uso (desde Backend/):
+    python scripts/train_intent.py [--epochs 30]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from core.intent_classifier import MODEL_PATH, IntentClassifier, cargar_ejemplos, dividir
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--lr", type=float, default=0.5)
+    args = parser.parse_args()
+
+    train, valid = dividir(cargar_ejemplos())
+    modelo = IntentClassifier().fit(train, epochs=args.epochs, lr=args.lr)
+    temperatura = modelo.calibrar(valid)
+
+    aciertos = sum(modelo.predict(texto)[0] == intent for texto, intent in valid)
+    print(f"Entrenamiento: {len(train)} ejemplos, validación: {len(valid)}")
+    print(f"Exactitud en validación: {aciertos / len(valid):.1%} (temperatura={temperatura})")
+
+    # El modelo final usa todos los ejemplos y conserva la temperatura calibrada
+    final = IntentClassifier().fit(train + valid, epochs=args.epochs, lr=args.lr)
+    final.temperatura = temperatura
+    final.save()
+    print(f"Modelo guardado en {MODEL_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,118 +1,75 @@
-from database.database import get_db
+from database.engine import get_engine
 from datetime import datetime, timedelta
 
+from core.events import publish
 
-def add_movimiento(tipo: str, monto: float, categoria: str, descripcion: str = None) -> dict:
+
+def _validar(tipo: str, monto: float) -> None:
     if tipo not in ("ingreso", "gasto"):
         raise ValueError("tipo debe ser 'ingreso' o 'gasto'")
     
     if monto <= 0:
         raise ValueError("monto debe ser positivo")
+
+
+def add_movimiento(tipo: str, monto: float, categoria: str, descripcion: str = None,
+                   user_id: int = None) -> dict:
+    _validar(tipo, monto)
+    
+    movimiento = get_engine().add_movimiento(
+        tipo, monto, categoria, descripcion or "", user_id=user_id
+    )
+    publish("movimiento_creado", movimiento, tenant=user_id)
+    return movimiento
+
+
+def add_movimientos(movimientos: list, user_id: int = None, origen: str = None) -> list:
+    """Registra varios movimientos en una sola transacción (todos o ninguno).
     
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute("""
-            INSERT INTO movimientos (tipo, monto, categoria, descripcion)
-            VALUES (?, ?, ?, ?)
-        """, (tipo, monto, categoria, descripcion or ""))
-        
-        conn.commit()
-        
-        movimiento_id = cursor.lastrowid
-        cursor.execute("SELECT * FROM movimientos WHERE id = ?", (movimiento_id,))
-        row = cursor.fetchone()
-        
-        return {
-            "id": row["id"],
-            "tipo": row["tipo"],
-            "monto": row["monto"],
-            "categoria": row["categoria"],
-            "descripcion": row["descripcion"],
-            "fecha": row["fecha"],
-        }
-    finally:
-        conn.close()
-
-
-def get_movements(limit: int = None, dias: int = None) -> list:
+    Args:
+        movimientos: dicts con tipo, monto, categoria y descripcion
+        user_id: tenant dueño de los movimientos
+        origen: clave del mensaje que los generó; si ya se registró, se
+            retornan los movimientos de entonces sin guardar otros
+    """
+    for mov in movimientos:
+        _validar(mov.get("tipo"), mov.get("monto") or 0)
+    
+    guardados = get_engine().add_movimientos(movimientos, user_id=user_id, origen=origen)
+    for movimiento in guardados:
+        if not movimiento.get("repetido"):
+            publish("movimiento_creado", movimiento, tenant=user_id)
+    return guardados
+
+
+def _fecha_limite(dias: int) -> str:
+    return (datetime.now() - timedelta(days=dias)).isoformat()
+
+
+def get_movements(limit: int = None, dias: int = None, user_id: int = None) -> list:
     """Obtiene movimientos. 
     
     Args:
         limit: cantidad máxima de registros
         dias: últimos N días (si no se especifica, trae todo)
+        user_id: tenant dueño de los movimientos (None = todos)
     """
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    query = "SELECT * FROM movimientos"
-    params = []
-    
-    if dias:
-        fecha_limite = datetime.now() - timedelta(days=dias)
-        query += " WHERE fecha >= ?"
-        params.append(fecha_limite.isoformat())
-    
-    query += " ORDER BY fecha DESC"
-    
-    if limit:
-        query += " LIMIT ?"
-        params.append(limit)
-    
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    conn.close()
-    
-    return [dict(row) for row in rows]
+    desde = _fecha_limite(dias) if dias else None
+    return get_engine().list_movimientos(user_id=user_id, desde=desde, limit=limit)
 
 
-def get_resumen(dias: int = 30) -> dict:
+def get_resumen(dias: int = 30, user_id: int = None) -> dict:
     """Retorna resumen financiero de los últimos N días."""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    fecha_limite = datetime.now() - timedelta(days=dias)
+    totales = get_engine().totales_por_categoria(_fecha_limite(dias), user_id=user_id)
     
-    # Total ingresos
-    cursor.execute("""
-        SELECT COALESCE(SUM(monto), 0) as total 
-        FROM movimientos 
-        WHERE tipo = 'ingreso' AND fecha >= ?
-    """, (fecha_limite.isoformat(),))
-    ingresos = cursor.fetchone()["total"]
-    
-    # Total gastos
-    cursor.execute("""
-        SELECT COALESCE(SUM(monto), 0) as total 
-        FROM movimientos 
-        WHERE tipo = 'gasto' AND fecha >= ?
-    """, (fecha_limite.isoformat(),))
-    gastos = cursor.fetchone()["total"]
-    
-    # Ingresos por categoría
-    cursor.execute("""
-        SELECT categoria, SUM(monto) as total
-        FROM movimientos
-        WHERE tipo = 'ingreso' AND fecha >= ?
-        GROUP BY categoria
-        ORDER BY total DESC
-    """, (fecha_limite.isoformat(),))
-    ingresos_por_cat = {row["categoria"]: row["total"] for row in cursor.fetchall()}
-    
-    # Gastos por categoría
-    cursor.execute("""
-        SELECT categoria, SUM(monto) as total
-        FROM movimientos
-        WHERE tipo = 'gasto' AND fecha >= ?
-        GROUP BY categoria
-        ORDER BY total DESC
-    """, (fecha_limite.isoformat(),))
-    gastos_por_cat = {row["categoria"]: row["total"] for row in cursor.fetchall()}
+    ingresos_por_cat = {cat: v["total"] for cat, v in totales["ingreso"].items()}
+    gastos_por_cat = {cat: v["total"] for cat, v in totales["gasto"].items()}
     
+    ingresos = sum(ingresos_por_cat.values())
+    gastos = sum(gastos_por_cat.values())
     balance = ingresos - gastos
     
-    conn.close()
+    cantidad = sum(v["cantidad"] for por_cat in totales.values() for v in por_cat.values())
     
     return {
         "periodo_dias": dias,
@@ -121,32 +78,18 @@ def get_resumen(dias: int = 30) -> dict:
         "balance": round(balance, 2),
         "ingresos_por_categoria": ingresos_por_cat,
         "gastos_por_categoria": gastos_por_cat,
-        "cantidad_movimientos": len(get_movements(dias=dias)),
+        "cantidad_movimientos": cantidad,
     }
 
 
-def get_movimientos_por_categoria(tipo: str, dias: int = 30) -> dict:
+def get_movimientos_por_categoria(tipo: str, dias: int = 30, user_id: int = None) -> dict:
     """Retorna movimientos agrupados por categoría (ingreso o gasto)."""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    fecha_limite = datetime.now() - timedelta(days=dias)
-    
-    cursor.execute("""
-        SELECT categoria, COUNT(*) as cantidad, SUM(monto) as total
-        FROM movimientos
-        WHERE tipo = ? AND fecha >= ?
-        GROUP BY categoria
-        ORDER BY total DESC
-    """, (tipo, fecha_limite.isoformat()))
-    
-    rows = cursor.fetchall()
-    conn.close()
+    totales = get_engine().totales_por_categoria(_fecha_limite(dias), user_id=user_id)
     
-    return {row["categoria"]: {"cantidad": row["cantidad"], "total": round(row["total"], 2)} 
-            for row in rows}
+    return {cat: {"cantidad": v["cantidad"], "total": round(v["total"], 2)} 
+            for cat, v in totales.get(tipo, {}).items()}
 
 
-def get_ultimos_movimientos(cantidad: int = 10) -> list:
+def get_ultimos_movimientos(cantidad: int = 10, user_id: int = None) -> list:
     """Retorna los últimos movimientos para contexto del agente."""
-    return get_movements(limit=cantidad)
+    return get_movements(limit=cantidad, user_id=user_id)
\ No newline at end of file
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import './Dashboard.css';
+import useEventos from '../hooks/useEventos';
 
 const Dashboard = () => {
   const [inventory, setInventory] = useState([]);
@@ -48,6 +49,8 @@ const Dashboard = () => {
     fetchInventory();
   }, []);
 
+  useEventos(['producto_actualizado', 'inventario_reemplazado'], () => fetchInventory());
+
   const addItem = async (e) => {
     e.preventDefault();
     const payload = {
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import '../styles/Finance.css';
+import useEventos from '../hooks/useEventos';
 
 export default function Finance() {
   const [resumen, setResumen] = useState(null);
@@ -20,6 +21,23 @@ export default function Finance() {
     fetchFinancialData();
   }, []);
 
+  // Actualizar resumen y movimientos cuando el backend avisa de un registro
+  useEventos(['movimiento_creado'], () => refreshResumenYMovimientos());
+
+  const refreshResumenYMovimientos = async () => {
+    try {
+      const [resumenRes, movimientosRes] = await Promise.all([
+        fetch(`${API_BASE}/finanzas/resumen`),
+        fetch(`${API_BASE}/finanzas/movimientos?limit=10`),
+      ]);
+      setResumen(await resumenRes.json());
+      const movimientosData = await movimientosRes.json();
+      setMovimientos(movimientosData.movimientos || []);
+    } catch (error) {
+      console.error('Error refreshing financial data:', error);
+    }
+  };
+
   const fetchFinancialData = async () => {
     setLoading(true);
     try {
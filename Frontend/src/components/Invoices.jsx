@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import '../styles/Invoices.css';
+import useEventos from '../hooks/useEventos';
 
 export default function Invoices() {
   const [movimientos, setMovimientos] = useState([]);
@@ -14,6 +15,8 @@ export default function Invoices() {
     fetchMovimientos();
   }, []);
 
+  useEventos(['movimiento_creado'], () => fetchMovimientos());
+
   const fetchMovimientos = async () => {
     setLoading(true);
     try {
@@ -0,0 +1,29 @@
+import { useEffect, useRef } from 'react';
+
+const API_BASE = process.env.REACT_APP_API_URL || 'http://127.0.0.1:8000/api';
+// Tenant cuyos cambios se escuchan; sin él no hay stream (no existe uno global)
+const USER_ID = process.env.REACT_APP_USER_ID;
+
+// Se suscribe al stream SSE del backend y llama onEvento cuando llega
+// alguno de los tipos indicados. EventSource reconecta solo.
+export default function useEventos(tipos, onEvento) {
+  const handlerRef = useRef(onEvento);
+  handlerRef.current = onEvento;
+
+  useEffect(() => {
+    if (typeof EventSource === 'undefined' || !USER_ID) return undefined;
+
+    const source = new EventSource(`${API_BASE}/eventos?user_id=${encodeURIComponent(USER_ID)}`);
+    const listener = (e) => {
+      try {
+        handlerRef.current(JSON.parse(e.data));
+      } catch (err) {
+        console.error('useEventos', err);
+      }
+    };
+
+    tipos.forEach((tipo) => source.addEventListener(tipo, listener));
+    return () => source.close();
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [tipos.join(',')]);
+}